@@ -0,0 +1,157 @@
+import cv2
+import numpy as np
+
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+GRID_SIZE: tuple[int, int] = (64, 48)
+"""The number of lookup grid points (columns, rows) across the camera image. The mapping between grid points is
+bilinear, so a finer grid follows the mesh more closely at the cost of a larger calibration."""
+
+MIN_TRIANGLE_AREA: float = 1
+"""Triangles of markers with a smaller area than this (in camera pixels) are ignored, as their mapping is unstable."""
+
+
+class CalibrationMesh:
+    """
+    A mapping from camera space to projector space for walls which aren't flat (e.g. 3D replicas), which a single
+    homography can't describe.
+
+    The detected markers are triangulated, every triangle gets its own affine mapping, and the result is baked into a
+    lookup grid over the (normalized) camera image, so mapping a point costs the same however many markers there are.
+    Outside the markers, the single best-fitting homography is used.
+
+    The grid is stored as an array of shape (rows, columns * 2), holding the projector coordinates of every grid point,
+    so that it can be handed to .NET (and saved) in place of the 3x3 transformation matrix.
+    """
+
+    def __init__(self, grid: np.ndarray):
+        """
+        :param grid The projector coordinates of every grid point, of shape (rows, columns, 2). Grid point (i, j) is
+        at normalized camera coordinates (j / (columns - 1), i / (rows - 1)).
+        """
+        self._grid: np.ndarray = np.asarray(grid, dtype=np.float64)
+        self._rows, self._columns = self._grid.shape[:2]
+
+    @staticmethod
+    def fit(
+            camera_id_to_coord: dict[int, tuple[np.float32, np.float32]],
+            projector_id_to_coord: dict[int, tuple[float, float]],
+            camera_res: tuple[int, int],
+            grid_size: tuple[int, int] = GRID_SIZE
+    ) -> "CalibrationMesh":
+        """
+        Triangulates the markers detected in both camera and projector space, and bakes the affine mapping of every
+        triangle into a lookup grid. Throws a RuntimeError if fewer than 4 markers are in both.
+        """
+        ids = [aruco_id for aruco_id in camera_id_to_coord if aruco_id in projector_id_to_coord]
+        logger.info(f"Found {len(ids)} markers.")
+        if len(ids) < 4:
+            raise RuntimeError("Not enough markers detected - at least 4 required for calibration.")
+        camera_points = np.array([camera_id_to_coord[aruco_id] for aruco_id in ids], dtype=np.float32)
+        projector_points = np.array([projector_id_to_coord[aruco_id] for aruco_id in ids], dtype=np.float32)
+
+        columns, rows = grid_size
+        width, height = camera_res
+        grid_x, grid_y = np.meshgrid(np.linspace(0, 1, columns) * width, np.linspace(0, 1, rows) * height)
+        grid_camera = np.stack((grid_x, grid_y), axis=-1).reshape(-1, 2)
+
+        # outside the markers, fall back to the best single homography
+        homography = cv2.findHomography(camera_points, projector_points)[0]
+        grid_projector = cv2.perspectiveTransform(grid_camera.reshape(-1, 1, 2), homography).reshape(-1, 2)
+
+        triangles = CalibrationMesh._triangulate(camera_points)
+        covered = np.zeros(len(grid_camera), dtype=bool)
+        for triangle in triangles:
+            src = camera_points[triangle]
+            barycentric = CalibrationMesh._barycentric(grid_camera, src)
+            inside = ~covered & (barycentric >= -1e-9).all(axis=1)
+            if not inside.any():
+                continue
+            # the affine mapping of a triangle is the barycentric combination of its projector corners
+            grid_projector[inside] = barycentric[inside] @ projector_points[triangle].astype(np.float64)
+            covered |= inside
+        logger.info(f"Calibration mesh has {len(triangles)} triangles, covering {covered.mean():.0%} of the "
+                    f"camera image.")
+        return CalibrationMesh(grid_projector.reshape(rows, columns, 2))
+
+    @staticmethod
+    def _triangulate(points: np.ndarray) -> list[np.ndarray]:
+        """Returns the Delaunay triangles of the points, as arrays of the indices of their corners."""
+        x_min, y_min = np.floor(points.min(axis=0)) - 1
+        x_max, y_max = np.ceil(points.max(axis=0)) + 1
+        subdiv = cv2.Subdiv2D((int(x_min), int(y_min), int(x_max - x_min) + 1, int(y_max - y_min) + 1))
+        indices = {}
+        for i, point in enumerate(points):
+            indices.setdefault((float(point[0]), float(point[1])), i)
+            subdiv.insert((float(point[0]), float(point[1])))
+
+        triangles = []
+        for triangle in subdiv.getTriangleList():
+            corners = [indices.get((float(triangle[k]), float(triangle[k + 1]))) for k in (0, 2, 4)]
+            if None in corners:
+                continue  # one of the triangulation's virtual outer corners
+            corner_points = points[corners].astype(np.float64)
+            if abs(np.cross(corner_points[1] - corner_points[0], corner_points[2] - corner_points[0])) / 2 \
+                    < MIN_TRIANGLE_AREA:
+                continue
+            triangles.append(np.array(corners))
+        return triangles
+
+    @staticmethod
+    def _barycentric(points: np.ndarray, triangle: np.ndarray) -> np.ndarray:
+        """Returns the barycentric coordinates (Nx3) of the points (Nx2) in the triangle (3x2)."""
+        a, b, c = triangle.astype(np.float64)
+        matrix = np.array([b - a, c - a]).T
+        uv = np.linalg.solve(matrix, (points - a).T).T
+        return np.column_stack((1 - uv.sum(axis=1), uv))
+
+    def norm_to_proj_batch(self, norm_coords: np.ndarray) -> np.ndarray:
+        """
+        Maps an Nx2 array of normalized camera coordinates to projector coordinates by bilinear lookup in the grid.
+        Coordinates outside the camera image are clamped to its edge.
+        """
+        norm_coords = np.asarray(norm_coords, dtype=np.float64).reshape(-1, 2)
+        x = np.clip(norm_coords[:, 0], 0, 1) * (self._columns - 1)
+        y = np.clip(norm_coords[:, 1], 0, 1) * (self._rows - 1)
+        x0 = np.minimum(x.astype(np.intp), self._columns - 2)
+        y0 = np.minimum(y.astype(np.intp), self._rows - 2)
+        fx = (x - x0)[:, None]
+        fy = (y - y0)[:, None]
+        grid = self._grid
+        top = grid[y0, x0] * (1 - fx) + grid[y0, x0 + 1] * fx
+        bottom = grid[y0 + 1, x0] * (1 - fx) + grid[y0 + 1, x0 + 1] * fx
+        return top * (1 - fy) + bottom * fy
+
+    def approximate_matrix(self) -> np.ndarray:
+        """
+        Returns the affine transformation matrix (3x3) from normalized camera coordinates to projector coordinates
+        which best fits the mesh, e.g. for mapping projector coordinates back to the camera approximately.
+        """
+        grid_x, grid_y = np.meshgrid(np.linspace(0, 1, self._columns), np.linspace(0, 1, self._rows))
+        norm_points = np.stack((grid_x, grid_y), axis=-1).reshape(-1, 2)
+        affine = np.linalg.lstsq(np.column_stack((norm_points, np.ones(len(norm_points)))),
+                                 self._grid.reshape(-1, 2), rcond=None)[0].T
+        return np.vstack((affine, [0, 0, 1]))
+
+    def to_array(self) -> np.ndarray:
+        """
+        Returns the mesh as an array of shape (rows, columns * 2), which from_array turns back into the mesh
+        """
+        return self._grid.reshape(self._rows, self._columns * 2).copy()
+
+    @staticmethod
+    def from_array(array: np.ndarray) -> "CalibrationMesh":
+        array = np.asarray(array, dtype=np.float64)
+        if not CalibrationMesh.is_mesh_array(array):
+            raise ValueError(f"Error loading calibration mesh: Array of shape {array.shape} isn't a mesh.")
+        return CalibrationMesh(array.reshape(array.shape[0], array.shape[1] // 2, 2))
+
+    @staticmethod
+    def is_mesh_array(array: np.ndarray) -> bool:
+        """
+        Whether the array is a calibration mesh (see to_array) rather than a 3x3 transformation matrix
+        """
+        shape = np.shape(array)
+        return len(shape) == 2 and shape[0] >= 2 and shape[1] >= 4 and shape[1] % 2 == 0
@@ -3,6 +3,8 @@ import numpy as np
 from cv2 import aruco
 
 from Scripts.video_capture_factory import take_photo
+from Scripts.Helper.CalibrationMesh import CalibrationMesh
+from Scripts.Helper.VideoCapture import DEFAULT_RESOLUTION
 from Scripts.Helper.logger import get_logger
 
 
@@ -13,28 +15,189 @@ Defined here https://docs.opencv.org/3.4/d9/d6a/group__aruco.html#gac84398a9ed9d
 DISPLAY_RESULTS = False
 """Displays labeled ArUco detection on a CV2 window, useful for debugging"""
 
+MESH_CALIBRATION: bool = False
+"""Whether calibrate returns a calibration mesh (see Helper/CalibrationMesh) instead of a single transformation matrix,
+for walls which aren't flat (e.g. 3D replicas). The mesh is handed to .NET in place of the matrix."""
+
+CALIBRATE_AT_FULL_RESOLUTION: bool = True
+"""Whether to take the calibration photo at the highest resolution the camera supports (unless the camera is already
+open, e.g. for hotspot detection), so that small markers can be detected. The detected coordinates are scaled to the
+resolution frames are captured at for hotspot detection."""
+
+COARSE_HEIGHT: int = 1080
+"""Photos taller than this are first searched for ArUcos downscaled to this height, and only the regions where markers
+(or marker-like candidates) were found are searched at full resolution."""
+
+COARSE_MIN_MARKER_PERIMETER_RATE: float = 0.01
+"""The minimum perimeter of a candidate in the downscaled photo, as a fraction of its width. Lower than OpenCV's
+default (0.03), so that markers too small to decode downscaled are still found as candidates."""
+
+REFINE_MARGIN: float = 0.5
+"""The margin around every candidate region searched at full resolution, as a fraction of the candidate's size."""
+
+UNDISTORT_CRITERIA: tuple[int, int, float] = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 20, 1e-6)
+"""When to stop iteratively removing lens distortion from a point. OpenCV's default of 5 iterations leaves errors of
+several hundredths of a pixel at the edges of wide-angle images; this takes a few microseconds per frame."""
+
+MIN_INTRINSICS_MARKERS: int = 10
+"""The minimum number of markers a capture needs to be used for estimating the camera's intrinsics."""
+
 logger = get_logger()
 
+_aruco_detector: aruco.ArucoDetector | None = None
+_coarse_aruco_detector: aruco.ArucoDetector | None = None
+
+
+def _get_aruco_detector() -> aruco.ArucoDetector:
+    """Returns the ArUco detector, creating it on first use."""
+    global _aruco_detector
+    if _aruco_detector is None:
+        _aruco_detector = aruco.ArucoDetector(dictionary=DICT, detectorParams=aruco.DetectorParameters())
+    return _aruco_detector
+
+
+def _get_coarse_aruco_detector() -> aruco.ArucoDetector:
+    """
+    Returns the ArUco detector for downscaled photos, which also finds smaller candidates, creating it on first use.
+    """
+    global _coarse_aruco_detector
+    if _coarse_aruco_detector is None:
+        params = aruco.DetectorParameters()
+        params.minMarkerPerimeterRate = COARSE_MIN_MARKER_PERIMETER_RATE
+        _coarse_aruco_detector = aruco.ArucoDetector(dictionary=DICT, detectorParams=params)
+    return _coarse_aruco_detector
+
 
 class Calibrator:
     # Methods for generating transformation matrix
 
     @staticmethod
-    def calibrate(camera_index: int, projector_id_to_coord: dict[int, tuple[float, float]]) -> np.ndarray:
+    def calibrate(
+            camera_index: int,
+            projector_id_to_coord: dict[int, tuple[float, float]],
+            camera_matrix: np.ndarray | None = None,
+            dist_coeffs: np.ndarray | None = None
+    ) -> np.ndarray:
         """
-        Takes a photo, detects ArUcos and returns a transformation matrix between provided and detected coordinates.
+        Takes a photo, detects ArUcos and returns a transformation matrix between provided and detected coordinates
+        (or a calibration mesh as an array, if MESH_CALIBRATION is set).
+
+        If the camera's intrinsics are given (see estimate_intrinsics), the detected coordinates are undistorted first,
+        so the matrix must be used by a Calibrator with the same intrinsics.
         """
-        photo = take_photo(camera_index)
-        camera_id_to_coord = Calibrator._detect_ArUcos(photo)
+        camera_id_to_coord, camera_res = Calibrator.capture_ArUcos(camera_index)
+        if camera_matrix is not None:
+            ids = list(camera_id_to_coord)
+            coords = np.array([camera_id_to_coord[aruco_id] for aruco_id in ids], dtype=np.float64).reshape(-1, 2)
+            undistorted = Calibrator._undistort(coords, camera_matrix, dist_coeffs)
+            camera_id_to_coord = {aruco_id: (np.float32(x), np.float32(y))
+                                  for aruco_id, (x, y) in zip(ids, undistorted)}
+        if MESH_CALIBRATION:
+            return CalibrationMesh.fit(camera_id_to_coord, projector_id_to_coord, camera_res).to_array()
         return Calibrator._get_transformation_matrix(camera_id_to_coord, projector_id_to_coord)
 
+    @staticmethod
+    def capture_ArUcos(camera_index: int) -> tuple[dict[int, tuple[np.float32, np.float32]], tuple[int, int]]:
+        """
+        Takes a photo and returns the ids and coordinates of the ArUcos in it, in the camera space of the frames used
+        for hotspot detection, along with the resolution of those frames.
+        """
+        photo = take_photo(camera_index, full_resolution=CALIBRATE_AT_FULL_RESOLUTION)
+        frame_height = DEFAULT_RESOLUTION[1]  # hotspot detection's frames are resized to this height
+        if photo.shape[0] != frame_height and not np.isclose(photo.shape[1] / photo.shape[0],
+                                                             DEFAULT_RESOLUTION[0] / DEFAULT_RESOLUTION[1], rtol=0.01):
+            # a different aspect ratio probably means a different field of view, which can't be scaled to the frames
+            logger.warning(f"Full-resolution photo is {photo.shape[1]}x{photo.shape[0]}, which has a different aspect "
+                           f"ratio from {DEFAULT_RESOLUTION}; taking a photo at the normal resolution instead.")
+            photo = take_photo(camera_index)
+        logger.info(f"Calibrating from a {photo.shape[1]}x{photo.shape[0]} photo.")
+
+        camera_id_to_coord = Calibrator._detect_ArUcos(photo)
+        scale = frame_height / photo.shape[0]
+        if scale != 1:
+            # scale about pixel centres, like resizing does
+            camera_id_to_coord = {aruco_id: (np.float32((x + 0.5) * scale - 0.5), np.float32((y + 0.5) * scale - 0.5))
+                                  for aruco_id, (x, y) in camera_id_to_coord.items()}
+        # the same width as the frames hotspot detection captures
+        camera_res = int(photo.shape[1] / photo.shape[0] * frame_height), frame_height
+        return camera_id_to_coord, camera_res
+
+    @staticmethod
+    def estimate_intrinsics(
+            captures: list[tuple[dict[int, tuple[np.float32, np.float32]], dict[int, tuple[float, float]]]],
+            camera_res: tuple[int, int]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Estimates the camera matrix and distortion coefficients (k1, k2, p1, p2, k3) of a camera from captures of
+        projected ArUcos, i.e. pairs of detected coordinates (see capture_ArUcos) and the projector coordinates the
+        ArUcos were projected at. The wall is treated as flat.
+
+        Only the focal length and radial distortion are estimated, which one capture is enough for. More captures
+        (e.g. of different marker layouts, covering the edges of the camera image) make the estimate more accurate.
+
+        This is API-only for now: the app's calibration flow (calibration.py) doesn't estimate intrinsics, and the .NET
+        config has nowhere to store them, so lens distortion is only removed when the caller passes the intrinsics to
+        calibrate and to the Calibrator (or HotspotDetector) itself.
+        """
+        object_points = []
+        image_points = []
+        for camera_id_to_coord, projector_id_to_coord in captures:
+            ids = [aruco_id for aruco_id in camera_id_to_coord if aruco_id in projector_id_to_coord]
+            if len(ids) < MIN_INTRINSICS_MARKERS:
+                logger.warning(f"Ignoring capture with only {len(ids)} markers for estimating intrinsics.")
+                continue
+            object_points.append(np.array([(*projector_id_to_coord[aruco_id], 0) for aruco_id in ids], np.float32))
+            image_points.append(np.array([camera_id_to_coord[aruco_id] for aruco_id in ids], np.float32))
+        if len(object_points) == 0:
+            raise RuntimeError(f"Not enough markers detected - at least {MIN_INTRINSICS_MARKERS} required in a capture "
+                               f"for estimating intrinsics.")
+
+        w, h = camera_res
+        initial_camera_matrix = np.array([[max(w, h), 0, (w - 1) / 2], [0, max(w, h), (h - 1) / 2], [0, 0, 1]])
+        flags = (cv2.CALIB_USE_INTRINSIC_GUESS | cv2.CALIB_FIX_PRINCIPAL_POINT | cv2.CALIB_FIX_ASPECT_RATIO
+                 | cv2.CALIB_ZERO_TANGENT_DIST | cv2.CALIB_FIX_K3)
+        rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(
+            object_points, image_points, camera_res, initial_camera_matrix, np.zeros(5), flags=flags)
+        logger.info(f"Estimated intrinsics from {len(object_points)} captures with a reprojection error of "
+                    f"{rms:.2f}px: focal length {camera_matrix[0, 0]:.1f}px, distortion {dist_coeffs.ravel()}.")
+        return camera_matrix, dist_coeffs.reshape(-1)
+
+    @staticmethod
+    def _undistort(cam_coords: np.ndarray, camera_matrix: np.ndarray, dist_coeffs: np.ndarray) -> np.ndarray:
+        """
+        Removes lens distortion from an Nx2 array of coordinates in camera space
+        """
+        if len(cam_coords) == 0:
+            return cam_coords
+        return cv2.undistortPointsIter(cam_coords.reshape(-1, 1, 2), camera_matrix, dist_coeffs, None, camera_matrix,
+                                       UNDISTORT_CRITERIA).reshape(-1, 2)
+
+    @staticmethod
+    def _distort(cam_coords: np.ndarray, camera_matrix: np.ndarray, dist_coeffs: np.ndarray) -> np.ndarray:
+        """
+        Applies lens distortion to an Nx2 array of undistorted coordinates in camera space
+        """
+        if len(cam_coords) == 0:
+            return cam_coords
+        rays = cv2.convertPointsToHomogeneous(
+            cv2.undistortPoints(cam_coords.reshape(-1, 1, 2), camera_matrix, None)).astype(np.float64)
+        distorted, _ = cv2.projectPoints(rays, np.zeros(3), np.zeros(3), camera_matrix, dist_coeffs)
+        return distorted.reshape(-1, 2)
+
     @staticmethod
     def _detect_ArUcos(img: np.ndarray) -> dict[int, tuple[np.float32, np.float32]]:
         """
-        Detects ArUcos in an image and returns a dictionary of ids to coordinates
+        Detects ArUcos in an image and returns a dictionary of ids to coordinates (of their top-left corners).
+
+        Images taller than COARSE_HEIGHT are searched downscaled first, and then at full resolution only around the
+        markers and candidates found, which is much faster on large photos but still finds markers too small to decode
+        when downscaled.
         """
-        aruco_detector = aruco.ArucoDetector(dictionary=DICT, detectorParams=aruco.DetectorParameters())
-        corners, ids, _ = aruco_detector.detectMarkers(img)
+        aruco_detector = _get_aruco_detector()
+        if img.shape[0] > COARSE_HEIGHT:
+            corners, ids = Calibrator._detect_ArUcos_coarse_to_fine(img, aruco_detector)
+        else:
+            corners, ids, _ = aruco_detector.detectMarkers(img)
 
         if DISPLAY_RESULTS:
             cv2.imshow("Labeled Aruco Markers", aruco.drawDetectedMarkers(img, corners, ids))
@@ -49,6 +212,55 @@ class Calibrator:
             detected_coords[aruco_id] = np.float32(top_left_corner[0]), np.float32(top_left_corner[1])
         return detected_coords
 
+    @staticmethod
+    def _detect_ArUcos_coarse_to_fine(img: np.ndarray, aruco_detector: aruco.ArucoDetector) -> tuple[list, np.ndarray]:
+        """
+        Detects ArUcos in a downscaled copy of the image, then again at full resolution in the regions around every
+        marker and rejected candidate found. Returns the corners and ids like ArucoDetector.detectMarkers.
+        """
+        height, width = img.shape[:2]
+        scale = COARSE_HEIGHT / height
+        coarse_img = cv2.resize(img, (round(width * scale), COARSE_HEIGHT), interpolation=cv2.INTER_AREA)
+        coarse_corners, coarse_ids, rejected = _get_coarse_aruco_detector().detectMarkers(coarse_img)
+        candidates = list(coarse_corners)
+        if len(rejected) > 0 and len(coarse_corners) > 0:
+            # rejected candidates inside a decoded marker are just parts of it, which its own region covers
+            centres = np.array([candidate.reshape(-1, 2).mean(axis=0) for candidate in rejected])
+            boxes = np.array([(marker.reshape(-1, 2).min(axis=0), marker.reshape(-1, 2).max(axis=0))
+                              for marker in coarse_corners])
+            inside = ((centres[:, None] >= boxes[None, :, 0]) & (centres[:, None] <= boxes[None, :, 1])).all(axis=2)
+            candidates += [candidate for candidate, is_inside in zip(rejected, inside.any(axis=1)) if not is_inside]
+        else:
+            candidates += list(rejected)
+        if len(candidates) == 0:
+            # nothing that looks like a marker at all, so fall back to searching the whole image
+            corners, ids, _ = aruco_detector.detectMarkers(img)
+            return corners, ids
+
+        fine_corners: dict[int, np.ndarray] = {}
+        for candidate in candidates:
+            x_min, y_min = candidate.reshape(-1, 2).min(axis=0) / scale
+            x_max, y_max = candidate.reshape(-1, 2).max(axis=0) / scale
+            margin = max(x_max - x_min, y_max - y_min) * REFINE_MARGIN
+            left, top = max(int(x_min - margin), 0), max(int(y_min - margin), 0)
+            right, bottom = min(int(x_max + margin) + 1, width), min(int(y_max + margin) + 1, height)
+            corners, ids, _ = aruco_detector.detectMarkers(img[top:bottom, left:right])
+            if ids is None:
+                continue
+            for marker_corners, marker_id in zip(corners, ids.flatten()):
+                fine_corners.setdefault(int(marker_id), marker_corners + np.float32([left, top]))
+
+        # keep markers which were only decoded downscaled (e.g. blurry ones), at the downscaled precision
+        refined = len(fine_corners)
+        for marker_corners, marker_id in zip(coarse_corners, [] if coarse_ids is None else coarse_ids.flatten()):
+            fine_corners.setdefault(int(marker_id), ((marker_corners + 0.5) / scale - 0.5).astype(np.float32))
+
+        logger.info(f"Found {len(coarse_corners)} markers and {len(rejected)} candidates in the downscaled photo, "
+                    f"and {refined} markers at full resolution.")
+        if len(fine_corners) == 0:
+            return [], None
+        return list(fine_corners.values()), np.array([[marker_id] for marker_id in fine_corners], dtype=np.int32)
+
     @staticmethod
     def _get_transformation_matrix(
             from_coords: dict[int, tuple[np.float32, np.float32]],
@@ -76,10 +288,31 @@ class Calibrator:
 
     # Methods for doing transformations
 
-    def __init__(self, transformation_matrix: np.ndarray, camera_res: tuple[int, int]):
+    def __init__(self, transformation_matrix: np.ndarray, camera_res: tuple[int, int],
+                 camera_matrix: np.ndarray | None = None, dist_coeffs: np.ndarray | None = None):
+        """
+        :param transformation_matrix The transformation matrix from camera space to projector space, or a calibration
+        mesh as an array (see CalibrationMesh.to_array).
+        :param camera_res The resolution (width, height) of camera space.
+        :param camera_matrix The camera's intrinsic matrix, if its lens distortion should be removed (see
+        estimate_intrinsics). The transformation matrix must then have been calibrated with the same intrinsics.
+        :param dist_coeffs The camera's distortion coefficients, which must be given with the camera matrix.
+        """
+        self._mesh = (CalibrationMesh.from_array(transformation_matrix)
+                      if CalibrationMesh.is_mesh_array(transformation_matrix) else None)
+        """If set, camera coordinates are mapped to projector space with the mesh instead of the matrix."""
+        if self._mesh is not None:
+            # only used to map projector coordinates back to camera space, which is approximate for a mesh
+            transformation_matrix = self._mesh.approximate_matrix() @ np.diag([1 / camera_res[0], 1 / camera_res[1], 1])
         self._transformation_matrix = transformation_matrix
         self._inverse_transformation_matrix = np.linalg.inv(transformation_matrix)
         self._camera_res = camera_res
+        self._norm_to_proj_matrix = (np.asarray(transformation_matrix, dtype=np.float64)
+                                     @ np.diag([camera_res[0], camera_res[1], 1.0]))
+        """Combines normalization and the transformation matrix, so normalized coords can be transformed in one step."""
+        self._camera_matrix = camera_matrix
+        self._dist_coeffs = dist_coeffs
+        """Lens distortion is only removed from the handful of points transformed, rather than from whole frames."""
 
     def proj_to_cam(self, proj_coords: tuple[int, int]) -> tuple[np.float32, np.float32]:
         """
@@ -87,6 +320,9 @@ class Calibrator:
         """
         rotated_vector = np.array(proj_coords, np.float32).reshape(-1, 1, 2)
         transformed_vector = cv2.transform(rotated_vector, self._inverse_transformation_matrix)[0][0]
+        if self._camera_matrix is not None:
+            transformed_vector = self._distort(np.array(transformed_vector[:2], np.float64).reshape(1, 2),
+                                               self._camera_matrix, self._dist_coeffs)[0]
         return np.float32(transformed_vector[0]), np.float32(transformed_vector[1])
 
     def proj_to_norm(self, proj_coords: tuple[int, int]) -> tuple[float, float]:
@@ -101,6 +337,13 @@ class Calibrator:
         """
         Transforms a coordinate in camera space to a coordinate in projector space
         """
+        if self._camera_matrix is not None:
+            cam_coords = self._undistort(np.array(cam_coords, np.float64).reshape(1, 2),
+                                         self._camera_matrix, self._dist_coeffs)[0]
+        if self._mesh is not None:
+            norm_coords = np.array(cam_coords, np.float64).reshape(1, 2) / self._camera_res
+            proj_coords = self._mesh.norm_to_proj_batch(norm_coords)[0]
+            return int(proj_coords[0]), int(proj_coords[1])
         rotated_vector = np.array(cam_coords, np.float32).reshape(-1, 1, 2)
         transformed_vector = cv2.transform(rotated_vector, self._transformation_matrix)[0][0]
         return int(transformed_vector[0]), int(transformed_vector[1])
@@ -111,3 +354,20 @@ class Calibrator:
         """
         cam_coords = (norm_coords[0] * self._camera_res[0], norm_coords[1] * self._camera_res[1])
         return self.cam_to_proj(cam_coords)
+
+    def norm_to_proj_batch(self, norm_coords: np.ndarray) -> np.ndarray:
+        """
+        Transforms an Nx2 array of normalized coordinates in camera space to an Nx2 array of coordinates
+        in projector space. Equivalent to calling norm_to_proj on every row, but done in a single matrix product
+        (or lookup, for a mesh).
+        """
+        norm_coords = np.asarray(norm_coords, dtype=np.float64).reshape(-1, 2)
+        if self._camera_matrix is not None:
+            cam_coords = self._undistort(norm_coords * self._camera_res, self._camera_matrix, self._dist_coeffs)
+            if self._mesh is not None:
+                return self._mesh.norm_to_proj_batch(cam_coords / self._camera_res)
+            matrix = np.asarray(self._transformation_matrix, dtype=np.float64)
+            return cam_coords @ matrix[:2, :2].T + matrix[:2, 2]
+        if self._mesh is not None:
+            return self._mesh.norm_to_proj_batch(norm_coords)
+        return norm_coords @ self._norm_to_proj_matrix[:2, :2].T + self._norm_to_proj_matrix[:2, 2]
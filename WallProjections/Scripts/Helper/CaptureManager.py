@@ -0,0 +1,275 @@
+import threading
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.VideoCapture import START_TIMEOUT, VideoCapture
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+CLOSE_DELAY: float = 5
+"""The number of seconds a camera is kept open after its last subscription is released, so that switching between
+e.g. calibration and detection doesn't have to wait for the camera to close and reopen."""
+
+
+class _SharedCapture:
+    def __init__(self, target: int | str, video_capture: VideoCapture):
+        self.target: int | str = target
+        self.video_capture: VideoCapture = video_capture
+        self.subscribers: int = 0
+        self.close_timer: threading.Timer | None = None
+        self.transition: threading.Event | None = threading.Event()
+        """While the video capture is starting or stopping, an event which is set once it has (None while it runs)."""
+
+
+class CaptureSubscription:
+    """
+    A subscription to a video capture opened by a CaptureManager. The video capture stays open until every
+    subscription to it is released, so release it (or use it as a context manager) once it's no longer needed.
+
+    The video capture is shared, so subscribers must not start or stop it themselves.
+    """
+
+    def __init__(self, manager: "CaptureManager", shared: _SharedCapture, is_shared: bool):
+        self._manager: CaptureManager = manager
+        self._shared: _SharedCapture = shared
+        self._is_shared: bool = is_shared
+        self._released: bool = False
+
+    @property
+    def video_capture(self) -> VideoCapture:
+        """The running video capture, which delivers frames in RGB."""
+        return self._shared.video_capture
+
+    def release(self) -> None:
+        """Unsubscribe from the video capture. Does nothing if the subscription has already been released."""
+        if not self._released:
+            self._released = True
+            self._manager._release(self._shared, self._is_shared)
+
+    def __enter__(self) -> "CaptureSubscription":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+
+class CaptureManager:
+    """
+    Hands out reference-counted subscriptions to video captures, keeping at most one open per target, so that
+    e.g. calibration and hotspot detection can use the same camera at once. Photos are taken from the live stream if
+    the camera is already open.
+
+    Shared video captures always deliver frames in RGB (which is what hand tracking needs). Replayed video files
+    (see VideoCapture) are paced by their consumer, so every subscription to one gets a video capture of its own.
+    """
+
+    def __init__(self, video_capture_factory: Callable[..., VideoCapture], close_delay: float = CLOSE_DELAY):
+        """
+        :param video_capture_factory Creates a video capture for a target, like video_capture_factory.getVideoCapture.
+        :param close_delay The number of seconds to keep a video capture open after its last subscription is released.
+        """
+        self._video_capture_factory: Callable[..., VideoCapture] = video_capture_factory
+        self._close_delay: float = close_delay
+        self._lock: threading.Lock = threading.Lock()
+        self._captures: dict[int | str, _SharedCapture] = {}
+
+    def subscribe(self, target: int | str, low_latency: bool = False, replay: bool = False) -> CaptureSubscription:
+        """
+        Subscribes to the video capture of the given target, opening and starting it if it isn't open yet.
+        Throws a RuntimeError if it fails to start.
+
+        :param low_latency Whether to capture in low-latency mode if the video capture has to be opened (an open one
+        keeps the mode it was opened with).
+        :param replay Whether to replay video files frame by frame if the video capture has to be opened, in which case
+        the subscription gets a video capture of its own.
+        """
+        with self._lock:
+            shared = self._settled(target)
+            if shared is not None:
+                if shared.close_timer is not None:
+                    shared.close_timer.cancel()
+                    shared.close_timer = None
+                if low_latency != shared.video_capture.low_latency:
+                    logger.info(f"Video capture {target} is already open with low_latency="
+                                f"{shared.video_capture.low_latency}; sharing it as it is.")
+                shared.subscribers += 1
+                return CaptureSubscription(self, shared, True)
+
+            video_capture = self._video_capture_factory(target, low_latency=low_latency, rgb=True, replay=replay)
+            shared = _SharedCapture(target, video_capture)
+            shared.subscribers = 1
+            if not video_capture.replay:
+                # concurrent subscribers to the same target wait for it to start rather than opening it twice
+                self._captures[target] = shared
+
+        self._start(shared)
+        return CaptureSubscription(self, shared, not video_capture.replay)
+
+    def _settled(self, target: int | str) -> _SharedCapture | None:
+        """
+        Returns the running shared video capture of the given target, or None if it isn't open, waiting for it to finish
+        starting or stopping first. Must be called while holding the lock, which is released while waiting.
+        """
+        while True:
+            shared = self._captures.get(target)
+            if shared is None or shared.transition is None:
+                return shared
+            transition = shared.transition
+            # starting and stopping can take a while, so other targets mustn't have to wait for the lock meanwhile
+            self._lock.release()
+            try:
+                transition.wait()
+            finally:
+                self._lock.acquire()
+
+    def _start(self, shared: _SharedCapture) -> None:
+        """Starts a video capture created by subscribe. Must be called without holding the lock."""
+        try:
+            shared.video_capture.start()
+        except BaseException:
+            with self._lock:
+                if self._captures.get(shared.target) is shared:
+                    del self._captures[shared.target]
+            shared.transition.set()
+            raise
+        with self._lock:
+            transition, shared.transition = shared.transition, None
+        transition.set()
+
+    def _release(self, shared: _SharedCapture, is_shared: bool) -> None:
+        if not is_shared:
+            shared.video_capture.stop()
+            return
+        with self._lock:
+            if self._captures.get(shared.target) is not shared or shared.transition is not None:
+                return  # already closed (or being closed) by close_all
+            shared.subscribers -= 1
+            if shared.subscribers > 0:
+                return
+            if self._close_delay > 0:
+                shared.close_timer = threading.Timer(self._close_delay, self._close_if_unused, args=(shared,))
+                shared.close_timer.daemon = True  # so that a pending close doesn't keep the interpreter alive
+                shared.close_timer.start()
+                return
+            self._begin_close(shared)
+        self._finish_close(shared)
+
+    def _close_if_unused(self, shared: _SharedCapture) -> None:
+        with self._lock:
+            # a timer which was cancelled (by a new subscriber) while waiting for the lock must not close the capture
+            if shared.subscribers > 0 or shared.close_timer is not threading.current_thread():
+                return
+            self._begin_close(shared)
+        self._finish_close(shared)
+
+    @staticmethod
+    def _begin_close(shared: _SharedCapture) -> None:
+        """
+        Marks a running shared video capture as stopping, so that new subscribers wait for it to stop. Must be called
+        while holding the lock, followed by _finish_close once it's released.
+        """
+        if shared.close_timer is not None:
+            shared.close_timer.cancel()
+            shared.close_timer = None
+        shared.transition = threading.Event()
+
+    def _finish_close(self, shared: _SharedCapture) -> None:
+        """Stops a shared video capture marked by _begin_close. Must be called without holding the lock."""
+        try:
+            shared.video_capture.stop()
+        finally:
+            with self._lock:
+                del self._captures[shared.target]
+            shared.transition.set()
+
+    def is_open(self, target: int | str) -> bool:
+        """
+        Whether a video capture of the given target is open (including one which is starting or about to be closed,
+        or one taking full-resolution photos).
+        """
+        with self._lock:
+            return target in self._captures
+
+    def take_photo(self, target: int | str, full_resolution: bool = False) -> np.ndarray:
+        """
+        Returns a photo in BGR from the given target. If its video capture is already open, this is the next frame of
+        the live stream, otherwise the camera is opened (and kept open for a while, see CLOSE_DELAY).
+
+        :param full_resolution Whether to take the photo at the highest resolution the camera supports if it isn't
+        open already (check the photo's size, as a live stream is at the normal resolution).
+        """
+        return self.take_photos(target, 1, full_resolution)[0]
+
+    def take_photos(self, target: int | str, count: int, full_resolution: bool = False) -> list[np.ndarray]:
+        """
+        Returns a burst of photos in BGR from consecutive frames of the given target, e.g. to calibrate from several
+        frames. If its video capture is already open, the burst starts with the next frame of the live stream.
+        Throws a RuntimeError if the video capture stops before the burst is complete.
+
+        :param full_resolution Whether to take the photos at the highest resolution the camera supports if it isn't
+        open already (check the photos' size, as a live stream is at the normal resolution).
+        """
+        if count < 1:
+            raise ValueError(f"Error taking photos: Count {count} is not positive.")
+
+        if full_resolution:
+            with self._lock:
+                shared = None
+                if self._settled(target) is None:
+                    # every other user wants the normal resolution, so this video capture isn't shared, but it's
+                    # registered as starting until it's stopped, so that subscribers wait rather than open the camera
+                    video_capture = self._video_capture_factory(target, replay=True, full_resolution=True)
+                    shared = _SharedCapture(target, video_capture)
+                    self._captures[target] = shared
+            if shared is not None:
+                try:
+                    video_capture.start()
+                    try:
+                        return self._take_photos(video_capture, count, video_capture.frame_number - 1)
+                    finally:
+                        video_capture.stop()
+                finally:
+                    with self._lock:
+                        del self._captures[target]
+                    shared.transition.set()
+
+        was_open = self.is_open(target)
+        # there's no need to play video files in real time for a photo
+        with self.subscribe(target, replay=True) as subscription:
+            video_capture = subscription.video_capture
+            # a freshly opened stream's first frame is fresh enough
+            return self._take_photos(video_capture, count, video_capture.frame_number - (0 if was_open else 1))
+
+    @staticmethod
+    def _take_photos(video_capture: VideoCapture, count: int, after: int) -> list[np.ndarray]:
+        """Copies the count frames after frame number after, in BGR."""
+        photos = []
+        while len(photos) < count:
+            frame = video_capture.checkout_next_frame(START_TIMEOUT, after=after)
+            if frame is None:
+                raise RuntimeError(f"Error taking photos: Video capture {video_capture.target} stopped after "
+                                   f"{len(photos)} of {count} photos.")
+            with frame:
+                after = frame.frame_number
+                photos.append(cv2.cvtColor(frame.image, cv2.COLOR_RGB2BGR) if video_capture.rgb
+                              else frame.image.copy())
+        return photos
+
+    def close_all(self) -> None:
+        """
+        Stops every shared video capture straight away, whether or not it's still subscribed to, after waiting for
+        those which are starting or stopping.
+        """
+        with self._lock:
+            for target in list(self._captures):
+                self._settled(target)
+            # skipping any which started opening while waiting
+            closing = [shared for shared in self._captures.values() if shared.transition is None]
+            for shared in closing:
+                shared.subscribers = 0
+                self._begin_close(shared)
+        for shared in closing:
+            self._finish_close(shared)
@@ -0,0 +1,320 @@
+import contextlib
+import multiprocessing
+import multiprocessing.spawn
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.synchronize import Event, Lock
+from typing import Iterator
+
+import numpy as np
+
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.Hotspot import HotspotSet
+from Scripts.Helper.HotspotDetector import HotspotDetector
+from Scripts.Helper.PipelineStats import PipelineStats
+from Scripts.Helper.logger import get_logger, setup_logger
+
+logger = get_logger()
+
+MESSAGE_TIMEOUT: float = 1
+"""The maximum number of seconds to wait for a message from the detection process before checking it's still alive."""
+
+STATS_INTERVAL: float = 1
+"""The number of seconds between every time the detection process sends its pipeline stats to the host."""
+
+
+class SharedFrame:
+    """
+    A frame in shared memory, which the detection process writes captured frames into (when the host asks for one)
+    and the host process can read from without the frame being pickled.
+    """
+
+    _HEADER_SIZE = 64
+    """The number of bytes before the image, which holds the frame number."""
+
+    def __init__(self, shape: tuple[int, ...], lock: Lock, name: str | None = None):
+        """
+        Creates a new shared frame of the given shape if name is None, otherwise attaches to an existing one.
+        """
+        size = self._HEADER_SIZE + int(np.prod(shape))
+        self._shared_memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self._owner: bool = name is None
+        self._lock: Lock = lock
+        self.name: str = self._shared_memory.name
+        self.shape: tuple[int, ...] = shape
+        self._frame_number = np.ndarray((1,), dtype=np.int64, buffer=self._shared_memory.buf)
+        self._image = np.ndarray(shape, dtype=np.uint8, buffer=self._shared_memory.buf, offset=self._HEADER_SIZE)
+        if self._owner:
+            self._frame_number[0] = 0
+
+    def write(self, frame_number: int, image: np.ndarray) -> None:
+        with self._lock:
+            np.copyto(self._image, image)
+            self._frame_number[0] = frame_number
+
+    def read(self) -> tuple[int, np.ndarray]:
+        """
+        Returns the frame number and a copy of the latest frame (frame number 0 if nothing has been written yet)
+        """
+        with self._lock:
+            return int(self._frame_number[0]), self._image.copy()
+
+    def close(self) -> None:
+        """
+        Detaches from the shared memory, freeing it if this is the process which created it
+        """
+        # the arrays must not outlive the buffer they point to
+        del self._frame_number
+        del self._image
+        self._shared_memory.close()
+        if self._owner:
+            self._shared_memory.unlink()
+
+
+class QueueEventHandler(EventHandler):
+    """
+    Forwards hotspot events from the detection process to the host process through a queue.
+    """
+
+    def __init__(self, messages: multiprocessing.Queue):
+        self._messages = messages
+
+    def OnHotspotPressed(self, hotspot_id):
+        self._messages.put(("pressed", hotspot_id))
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        self._messages.put(("unpressed", hotspot_id))
+
+
+def _python_executable() -> str:
+    """
+    Returns the path of the Python interpreter. When running inside the .NET host through pythonnet,
+    sys.executable is the host's executable, so child processes can't be spawned with it.
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    if os.name == 'nt':
+        return os.path.join(sys.base_exec_prefix, "python.exe")
+    return os.path.join(sys.base_exec_prefix, "bin", f"python{sys.version_info.major}.{sys.version_info.minor}")
+
+
+@contextlib.contextmanager
+def _spawn_executable() -> Iterator[None]:
+    """
+    Makes multiprocessing spawn child processes (including its resource tracker) with the Python interpreter within
+    the with block when running inside the .NET host, then restores the previous executable, as it's global.
+    """
+    executable = _python_executable()
+    if executable == sys.executable:
+        yield
+        return
+    previous = multiprocessing.spawn.get_executable()
+    multiprocessing.spawn.set_executable(executable)
+    try:
+        yield
+    finally:
+        multiprocessing.spawn.set_executable(previous)
+
+
+def _detection_process_main(
+        video_capture_target: int | str,
+        calibration_matrix: np.ndarray,
+        hotspots_coords: dict[int, tuple[float, float, float]],
+        messages: multiprocessing.Queue,
+        updates: multiprocessing.Queue,
+        stop_event: Event,
+        frame_requested: Event,
+        frame_lock: Lock,
+        collect_stats: bool
+) -> None:
+    """
+    The entry point of the detection process. Sends events, errors, pipeline stats and the shared frame's details
+    to the host through messages, followed by None once detection has stopped. Applies the hotspot and calibration
+    updates received through updates. The next captured frame is written into the shared frame whenever
+    frame_requested is set.
+    """
+    setup_logger("hotspot_detection_process")
+    shared_frame: SharedFrame | None = None
+    stats = PipelineStats() if collect_stats else None
+    stats_sent = time.monotonic()
+
+    def on_frame(frame_number: int, image: np.ndarray) -> None:
+        nonlocal shared_frame, stats_sent
+        if stats is not None and time.monotonic() - stats_sent >= STATS_INTERVAL:
+            messages.put(("stats", stats.get_stats()))
+            stats_sent = time.monotonic()
+        # only copy the frame into shared memory when the host wants one, rather than on every frame
+        if not frame_requested.is_set():
+            return
+        frame_requested.clear()
+        if shared_frame is None or shared_frame.shape != image.shape:
+            if shared_frame is not None:
+                shared_frame.close()
+            shared_frame = SharedFrame(image.shape, frame_lock)
+            messages.put(("frame", shared_frame.name, image.shape))
+        shared_frame.write(frame_number, image)
+
+    def apply_updates() -> None:
+        for kind, value in iter(updates.get, None):
+            if kind == "hotspots":
+                detector.update_hotspots(HotspotSet.from_coords(QueueEventHandler(messages), value))
+            elif kind == "calibration":
+                detector.update_calibration(value)
+
+    detector = HotspotDetector(video_capture_target, calibration_matrix,
+                               HotspotSet.from_coords(QueueEventHandler(messages), hotspots_coords),
+                               frame_listener=on_frame, stats=stats)
+    threading.Thread(target=lambda: (stop_event.wait(), detector.stop()), daemon=True).start()
+    threading.Thread(target=apply_updates, daemon=True).start()
+
+    try:
+        detector.run()
+    except Exception as e:
+        logger.exception("Hotspot detection process failed.")
+        messages.put(("error", str(e)))
+    finally:
+        if stats is not None:
+            messages.put(("stats", stats.get_stats()))
+        messages.put(None)
+        messages.close()
+        messages.join_thread()  # make sure every message has been sent before freeing the shared frame
+        if shared_frame is not None:
+            shared_frame.close()
+
+
+class DetectionProcess:
+    """
+    Runs hotspot detection (capture and inference) in a child process, so that it doesn't compete for the GIL with the
+    host process. Only hotspot events cross back to the host, where they are passed on to the event handler.
+    The latest frame is shared through shared memory.
+    """
+
+    def __init__(
+            self,
+            video_capture_target: int | str,
+            event_handler: EventHandler,
+            calibration_matrix: np.ndarray,
+            hotspots_coords: dict[int, tuple[float, float, float]],
+            collect_stats: bool = False
+    ):
+        """
+        :param collect_stats Whether the detection process should record pipeline stats (see get_stats).
+        """
+        self._event_handler: EventHandler = event_handler
+        context = multiprocessing.get_context("spawn")
+        # creating the first lock may start the resource tracker
+        with _spawn_executable():
+            self._messages: multiprocessing.Queue = context.Queue()
+            self._updates: multiprocessing.Queue = context.Queue()
+            self._stop_event: Event = context.Event()
+            self._frame_requested: Event = context.Event()
+            self._frame_lock: Lock = context.Lock()
+        # updates sent after the detection process has exited mustn't stop the host from exiting
+        self._updates.cancel_join_thread()
+        self._shared_frame: SharedFrame | None = None
+        self._shared_frame_lock: threading.Lock = threading.Lock()
+        self._stats: dict[str, dict[str, float]] = {}
+        self._process = context.Process(
+            target=_detection_process_main,
+            args=(video_capture_target, calibration_matrix, hotspots_coords,
+                  self._messages, self._updates, self._stop_event, self._frame_requested, self._frame_lock,
+                  collect_stats),
+            name="hotspot_detection",
+            daemon=True
+        )
+
+    def run(self) -> None:
+        """
+        Starts the detection process and passes its events on to the event handler until it stops. Blocks.
+        Throws a RuntimeError if the detection process fails.
+        """
+        logger.info("Starting hotspot detection process.")
+        with _spawn_executable():
+            self._process.start()
+        error: str | None = None
+        try:
+            while True:
+                try:
+                    message = self._messages.get(timeout=MESSAGE_TIMEOUT)
+                except queue.Empty:
+                    if not self._process.is_alive():
+                        error = f"Hotspot detection process exited unexpectedly (exit code {self._process.exitcode})."
+                        break
+                    continue
+
+                if message is None:
+                    break
+                self._handle_message(message)
+                if message[0] == "error":
+                    error = message[1]
+        finally:
+            self._process.join()
+            with self._shared_frame_lock:
+                if self._shared_frame is not None:
+                    self._shared_frame.close()
+                    self._shared_frame = None
+        logger.info("Hotspot detection process stopped.")
+
+        if error is not None:
+            raise RuntimeError(f"Error running hotspot detection process: {error}")
+
+    def _handle_message(self, message: tuple) -> None:
+        kind = message[0]
+        if kind == "pressed":
+            self._event_handler.OnHotspotPressed(message[1])
+        elif kind == "unpressed":
+            self._event_handler.OnHotspotUnpressed(message[1])
+        elif kind == "stats":
+            self._stats = message[1]
+        elif kind == "frame":
+            with self._shared_frame_lock:
+                if self._shared_frame is not None:
+                    self._shared_frame.close()
+                    self._shared_frame = None
+                try:
+                    self._shared_frame = SharedFrame(message[2], self._frame_lock, name=message[1])
+                except FileNotFoundError:
+                    pass  # the detection process has already freed it, so there's no frame to share
+
+    def get_latest_frame(self) -> tuple[int, np.ndarray] | None:
+        """
+        Returns the frame number and a copy of the last frame (in RGB) the detection process shared, or None if it
+        hasn't shared one yet, and asks it to share the next frame it captures. Frames are only copied into shared
+        memory when asked for, so the frame returned is the one captured after the previous call.
+        """
+        self._frame_requested.set()
+        with self._shared_frame_lock:
+            if self._shared_frame is None:
+                return None
+            return self._shared_frame.read()
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the latest pipeline stats sent by the detection process (see PipelineStats.get_stats),
+        or an empty dictionary if there aren't any yet
+        """
+        return self._stats
+
+    def update_hotspots(self, hotspots_coords: dict[int, tuple[float, float, float]]) -> None:
+        """
+        Replaces the hotspots in the detection process between frames (see HotspotDetector.update_hotspots)
+        """
+        self._updates.put(("hotspots", hotspots_coords))
+
+    def update_calibration(self, calibration_matrix: np.ndarray) -> None:
+        """
+        Replaces the calibration matrix in the detection process between frames, keeping the camera's intrinsics
+        (see HotspotDetector.update_calibration)
+        """
+        self._updates.put(("calibration", calibration_matrix))
+
+    def stop(self) -> None:
+        """
+        Makes the detection process stop after its current frame, which then makes run return.
+        """
+        self._stop_event.set()
+        self._updates.put(None)
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.PipelineStats import PipelineStats
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+
+class EventDispatcher(EventHandler):
+    """
+    Queues hotspot events and delivers them to another event handler from a dedicated thread, so that a slow handler
+    (e.g. one which starts a video) never stalls frame processing.
+
+    Events are delivered in order for each hotspot. If a hotspot is pressed, unpressed and pressed again before the
+    handler gets to it, the burst is coalesced into a single press (a tap, i.e. a press followed by an unpress,
+    is still delivered in full).
+    """
+
+    def __init__(self, event_handler: EventHandler, stats: PipelineStats | None = None):
+        """
+        :param event_handler The event handler to deliver events to.
+        :param stats If set, the delivery latency of every event is recorded in it.
+        """
+        self._event_handler: EventHandler = event_handler
+        self._stats: PipelineStats | None = stats
+        self._condition: threading.Condition = threading.Condition()
+        self._pending: dict[int, list[tuple[bool, float]]] = {}
+        """The undelivered events (pressed or not, and the time they were queued) of every hotspot with any."""
+        self._order: deque[int] = deque()
+        """The hotspots with undelivered events, in the order their first undelivered event was queued."""
+        self._stopping: bool = False
+        self._thread: threading.Thread | None = None
+
+        self._max_queue_depth: int = 0
+        self._delivered_events: int = 0
+        self._coalesced_events: int = 0
+        self._total_delivery_latency: float = 0
+        self._max_delivery_latency: float = 0
+
+    def start(self) -> None:
+        self._stopping = False
+        self._thread = threading.Thread(target=self._deliver_events, name="hotspot_event_dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Delivers the events which are still queued, then stops the dispatcher thread
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        logger.info(f"Event dispatcher stopped: {self.get_stats()}")
+
+    def OnHotspotPressed(self, hotspot_id):
+        self._queue_event(hotspot_id, True)
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        self._queue_event(hotspot_id, False)
+
+    def _queue_event(self, hotspot_id: int, pressed: bool) -> None:
+        with self._condition:
+            pending = self._pending.get(hotspot_id)
+            if pending is None:
+                self._pending[hotspot_id] = [(pressed, time.monotonic())]
+                self._order.append(hotspot_id)
+            elif len(pending) >= 2 and pending[-2][0] == pressed:
+                # e.g. press -> unpress -> press: drop the unpress and keep the original press (and its time)
+                pending.pop()
+                self._coalesced_events += 2
+            else:
+                pending.append((pressed, time.monotonic()))
+            self._max_queue_depth = max(self._max_queue_depth, self._queue_depth())
+            self._condition.notify()
+
+    def _deliver_events(self) -> None:
+        while True:
+            with self._condition:
+                while len(self._order) == 0 and not self._stopping:
+                    self._condition.wait()
+                if len(self._order) == 0:
+                    return
+                hotspot_id = self._order.popleft()
+                events = self._pending.pop(hotspot_id)
+
+            # the handler is called without holding the lock, so detection can keep queueing events
+            for pressed, queued_time in events:
+                try:
+                    if pressed:
+                        self._event_handler.OnHotspotPressed(hotspot_id)
+                    else:
+                        self._event_handler.OnHotspotUnpressed(hotspot_id)
+                except Exception:
+                    logger.exception(f"Error handling event of hotspot {hotspot_id}.")
+                latency = time.monotonic() - queued_time
+                if self._stats is not None:
+                    self._stats.record("event_delivery", latency)
+                with self._condition:
+                    self._delivered_events += 1
+                    self._total_delivery_latency += latency
+                    self._max_delivery_latency = max(self._max_delivery_latency, latency)
+
+    def _queue_depth(self) -> int:
+        return sum(len(events) for events in self._pending.values())
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of events waiting to be delivered."""
+        with self._condition:
+            return self._queue_depth()
+
+    def get_stats(self) -> dict[str, float]:
+        """
+        Returns the queue depth (current and maximum), the number of delivered and coalesced events,
+        and the average and maximum delivery latency in seconds
+        """
+        with self._condition:
+            return {
+                "queue_depth": self._queue_depth(),
+                "max_queue_depth": self._max_queue_depth,
+                "delivered_events": self._delivered_events,
+                "coalesced_events": self._coalesced_events,
+                "average_delivery_latency": (self._total_delivery_latency / self._delivered_events
+                                             if self._delivered_events > 0 else 0),
+                "max_delivery_latency": self._max_delivery_latency,
+            }
@@ -0,0 +1,189 @@
+import os
+import threading
+
+import mediapipe as mp
+import numpy as np
+
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+FINGERTIP_INDICES: tuple[int, ...] = (4, 8, 12, 16, 20)
+"""The indices for the thumb fingertip, index fingertip, ring fingertip, etc.
+
+This shouldn't need to be changed unless there's a breaking change upstream in mediapipe."""
+
+HAND_LANDMARKER_MODEL_PATH: str = os.path.abspath(__file__ + "/../../Models/hand_landmarker.task")
+"""The default path of the model asset used by the MediaPipe Tasks backend.
+
+The asset isn't bundled; see Scripts/Models/README.md for where to download it. Anything in Scripts/Models is copied
+into the build."""
+
+
+def landmarks_to_array(multi_hand_landmarks) -> np.ndarray:
+    """
+    Collects the normalized fingertip coordinates of every detected hand into an Nx2 array
+    (in the same order as FINGERTIP_INDICES within each hand).
+
+    Accepts either the legacy solutions API's multi_hand_landmarks or the Tasks API's hand_landmarks.
+    """
+    count = len(multi_hand_landmarks) * len(FINGERTIP_INDICES) * 2
+    coords = np.fromiter((coord for hand in multi_hand_landmarks
+                          for landmark in (_landmark_list(hand)[i] for i in FINGERTIP_INDICES)
+                          for coord in (landmark.x, landmark.y)),
+                         dtype=np.float32, count=count)
+    return coords.reshape(-1, 2)
+
+
+def _landmark_list(hand) -> list:
+    # the solutions API wraps the landmarks in a protobuf message, the Tasks API gives them as a list
+    return hand.landmark if hasattr(hand, "landmark") else hand
+
+
+class HandTracker:
+    """
+    The common interface of the hand-tracking backends.
+
+    Frames are submitted with submit, and the fingertips found in them are collected with get_results. Synchronous
+    backends have the result of a frame ready as soon as submit returns; asynchronous ones deliver it later,
+    so that capturing the next frame and tracking hands in the previous one can overlap.
+    """
+
+    def submit(self, image_rgb: np.ndarray, timestamp_ms: int) -> int:
+        """
+        Submits a contiguous RGB frame for hand tracking. Timestamps must be increasing.
+        The image can be reused as soon as this returns.
+
+        Returns the timestamp the frame was submitted with, which its result will have. Backends may bump the
+        timestamp to keep timestamps strictly increasing.
+        """
+        raise NotImplementedError
+
+    def get_results(self) -> list[tuple[int, np.ndarray]]:
+        """
+        Returns the results which have become available since the last call, in timestamp order, as pairs of the
+        frame's timestamp and an Nx2 array of fingertip coordinates normalized to the submitted image
+        (empty if no hands were found).
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        raise NotImplementedError
+
+
+class SolutionsHandTracker(HandTracker):
+    """
+    Tracks hands synchronously using the legacy MediaPipe solutions API (mp.solutions.hands).
+    """
+
+    def __init__(
+            self,
+            max_num_hands: int,
+            min_detection_confidence: float,
+            min_tracking_confidence: float,
+            model_complexity: int = 1
+    ):
+        self._hands_model = mp.solutions.hands.Hands(max_num_hands=max_num_hands,
+                                                     model_complexity=model_complexity,
+                                                     min_detection_confidence=min_detection_confidence,
+                                                     min_tracking_confidence=min_tracking_confidence)
+        self._results: list[tuple[int, np.ndarray]] = []
+
+    def submit(self, image_rgb: np.ndarray, timestamp_ms: int) -> int:
+        model_output = self._hands_model.process(image_rgb)
+        # noinspection PyUnresolvedReferences
+        if hasattr(model_output, "multi_hand_landmarks") and model_output.multi_hand_landmarks is not None:
+            self._results.append((timestamp_ms, landmarks_to_array(model_output.multi_hand_landmarks)))
+        else:
+            self._results.append((timestamp_ms, np.empty((0, 2), dtype=np.float32)))
+        return timestamp_ms
+
+    def get_results(self) -> list[tuple[int, np.ndarray]]:
+        results, self._results = self._results, []
+        return results
+
+    def close(self) -> None:
+        self._hands_model.close()
+
+
+class TasksHandTracker(HandTracker):
+    """
+    Tracks hands asynchronously using the MediaPipe Tasks HandLandmarker in live-stream mode.
+
+    Frames are tracked on MediaPipe's own thread and the results arrive through a callback. If a frame is submitted
+    while the previous one is still being tracked, MediaPipe drops it rather than queueing it up.
+    """
+
+    def __init__(
+            self,
+            max_num_hands: int,
+            min_detection_confidence: float,
+            min_tracking_confidence: float,
+            model_asset_path: str = HAND_LANDMARKER_MODEL_PATH,
+            delegate: mp.tasks.BaseOptions.Delegate | None = None
+    ):
+        """
+        :param model_asset_path The path of the HandLandmarker model asset (.task file) to use.
+        :param delegate Whether to run the model on the CPU or GPU, or None to let MediaPipe choose.
+        """
+        if not os.path.isfile(model_asset_path):
+            raise RuntimeError(f"Error initialising hand-tracking model: Model asset {model_asset_path} not found.")
+
+        self._results: list[tuple[int, np.ndarray]] = []
+        self._results_lock: threading.Lock = threading.Lock()
+        self._last_timestamp_ms: int = -1
+
+        options = mp.tasks.vision.HandLandmarkerOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_path=model_asset_path, delegate=delegate),
+            running_mode=mp.tasks.vision.RunningMode.LIVE_STREAM,
+            num_hands=max_num_hands,
+            min_hand_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            result_callback=self._on_result
+        )
+        self._hand_landmarker = mp.tasks.vision.HandLandmarker.create_from_options(options)
+
+    def submit(self, image_rgb: np.ndarray, timestamp_ms: int) -> int:
+        # MediaPipe rejects timestamps which aren't strictly increasing
+        timestamp_ms = max(timestamp_ms, self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)  # copies the frame
+        self._hand_landmarker.detect_async(image, timestamp_ms)
+        return timestamp_ms
+
+    def _on_result(self, result, output_image: mp.Image, timestamp_ms: int) -> None:
+        fingertips = landmarks_to_array(result.hand_landmarks)
+        with self._results_lock:
+            self._results.append((timestamp_ms, fingertips))
+
+    def get_results(self) -> list[tuple[int, np.ndarray]]:
+        with self._results_lock:
+            results, self._results = self._results, []
+        return results
+
+    def close(self) -> None:
+        self._hand_landmarker.close()
+
+
+def create_hand_tracker(
+        backend: str,
+        max_num_hands: int,
+        min_detection_confidence: float,
+        min_tracking_confidence: float,
+        model_complexity: int = 1,
+        model_asset_path: str = HAND_LANDMARKER_MODEL_PATH,
+        delegate: str | None = None
+) -> HandTracker:
+    """
+    Creates a hand tracker using the given backend: "solutions" for the legacy synchronous API, or "tasks" for the
+    asynchronous Tasks HandLandmarker. The model complexity is only used by the solutions backend, and the model asset
+    path and delegate ("cpu", "gpu", or None to let MediaPipe choose) only by the Tasks backend.
+    """
+    if backend == "solutions":
+        return SolutionsHandTracker(max_num_hands, min_detection_confidence, min_tracking_confidence, model_complexity)
+    if backend == "tasks":
+        if delegate is not None and delegate.upper() not in mp.tasks.BaseOptions.Delegate.__members__:
+            raise ValueError(f"Unknown hand-tracking delegate {delegate}.")
+        return TasksHandTracker(max_num_hands, min_detection_confidence, min_tracking_confidence, model_asset_path,
+                                None if delegate is None else mp.tasks.BaseOptions.Delegate[delegate.upper()])
+    raise ValueError(f"Unknown hand-tracking backend {backend}.")
@@ -1,13 +1,32 @@
-from typing import Tuple
+import time
+from typing import Iterable, Tuple
+
+import numpy as np
 
 from Scripts.Helper.EventHandler import EventHandler
 from Scripts.Helper.logger import get_logger
 
 logger = get_logger()
 
+PRESS_DELAY: float = 0.05
+"""The number of seconds a fingertip must stay inside a hotspot before it counts as pressed.
+
+This is the most latency debouncing adds to a press (on top of the time between frames)."""
+
+RELEASE_DELAY: float = 0.1
+"""The number of seconds a hotspot must stay empty before it counts as unpressed."""
+
+GRACE_FRAMES: int = 2
+"""The number of consecutive frames a pending press or release tolerates in which the fingertips are back in the old
+state (e.g. because a fingertip wasn't detected for a frame) before the change is cancelled."""
+
+
 class Hotspot:
     """
     Represents a hotspot. A hotspot is a circular area on the screen that can be pressed.
+
+    Fingertips tend to stutter and disappear for single frames, so a change of state is debounced: it must have lasted
+    for the press or release delay before the event handler is notified.
     """
 
     def __init__(
@@ -15,15 +34,42 @@ class Hotspot:
             hotspot_id: int,
             proj_pos: Tuple[float, float],
             event_listener: EventHandler,
-            radius: float = 0.03
+            radius: float = 0.03,
+            press_delay: float = PRESS_DELAY,
+            release_delay: float = RELEASE_DELAY,
+            grace_frames: int = GRACE_FRAMES
     ):
         self.id: int = hotspot_id
         self._proj_pos: Tuple[float, float] = proj_pos
         self._radius: float = radius
         self._event_handler: EventHandler = event_listener
+        self._press_delay: float = press_delay
+        self._release_delay: float = release_delay
+        self._grace_frames: int = grace_frames
         self._prev_fingertip_inside = False
+        self._pending_since: float | None = None
+        """The time the pending change of state was first seen, or None if there isn't one."""
+        self._contradicting_frames: int = 0
+        """The number of consecutive frames in which the pending change of state wasn't seen."""
+
+    @property
+    def proj_pos(self) -> Tuple[float, float]:
+        return self._proj_pos
+
+    @property
+    def radius(self) -> float:
+        return self._radius
 
-    def update(self, fingertips: list[tuple[float, float]]) -> None:
+    @property
+    def is_pressed(self) -> bool:
+        return self._prev_fingertip_inside
+
+    @property
+    def is_pending(self) -> bool:
+        """Whether a change of state has been seen but hasn't lasted long enough to notify the event handler yet."""
+        return self._pending_since is not None
+
+    def update(self, fingertips: list[tuple[float, float]], now: float | None = None) -> None:
         fingertip_inside = False
 
         for fingertip in fingertips:
@@ -31,9 +77,31 @@ class Hotspot:
                 fingertip_inside = True
                 break
 
-        # TODO: While this works, fingertips tend to stutter and disappear often.
-        #       We should add some padding to prevent loads of unneeded calls,
-        #       i.e. a change of state must have happened for 0.1 seconds before we notify event handler.
+        self.set_fingertip_inside(fingertip_inside, now)
+
+    def set_fingertip_inside(self, fingertip_inside: bool, now: float | None = None) -> None:
+        """
+        Updates the hotspot's state given whether any fingertip is inside it at the given time (time.monotonic()
+        if None), notifying the event handler once a change of state has lasted for the press or release delay
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if fingertip_inside == self._prev_fingertip_inside:
+            # cancel the pending change once it's been missing for more than the grace frames
+            if self._pending_since is not None:
+                self._contradicting_frames += 1
+                if self._contradicting_frames > self._grace_frames:
+                    self._pending_since = None
+            return
+
+        if self._pending_since is None:
+            self._pending_since = now
+        self._contradicting_frames = 0
+        delay = self._release_delay if self._prev_fingertip_inside else self._press_delay
+        if now - self._pending_since < delay:
+            return
+        self._pending_since = None
 
         # Case1: fingertip inside hotspot on last update, now no fingertips inside
         if self._prev_fingertip_inside and not fingertip_inside:
@@ -45,12 +113,129 @@ class Hotspot:
             logger.info(f"Hotspot {self.id} pressed.")
             self._event_handler.OnHotspotPressed(self.id)
 
-        # Case3: nothings changed do nothing
         self._prev_fingertip_inside = fingertip_inside
 
+    def copy_state_from(self, other: "Hotspot") -> None:
+        """
+        Takes over the state (pressed, and any pending change) of another hotspot, e.g. the one with the same id
+        before the hotspots were edited, without notifying the event handler
+        """
+        self._prev_fingertip_inside = other._prev_fingertip_inside
+        self._pending_since = other._pending_since
+        self._contradicting_frames = other._contradicting_frames
+
+    def release(self) -> None:
+        """
+        Unpresses the hotspot straight away (e.g. because it was removed), notifying the event handler if it was pressed
+        """
+        self._pending_since = None
+        self._contradicting_frames = 0
+        if self._prev_fingertip_inside:
+            self._prev_fingertip_inside = False
+            logger.info(f"Hotspot {self.id} unpressed.")
+            self._event_handler.OnHotspotUnpressed(self.id)
+
     def _is_point_inside(self, point) -> bool:
         """
         Returns true if given point is inside hotspot
         """
         squared_dist = (self._proj_pos[0] - point[0]) ** 2 + (self._proj_pos[1] - point[1]) ** 2
         return squared_dist <= self._radius ** 2
+
+
+class HotspotSet:
+    """
+    A collection of hotspots which are hit tested against all fingertips at once.
+
+    The centres and radii of the hotspots are stored in contiguous arrays, so that every hotspot/fingertip pair
+    is tested with a single NumPy broadcast instead of looping over every hotspot in Python.
+    """
+
+    def __init__(self, hotspots: Iterable[Hotspot]):
+        self._hotspots: list[Hotspot] = list(hotspots)
+        self._centres: np.ndarray = np.array([hotspot.proj_pos for hotspot in self._hotspots],
+                                             dtype=np.float64).reshape(-1, 2)
+        """An Mx2 array of the hotspots' centres in projector space."""
+        self._squared_radii: np.ndarray = np.array([hotspot.radius for hotspot in self._hotspots],
+                                                   dtype=np.float64) ** 2
+        self._pressed: np.ndarray = np.array([hotspot.is_pressed for hotspot in self._hotspots], dtype=bool)
+        """The last known state of every hotspot, used to find the ones that changed."""
+        self._pending: np.ndarray = np.array([hotspot.is_pending for hotspot in self._hotspots], dtype=bool)
+        """Whether every hotspot has a pending change of state, which must be updated even if nothing changed."""
+
+    @staticmethod
+    def from_coords(
+            event_handler: EventHandler,
+            hotspots_coords: dict[int, tuple[float, float, float]]
+    ) -> "HotspotSet":
+        """
+        Creates a set of hotspots from a dictionary of hotspot ids to (x, y, radius) in projector space
+        """
+        hotspots: list[Hotspot] = []
+        for hotspot_id, hotspot_coord_rad in hotspots_coords.items():
+            coords = hotspot_coord_rad[0], hotspot_coord_rad[1]
+            radius = hotspot_coord_rad[2]
+            hotspot = Hotspot(hotspot_id, coords, event_handler, radius=radius)
+            hotspots.append(hotspot)
+        return HotspotSet(hotspots)
+
+    def __len__(self) -> int:
+        return len(self._hotspots)
+
+    def carry_over_state(self, previous: "HotspotSet") -> None:
+        """
+        Takes over the state of the hotspots in the previous set (which this set replaces) that have the same id as
+        one of these hotspots, so that a hotspot which is held down stays pressed. Hotspots of the previous set which
+        were pressed and no longer exist are unpressed.
+        """
+        previous_by_id = {hotspot.id: hotspot for hotspot in previous}
+        for i, hotspot in enumerate(self._hotspots):
+            previous_hotspot = previous_by_id.pop(hotspot.id, None)
+            if previous_hotspot is not None:
+                hotspot.copy_state_from(previous_hotspot)
+                self._pressed[i] = hotspot.is_pressed
+                self._pending[i] = hotspot.is_pending
+        for removed_hotspot in previous_by_id.values():
+            removed_hotspot.release()
+
+    def __iter__(self):
+        return iter(self._hotspots)
+
+    def bounding_box(self) -> tuple[float, float, float, float] | None:
+        """
+        Returns the bounding box (min x, min y, max x, max y) of all the hotspots in projector space,
+        or None if there are no hotspots
+        """
+        if len(self._hotspots) == 0:
+            return None
+        radii = np.sqrt(self._squared_radii)
+        min_x, min_y = (self._centres - radii[:, np.newaxis]).min(axis=0)
+        max_x, max_y = (self._centres + radii[:, np.newaxis]).max(axis=0)
+        return float(min_x), float(min_y), float(max_x), float(max_y)
+
+    def update(self, fingertips: np.ndarray | list[tuple[float, float]], now: float | None = None) -> None:
+        """
+        Updates every hotspot given an Nx2 array of fingertip coordinates in projector space at the given time
+        (time.monotonic() if None). Emits the same pressed/unpressed events as calling Hotspot.update on every hotspot.
+        """
+        if now is None:
+            now = time.monotonic()
+        fingertips_inside = self.hit_test(fingertips)
+        for i in np.flatnonzero((fingertips_inside != self._pressed) | self._pending):
+            hotspot = self._hotspots[i]
+            hotspot.set_fingertip_inside(bool(fingertips_inside[i]), now)
+            self._pressed[i] = hotspot.is_pressed
+            self._pending[i] = hotspot.is_pending
+
+    def hit_test(self, fingertips: np.ndarray | list[tuple[float, float]]) -> np.ndarray:
+        """
+        Returns a boolean array which is true for every hotspot that has at least one fingertip inside it
+        """
+        fingertips = np.asarray(fingertips, dtype=np.float64).reshape(-1, 2)
+        if len(fingertips) == 0 or len(self._hotspots) == 0:
+            return np.zeros(len(self._hotspots), dtype=bool)
+
+        # MxN squared distances between every hotspot centre and every fingertip
+        offsets = self._centres[:, np.newaxis, :] - fingertips[np.newaxis, :, :]
+        squared_dists = np.einsum("mni,mni->mn", offsets, offsets)
+        return (squared_dists <= self._squared_radii[:, np.newaxis]).any(axis=1)
@@ -0,0 +1,327 @@
+import threading
+import time
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.Calibrator import Calibrator
+from Scripts.Helper.HandTracker import HAND_LANDMARKER_MODEL_PATH, HandTracker, create_hand_tracker
+from Scripts.Helper.Hotspot import HotspotSet
+from Scripts.Helper.InferenceScheduler import InferenceScheduler
+from Scripts.Helper.MotionDetector import MotionDetector
+from Scripts.Helper.PipelineStats import PipelineStats
+from Scripts.Helper.RegionOfInterest import RegionOfInterest
+from Scripts.Helper.VideoCapture import VideoCapture
+from Scripts.Helper.logger import get_logger
+from Scripts.video_capture_factory import capture_manager
+
+logger = get_logger()
+
+MAX_NUM_HANDS: int = 4
+"""The maximum number of hands to detect."""
+
+MIN_DETECTION_CONFIDENCE: float = 0.5
+"""The minimum confidence for hand detection to be considered successful.
+
+Must be between 0 and 1.
+
+See https://developers.google.com/mediapipe/solutions/vision/hand_landmarker."""
+
+MIN_TRACKING_CONFIDENCE: float = 0.5
+"""The minimum confidence for hand detection to be considered successful.
+
+Must be between 0 and 1.
+
+See https://developers.google.com/mediapipe/solutions/vision/hand_landmarker."""
+
+HAND_TRACKING_BACKEND: str = "solutions"
+"""The hand-tracking backend to use (see Helper/HandTracker):
+
+- "solutions" tracks hands synchronously with the legacy MediaPipe solutions API.
+- "tasks" tracks hands asynchronously with the MediaPipe Tasks HandLandmarker, so that capture and inference overlap.
+  Needs the model asset at HAND_TRACKING_MODEL_PATH."""
+
+HAND_TRACKING_MODEL_PATH: str = HAND_LANDMARKER_MODEL_PATH
+"""The path of the HandLandmarker model asset (.task file) used by the "tasks" backend.
+
+It isn't bundled; see Scripts/Models/README.md for where to download it."""
+
+HAND_TRACKING_DELEGATE: str | None = None
+"""Whether the "tasks" backend runs the model on the "cpu" or "gpu", or None to let MediaPipe choose."""
+
+LOW_LATENCY_CAPTURE: bool = False
+"""Whether to capture in low-latency mode, which always processes the freshest camera frame instead of the oldest one
+queued by the camera driver. Worth enabling if touches feel laggy, but not every camera backend supports it."""
+
+USE_HOTSPOT_ROI: bool = True
+"""Whether to only run the hand-tracking model on the region of the camera image around the hotspots."""
+
+ROI_MARGIN: float = 0.15
+"""The margin around the hotspots' region of interest, as a fraction of the camera image.
+
+Must be large enough for the model to see the whole hand when a fingertip is inside a hotspot at the edge."""
+
+USE_MOTION_GATING: bool = True
+"""Whether to skip running the hand-tracking model on most frames while nothing moves around the hotspots.
+
+The thresholds can be tuned in Helper/MotionDetector."""
+
+USE_ADAPTIVE_SCHEDULING: bool = True
+"""Whether to lower the inference resolution and model complexity (and skip frames) when hand tracking takes longer
+than the latency budget.
+
+The budget and quality levels can be tuned in Helper/InferenceScheduler."""
+
+REPLAY_VIDEO_FILES: bool = True
+"""Whether to replay video files (i.e. recordings used in tests and benchmarks) frame by frame, as fast as they can be
+processed and stopping at the end, instead of playing them back in real time like a camera.
+
+Replays are deterministic: no frame is skipped, time is measured by the position in the video, and adaptive
+scheduling is disabled (as it depends on how fast the machine is)."""
+
+FRAME_TIMEOUT: float = 0.5
+"""The maximum number of seconds to wait for a new frame before checking whether detection should stop."""
+
+_KEEP_INTRINSICS = object()
+"""The default intrinsics of HotspotDetector.update_calibration, which keeps the current ones."""
+
+
+class HotspotDetector:
+    """
+    Runs the hotspot detection pipeline: captures frames, tracks hands in them and updates the hotspots with the
+    fingertips' positions in projector space.
+    """
+
+    def __init__(
+            self,
+            video_capture_target: int | str,
+            calibration_matrix: np.ndarray,
+            hotspots: HotspotSet,
+            frame_listener: Callable[[int, np.ndarray], None] | None = None,
+            stats: PipelineStats | None = None,
+            intrinsics: tuple[np.ndarray, np.ndarray] | None = None
+    ):
+        """
+        :param video_capture_target The camera index or video file to capture from.
+        :param calibration_matrix The transformation matrix from camera space to projector space.
+        :param hotspots The hotspots to update.
+        :param frame_listener Called with the frame number and (RGB) image of every captured frame. The image is only
+        valid until the listener returns.
+        :param stats If set, the time taken by every stage of the pipeline is recorded in it.
+        :param intrinsics The camera matrix and distortion coefficients of the camera (see
+        Calibrator.estimate_intrinsics), if the calibration matrix was calibrated with them.
+        """
+        self._video_capture_target: int | str = video_capture_target
+        self._calibration_matrix: np.ndarray = calibration_matrix
+        self._hotspots: HotspotSet = hotspots
+        self._frame_listener: Callable[[int, np.ndarray], None] | None = frame_listener
+        self._stats: PipelineStats | None = stats
+        self._intrinsics: tuple[np.ndarray, np.ndarray] | None = intrinsics
+        self._stopping: bool = False
+        self._update_lock: threading.Lock = threading.Lock()
+        self._updated: bool = False
+        """Whether the hotspots or calibration have changed since the running pipeline last took them."""
+
+    def run(self) -> None:
+        """
+        Opens the camera (or shares it, if it's already open) and updates the hotspots with every captured frame until
+        stop is called (or the end of a replayed video is reached). Blocks.
+        """
+        subscription = capture_manager.subscribe(self._video_capture_target, low_latency=LOW_LATENCY_CAPTURE,
+                                                 replay=REPLAY_VIDEO_FILES)
+        try:
+            self._run(subscription.video_capture)
+        finally:
+            subscription.release()
+
+    def _run(self, video_capture: VideoCapture) -> None:
+        stats = self._stats
+        if stats is not None:
+            video_capture.stats = stats
+
+        scheduler = InferenceScheduler() if USE_ADAPTIVE_SCHEDULING and not video_capture.replay else None
+        model_complexity = scheduler.model_complexity if scheduler is not None else 1
+
+        # initialise ML hand-tracking model
+        hand_tracker = self._create_hand_tracker(model_complexity)
+
+        # initialise calibrator
+        h, w, d = video_capture.get_current_frame().shape
+        logger.info(f"Camera width: {w}, height: {h}")
+        with self._update_lock:
+            self._updated = False
+            calibrator = Calibrator(self._calibration_matrix, (w, h), *(self._intrinsics or ()))
+            hotspots = self._hotspots
+        roi = self._create_roi(calibrator, hotspots, (w, h))
+        logger.info(f"Running hand detection on {roi} ({roi.area_fraction:.0%} of the camera image).")
+        motion_detector = MotionDetector() if USE_MOTION_GATING else None
+
+        logger.info("Hotspot detection started.")
+
+        frame_number = 0
+        submitted_frames: dict[int, tuple[float, RegionOfInterest]] = {}
+        """The capture timestamps and regions of interest of the frames submitted to the hand tracker (whose results
+        haven't arrived yet), by their submission timestamp. Results submitted before the region of interest changed
+        are mapped with the old one."""
+        while not self._stopping:
+            # swap in edited hotspots or calibration between frames
+            if self._updated:
+                start = time.perf_counter()
+                with self._update_lock:
+                    self._updated = False
+                    calibration_matrix, intrinsics = self._calibration_matrix, self._intrinsics
+                    new_hotspots = self._hotspots
+                try:
+                    calibrator = Calibrator(calibration_matrix, (w, h), *(intrinsics or ()))
+                except (ValueError, np.linalg.LinAlgError):
+                    logger.exception("Invalid calibration; keeping the previous one.")
+                if new_hotspots is not hotspots:
+                    new_hotspots.carry_over_state(hotspots)
+                    hotspots = new_hotspots
+                new_roi = self._create_roi(calibrator, hotspots, (w, h))
+                if (new_roi.left, new_roi.top, new_roi.right, new_roi.bottom) != \
+                        (roi.left, roi.top, roi.right, roi.bottom):
+                    roi = new_roi
+                    # the motion detector compares frames of the old region
+                    motion_detector = MotionDetector() if USE_MOTION_GATING else None
+                logger.info(f"Updated hotspot detection ({len(hotspots)} hotspots, running hand detection on {roi}) "
+                            f"in {(time.perf_counter() - start) * 1000:.1f}ms.")
+                if stats is not None:
+                    stats.record("reconfiguration", time.perf_counter() - start)
+
+            # only run the model once per captured frame
+            start = time.perf_counter()
+            frame = video_capture.checkout_next_frame(FRAME_TIMEOUT, after=frame_number)
+            if frame is None:
+                if video_capture.end_of_stream:
+                    logger.info("Reached the end of the video; stopping hotspot detection.")
+                    break
+                continue
+            frame_start = time.perf_counter()
+            if stats is not None:
+                stats.record("capture_wait", frame_start - start)
+            with frame:
+                frame_number = frame.frame_number
+                if self._frame_listener is not None:
+                    self._frame_listener(frame_number, frame.image)
+
+                # skip the model while nothing is moving (apart from an occasional heartbeat)
+                start = time.perf_counter()
+                if motion_detector is not None and not motion_detector.should_run_inference(roi.view(frame.image),
+                                                                                               now=frame.timestamp):
+                    continue
+                if stats is not None and motion_detector is not None:
+                    stats.record("motion_gating", time.perf_counter() - start)
+
+                # deliberately skip frames if inference can't keep up
+                if scheduler is not None and scheduler.should_skip():
+                    continue
+
+                # run model (the video capture already delivers frames in RGB)
+                start = time.perf_counter()
+                image = roi.crop(frame.image)
+                if scheduler is not None and scheduler.scale != 1:
+                    image = cv2.resize(image, None, fx=scheduler.scale, fy=scheduler.scale,
+                                       interpolation=cv2.INTER_AREA)
+                if stats is not None:
+                    stats.record("preprocessing", time.perf_counter() - start)
+                timestamp_ms = hand_tracker.submit(image, int(time.monotonic() * 1000))
+                submitted_frames[timestamp_ms] = frame.timestamp, roi
+
+            # update hotspots with every result that's ready (asynchronous backends deliver them later)
+            for timestamp_ms, fingertip_coords_roi in hand_tracker.get_results():
+                latency = time.monotonic() - timestamp_ms / 1000
+                frame_timestamp, result_roi = (self._pop_submitted_frame(submitted_frames, timestamp_ms)
+                                               or (timestamp_ms / 1000, roi))
+                if scheduler is not None:
+                    scheduler.record(latency)
+                if stats is not None:
+                    stats.record("inference", latency)
+                start = time.perf_counter()
+                if len(fingertip_coords_roi) == 0:
+                    fingertip_coords_proj = np.empty((0, 2))
+                else:
+                    fingertip_coords_norm = result_roi.to_frame_coords(fingertip_coords_roi)
+                    fingertip_coords_proj = calibrator.norm_to_proj_batch(fingertip_coords_norm)
+                    if stats is not None:
+                        stats.record("calibration", time.perf_counter() - start)
+                        start = time.perf_counter()
+                # update even without hands, so that pending releases complete once the hands have left
+                hotspots.update(fingertip_coords_proj, now=frame_timestamp)
+                if stats is not None:
+                    stats.record("hit_testing", time.perf_counter() - start)
+
+            if stats is not None:
+                stats.record("frame", time.perf_counter() - frame_start)
+
+            # only the solutions backend has different model complexities
+            if (scheduler is not None and scheduler.model_complexity != model_complexity
+                    and HAND_TRACKING_BACKEND == "solutions"):
+                model_complexity = scheduler.model_complexity
+                hand_tracker.close()
+                hand_tracker = self._create_hand_tracker(model_complexity)
+
+        # clean up (the video capture is stopped once every subscription to it is released)
+        cv2.destroyAllWindows()  # there shouldn't be any windows but just in case
+        hand_tracker.close()
+
+    @staticmethod
+    def _pop_submitted_frame(
+            submitted_frames: dict[int, tuple[float, RegionOfInterest]],
+            timestamp_ms: int
+    ) -> tuple[float, RegionOfInterest] | None:
+        """
+        Removes and returns the details of the frame submitted at the given timestamp, if it's there. Results arrive in
+        timestamp order, so the frames submitted before it are removed too: their results were dropped (e.g. by the
+        Tasks backend while it was busy) and will never arrive.
+        """
+        submitted = submitted_frames.pop(timestamp_ms, None)
+        for dropped_timestamp_ms in [k for k in submitted_frames if k < timestamp_ms]:
+            del submitted_frames[dropped_timestamp_ms]
+        return submitted
+
+    @staticmethod
+    def _create_roi(calibrator: Calibrator, hotspots: HotspotSet, camera_res: tuple[int, int]) -> RegionOfInterest:
+        if USE_HOTSPOT_ROI:
+            return RegionOfInterest.from_hotspots(calibrator, hotspots, camera_res, ROI_MARGIN)
+        return RegionOfInterest.full_frame(camera_res)
+
+    @staticmethod
+    def _create_hand_tracker(model_complexity: int) -> HandTracker:
+        logger.info(f"Initialising hand-tracking model ({HAND_TRACKING_BACKEND} backend, "
+                    f"model complexity {model_complexity}).")
+        return create_hand_tracker(HAND_TRACKING_BACKEND, MAX_NUM_HANDS, MIN_DETECTION_CONFIDENCE,
+                                   MIN_TRACKING_CONFIDENCE, model_complexity, HAND_TRACKING_MODEL_PATH,
+                                   HAND_TRACKING_DELEGATE)
+
+    def update_hotspots(self, hotspots: HotspotSet) -> None:
+        """
+        Replaces the hotspots between frames, without restarting detection. Hotspots with the same id as one of the
+        old hotspots keep its state (e.g. stay pressed), and old hotspots which were pressed and are gone are
+        unpressed. Thread-safe.
+        """
+        with self._update_lock:
+            self._hotspots = hotspots
+            self._updated = True
+
+    def update_calibration(
+            self,
+            calibration_matrix: np.ndarray,
+            intrinsics: tuple[np.ndarray, np.ndarray] | None = _KEEP_INTRINSICS
+    ) -> None:
+        """
+        Replaces the calibration (see the constructor) between frames, without restarting detection. The camera's
+        intrinsics are kept unless new ones (or None, to stop removing lens distortion) are given. Thread-safe.
+        """
+        with self._update_lock:
+            self._calibration_matrix = calibration_matrix
+            if intrinsics is not _KEEP_INTRINSICS:
+                self._intrinsics = intrinsics
+            self._updated = True
+
+    def stop(self) -> None:
+        """
+        Makes run return after the current frame (or straight after starting, if it hasn't started yet).
+        """
+        self._stopping = True
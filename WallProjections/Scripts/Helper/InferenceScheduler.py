@@ -0,0 +1,118 @@
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+LATENCY_BUDGET: float = 0.06
+"""The number of seconds hand tracking may take per frame before the scheduler trades quality for latency."""
+
+HEADROOM: float = 0.6
+"""The scheduler only steps quality back up once inference takes less than this fraction of the latency budget."""
+
+QUALITY_LEVELS: tuple[tuple[float, int], ...] = ((1.0, 1), (1.0, 0), (0.75, 0), (0.5, 0))
+"""The quality levels the scheduler steps through, from best to fastest, as (resolution scale, model complexity).
+
+The resolution scale is applied to the region of interest before hand tracking. Model complexity 0 is the lite model
+(only used by the solutions backend)."""
+
+MAX_SKIPPED_FRAMES: int = 3
+"""Once at the fastest quality level, the scheduler skips up to this many frames between every processed frame."""
+
+SMOOTHING: float = 0.2
+"""The weight of the latest measurement in the moving average of inference time (between 0 and 1)."""
+
+COOLDOWN: int = 15
+"""The number of measurements to take after every change before deciding again, so the average reflects the change."""
+
+
+class InferenceScheduler:
+    """
+    Keeps hand tracking within a latency budget on weaker hardware, by measuring how long inference takes and stepping
+    the inference resolution and model complexity down (and then skipping frames) when it's over budget,
+    and back up when there's headroom.
+    """
+
+    def __init__(
+            self,
+            latency_budget: float = LATENCY_BUDGET,
+            headroom: float = HEADROOM,
+            quality_levels: tuple[tuple[float, int], ...] = QUALITY_LEVELS,
+            max_skipped_frames: int = MAX_SKIPPED_FRAMES
+    ):
+        self._latency_budget: float = latency_budget
+        self._headroom: float = headroom
+        self._quality_levels: tuple[tuple[float, int], ...] = quality_levels
+        self._max_skipped_frames: int = max_skipped_frames
+
+        self._level: int = 0
+        self.skipped_frames: int = 0
+        """The number of frames skipped between every processed frame."""
+        self._frame_counter: int = 0
+        self._average_latency: float | None = None
+        self._measurements_since_change: int = 0
+
+    @property
+    def scale(self) -> float:
+        """The scale to resize frames by before hand tracking."""
+        return self._quality_levels[self._level][0]
+
+    @property
+    def model_complexity(self) -> int:
+        """The complexity of the hand-tracking model to use."""
+        return self._quality_levels[self._level][1]
+
+    @property
+    def average_latency(self) -> float | None:
+        """The moving average of inference time in seconds, or None if there haven't been any measurements yet."""
+        return self._average_latency
+
+    def should_skip(self) -> bool:
+        """
+        Returns whether to skip hand tracking on the next frame. Must be called once for every frame.
+        """
+        skip = self._frame_counter % (self.skipped_frames + 1) != 0
+        self._frame_counter += 1
+        return skip
+
+    def record(self, latency: float) -> None:
+        """
+        Records how many seconds hand tracking took for a frame, and adjusts the quality if needed.
+        """
+        if self._average_latency is None:
+            self._average_latency = latency
+        else:
+            self._average_latency += SMOOTHING * (latency - self._average_latency)
+        self._measurements_since_change += 1
+        if self._measurements_since_change < COOLDOWN:
+            return
+
+        if self._average_latency > self._latency_budget:
+            self._step_down()
+        elif self._average_latency < self._headroom * self._latency_budget:
+            self._step_up()
+
+    def _step_down(self) -> None:
+        if self._level < len(self._quality_levels) - 1:
+            self._level += 1
+        elif self.skipped_frames < self._max_skipped_frames:
+            self.skipped_frames += 1
+        else:
+            return
+        self._log_change("over budget; stepping down")
+
+    def _step_up(self) -> None:
+        if self.skipped_frames > 0:
+            self.skipped_frames -= 1
+        elif self._level > 0:
+            self._level -= 1
+        else:
+            return
+        self._log_change("within headroom; stepping up")
+
+    def _log_change(self, reason: str) -> None:
+        logger.info(f"Inference took {self._average_latency * 1000:.1f}ms on average "
+                    f"(budget {self._latency_budget * 1000:.0f}ms), {reason} to resolution scale {self.scale}, "
+                    f"model complexity {self.model_complexity}, skipping {self.skipped_frames} frame(s) "
+                    f"between processed frames.")
+        # start measuring afresh, as the old measurements don't reflect the new quality
+        self._average_latency = None
+        self._measurements_since_change = 0
@@ -0,0 +1,98 @@
+import time
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+MOTION_WIDTH: int = 64
+"""The width (in pixels) frames are downscaled to before looking for motion. The height keeps the aspect ratio."""
+
+PIXEL_THRESHOLD: int = 20
+"""The minimum change in grayscale intensity (0-255) for a pixel to count as changed between frames."""
+
+MOTION_THRESHOLD: float = 0.005
+"""The minimum fraction of changed pixels for a frame to count as having motion."""
+
+IDLE_DELAY: float = 3.0
+"""The number of seconds without motion before inference drops to the heartbeat rate."""
+
+HEARTBEAT_INTERVAL: float = 0.5
+"""The number of seconds between inferences while idle, so that a hand which stopped moving is still tracked."""
+
+
+class MotionDetector:
+    """
+    Decides whether the hand-tracking model needs to run on a frame, by looking for motion in a low-resolution
+    grayscale copy of it.
+
+    While there's motion, every frame should be processed. Once nothing has moved for `idle_delay` seconds,
+    only one frame every `heartbeat_interval` seconds is processed, until motion appears again.
+    """
+
+    def __init__(
+            self,
+            pixel_threshold: int = PIXEL_THRESHOLD,
+            motion_threshold: float = MOTION_THRESHOLD,
+            idle_delay: float = IDLE_DELAY,
+            heartbeat_interval: float = HEARTBEAT_INTERVAL
+    ):
+        self._pixel_threshold: int = pixel_threshold
+        self._motion_threshold: float = motion_threshold
+        self._idle_delay: float = idle_delay
+        self._heartbeat_interval: float = heartbeat_interval
+
+        self._small_frame: np.ndarray | None = None
+        self._gray_frames: list[np.ndarray] = []
+        """The current and previous downscaled grayscale frames, swapped every frame to avoid allocating."""
+        self._diff: np.ndarray | None = None
+        self._last_motion_time: float = -np.inf
+        self._last_inference_time: float = -np.inf
+        self.idle: bool = False
+
+    def should_run_inference(self, frame_rgb: np.ndarray, now: float | None = None) -> bool:
+        """
+        Returns whether the hand-tracking model should run on the given RGB frame
+        (which should already be cropped to the region of interest).
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if self._has_motion(frame_rgb):
+            self._last_motion_time = now
+            if self.idle:
+                logger.info("Motion detected; running hand tracking on every frame.")
+                self.idle = False
+        elif not self.idle and now - self._last_motion_time >= self._idle_delay:
+            logger.info(f"No motion for {self._idle_delay}s; running hand tracking every "
+                        f"{self._heartbeat_interval}s.")
+            self.idle = True
+
+        if self.idle and now - self._last_inference_time < self._heartbeat_interval:
+            return False
+        self._last_inference_time = now
+        return True
+
+    def _has_motion(self, frame_rgb: np.ndarray) -> bool:
+        height, width = frame_rgb.shape[:2]
+        small_size = (MOTION_WIDTH, max(1, round(height / width * MOTION_WIDTH)))
+        if self._small_frame is None or self._small_frame.shape[:2] != (small_size[1], small_size[0]):
+            # first frame (or the frame size changed), so there's nothing to compare against yet
+            self._small_frame = np.empty((small_size[1], small_size[0], 3), dtype=np.uint8)
+            self._gray_frames = [np.empty(small_size[::-1], dtype=np.uint8) for _ in range(2)]
+            self._diff = np.empty(small_size[::-1], dtype=np.uint8)
+            self._downscale(frame_rgb, self._gray_frames[1])
+            return True
+
+        current, previous = self._gray_frames
+        self._downscale(frame_rgb, current)
+        cv2.absdiff(current, previous, dst=self._diff)
+        changed_pixels = np.count_nonzero(self._diff > self._pixel_threshold)
+        self._gray_frames.reverse()
+        return changed_pixels >= self._motion_threshold * self._diff.size
+
+    def _downscale(self, frame_rgb: np.ndarray, dst: np.ndarray) -> None:
+        cv2.resize(frame_rgb, (dst.shape[1], dst.shape[0]), dst=self._small_frame, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small_frame, cv2.COLOR_RGB2GRAY, dst=dst)
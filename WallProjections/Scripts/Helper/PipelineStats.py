@@ -0,0 +1,124 @@
+import bisect
+import math
+import threading
+import time
+
+from Scripts.Helper.logger import get_logger
+
+logger = get_logger()
+
+LOG_INTERVAL: float = 30
+"""The number of seconds between every time the stats are logged (and the histograms start afresh)."""
+
+MIN_DURATION: float = 1e-5
+"""The upper bound of the shortest histogram bucket, in seconds. Shorter durations all fall in this bucket."""
+
+MAX_DURATION: float = 10
+"""The lower bound of the longest histogram bucket, in seconds. Longer durations all fall in this bucket."""
+
+BUCKETS_PER_DECADE: int = 20
+"""The number of histogram buckets per factor of 10 of duration, which bounds the error of the percentiles to about
+12% (10 ** (1 / 20))."""
+
+PERCENTILES: tuple[int, ...] = (50, 95, 99)
+"""The percentiles of every stage's durations to report."""
+
+_BUCKET_BOUNDS: list[float] = [MIN_DURATION * 10 ** (i / BUCKETS_PER_DECADE)
+                               for i in range(round(math.log10(MAX_DURATION / MIN_DURATION) * BUCKETS_PER_DECADE) + 1)]
+"""The upper bound of every histogram bucket (apart from the last one, which is unbounded)."""
+
+
+class _Histogram:
+    """
+    A histogram of durations with logarithmically sized buckets, so recording a duration is cheap
+    and the percentiles have a bounded relative error.
+    """
+
+    def __init__(self):
+        self.counts: list[int] = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count: int = 0
+        self.total: float = 0
+
+    def add(self, duration: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Returns the upper bound of the bucket holding the given percentile (or the lower bound of the last bucket)
+        """
+        target = math.ceil(self.count * percentile / 100)
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return _BUCKET_BOUNDS[min(i, len(_BUCKET_BOUNDS) - 1)]
+        return _BUCKET_BOUNDS[-1]
+
+
+class PipelineStats:
+    """
+    Records how long every stage of the detection pipeline takes, in a histogram per stage. Every log interval,
+    the percentiles and rate (per second) of every stage are logged, and the histograms start afresh.
+
+    Thread-safe, so that stages on different threads (e.g. capture) can record into the same stats.
+    """
+
+    def __init__(self, log_interval: float = LOG_INTERVAL):
+        self._log_interval: float = log_interval
+        self._lock: threading.Lock = threading.Lock()
+        self._histograms: dict[str, _Histogram] = {}
+        self._window_start: float = time.monotonic()
+
+    def record(self, stage: str, duration: float) -> None:
+        """
+        Records that the given stage took the given number of seconds. Logs a snapshot if the log interval is over.
+        """
+        now = time.monotonic()
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = _Histogram()
+            histogram.add(duration)
+
+            if now - self._window_start < self._log_interval:
+                return
+            snapshot = self._snapshot(now)
+            self._histograms = {}
+            self._window_start = now
+
+        logger.info("Detection pipeline stats: " + "; ".join(
+            f"{stage} {stats['rate']:.1f}/s, " + ", ".join(f"p{p} {stats[f'p{p}_ms']:.2f}ms" for p in PERCENTILES)
+            for stage, stats in snapshot.items()))
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the stats of every stage since the histograms last started afresh: the number of times it ran, its
+        rate per second (i.e. frames per second for per-frame stages), and its mean and percentile durations in
+        milliseconds
+        """
+        with self._lock:
+            return self._snapshot(time.monotonic())
+
+    def _snapshot(self, now: float) -> dict[str, dict[str, float]]:
+        elapsed = max(now - self._window_start, 1e-9)
+        snapshot = {}
+        for stage, histogram in self._histograms.items():
+            stats = {
+                "count": histogram.count,
+                "rate": histogram.count / elapsed,
+                "mean_ms": histogram.total / histogram.count * 1000,
+            }
+            for p in PERCENTILES:
+                stats[f"p{p}_ms"] = histogram.percentile(p) * 1000
+            snapshot[stage] = stats
+        return snapshot
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """
+        Returns a fresh snapshot of the current stats (see snapshot), rather than the one last logged, which can be up
+        to a log interval old
+        """
+        with self._lock:
+            return self._snapshot(time.monotonic())
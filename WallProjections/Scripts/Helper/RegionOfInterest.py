@@ -0,0 +1,91 @@
+import numpy as np
+
+from Scripts.Helper.Calibrator import Calibrator
+from Scripts.Helper.Hotspot import HotspotSet
+
+GRID_SIZE: int = 64
+"""The number of points sampled along each axis of the camera image when finding the region covering the hotspots."""
+
+
+class RegionOfInterest:
+    """
+    A rectangular region of the camera image (in pixels) which hand detection can be restricted to.
+    """
+
+    def __init__(self, left: int, top: int, right: int, bottom: int, camera_res: tuple[int, int]):
+        self.left: int = left
+        self.top: int = top
+        self.right: int = right
+        self.bottom: int = bottom
+        self._camera_res: tuple[int, int] = camera_res
+
+    @staticmethod
+    def full_frame(camera_res: tuple[int, int]) -> "RegionOfInterest":
+        """
+        Returns a region of interest covering the whole camera image
+        """
+        return RegionOfInterest(0, 0, camera_res[0], camera_res[1], camera_res)
+
+    @staticmethod
+    def from_hotspots(
+            calibrator: Calibrator,
+            hotspots: HotspotSet,
+            camera_res: tuple[int, int],
+            margin: float
+    ) -> "RegionOfInterest":
+        """
+        Returns the region of the camera image which maps onto the bounding box of the hotspots in projector space,
+        padded by margin (as a fraction of the camera image) on every side.
+
+        The region is found by mapping a grid of camera points into projector space, so it works for any
+        mapping the calibrator uses. Falls back to the full frame if no part of the camera image covers the hotspots.
+        """
+        bounding_box = hotspots.bounding_box()
+        if bounding_box is None:
+            return RegionOfInterest.full_frame(camera_res)
+        min_x, min_y, max_x, max_y = bounding_box
+
+        axis = np.linspace(0, 1, GRID_SIZE)
+        grid_norm = np.stack(np.meshgrid(axis, axis), axis=-1).reshape(-1, 2)
+        grid_proj = calibrator.norm_to_proj_batch(grid_norm)
+        inside = ((grid_proj[:, 0] >= min_x) & (grid_proj[:, 0] <= max_x) &
+                  (grid_proj[:, 1] >= min_y) & (grid_proj[:, 1] <= max_y))
+        if not inside.any():
+            return RegionOfInterest.full_frame(camera_res)
+
+        # pad by a grid cell as well, as the edges of the bounding box can lie between grid points
+        padding = margin + 1 / (GRID_SIZE - 1)
+        left, top = np.clip(grid_norm[inside].min(axis=0) - padding, 0, 1)
+        right, bottom = np.clip(grid_norm[inside].max(axis=0) + padding, 0, 1)
+        width, height = camera_res
+        return RegionOfInterest(int(left * width), int(top * height),
+                                int(np.ceil(right * width)), int(np.ceil(bottom * height)), camera_res)
+
+    @property
+    def area_fraction(self) -> float:
+        """The fraction of the camera image covered by the region."""
+        return ((self.right - self.left) * (self.bottom - self.top)) / (self._camera_res[0] * self._camera_res[1])
+
+    def view(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Returns the region of the frame as a view (which might not be contiguous)
+        """
+        return frame[self.top:self.bottom, self.left:self.right]
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Returns the region of the frame as a contiguous array (copying only if the region isn't the full frame)
+        """
+        return np.ascontiguousarray(self.view(frame))
+
+    def to_frame_coords(self, norm_coords: np.ndarray) -> np.ndarray:
+        """
+        Maps an Nx2 array of coordinates normalized to the region to coordinates normalized to the full camera image
+        """
+        width, height = self._camera_res
+        scale = np.array([(self.right - self.left) / width, (self.bottom - self.top) / height])
+        offset = np.array([self.left / width, self.top / height])
+        return np.asarray(norm_coords).reshape(-1, 2) * scale + offset
+
+    def __repr__(self) -> str:
+        return f"RegionOfInterest(left={self.left}, top={self.top}, right={self.right}, bottom={self.bottom})"
@@ -4,6 +4,7 @@ import cv2
 import numpy as np
 import time
 
+from Scripts.Helper.PipelineStats import PipelineStats
 from Scripts.Helper.logger import get_logger
 
 logger =get_logger()
@@ -30,60 +31,224 @@ Tweaking these properties could be found useful in case of any issues with captu
 See https://docs.opencv.org/3.4/d4/d15/group__videoio__flags__base.html#gaeb8dd9c89c10a5c63c139bf7c4f5704d and
 https://docs.opencv.org/3.4/dc/dfc/group__videoio__flags__others.html."""
 
+LOW_LATENCY_PROPERTIES: dict[int, int] = {
+    cv2.CAP_PROP_FOURCC: cv2.VideoWriter.fourcc(*'MJPG'),
+    cv2.CAP_PROP_BUFFERSIZE: 1,
+}
+"""Properties set on top of the other properties in low-latency mode.
+
+A compressed FOURCC (MJPG) lets most webcams deliver full frame rate over USB, and a buffer size of 1 stops the driver
+from queueing up stale frames. Backends which don't support them ignore them, which is reported when capture starts."""
+
+MAX_DRAINED_FRAMES: int = 10
+"""The maximum number of queued frames skipped in low-latency mode before decoding a frame."""
+
+DRAIN_THRESHOLD: float = 0.005
+"""In low-latency mode, a grab that takes longer than this many seconds had to wait for the camera, so the frame it
+grabbed is the freshest one available. Grabs that return faster than this were served from the driver's queue."""
+
+DEFAULT_RESOLUTION: tuple[int, int] = (640, 480)
+"""The resolution (width, height) requested from the camera.
+
+If the camera doesn't honour it, every frame is resized to the requested height (keeping the aspect ratio)."""
+
+FULL_RESOLUTION: tuple[int, int] = (4096, 3072)
+"""The resolution (width, height) requested from the camera in full-resolution mode, e.g. for calibration photos.
+
+Cameras deliver the closest resolution they support, and frames are not resized. It has the same aspect ratio as the
+default resolution, so that cameras don't switch to a mode with a different field of view."""
+
+FRAME_BUFFER_COUNT: int = 4
+"""The number of preallocated frame buffers the capture thread cycles through.
+
+A frame checked out by a consumer cannot be overwritten until it is released, so this should be at least 2 more than
+the number of frames consumers hold at once. Memory use is bounded by this many frames (plus one raw camera frame)."""
+
+START_TIMEOUT: float = 60
+"""The maximum number of seconds to wait for the first frame when starting video capture."""
+
+WARM_UP_FRAMES: int = 0
+"""The number of frames to discard after opening a camera, for cameras whose first frames are garbage in a way the
+blank frame check doesn't catch."""
+
+MAX_WARM_UP_FRAMES: int = 30
+"""The maximum number of blank frames to discard after opening a camera (so that a genuinely dark scene still
+starts)."""
+
+BLANK_FRAME_THRESHOLD: int = 16
+"""A frame whose brightest pixel (in any channel) is darker than this is considered blank. Many cameras deliver
+a few black frames while they start up."""
+
 RECORD_VIDEO: bool = False
 
+VIDEO_FILE_FPS: float = 30
+"""The framerate video files are played back at (unless they are replayed), and their frame timestamps are based on
+when replayed if the file doesn't specify a framerate."""
+
+
+class FrameLease:
+    """A read-only view of a frame checked out from a VideoCapture's frame buffers.
+
+    The capture thread will not write into the underlying buffer until the lease is released, so release it (or use it
+    as a context manager) as soon as the frame is no longer needed. Copy the image to keep it for longer."""
+
+    def __init__(self, image: np.ndarray, frame_number: int, timestamp: float, slot: int, readers: list[int],
+                 lock: threading.Lock) -> None:
+        self.image: np.ndarray = image
+        """The frame in BGR (or RGB if the video capture's `rgb` is set). This is a read-only view into the frame
+        buffer."""
+        self.frame_number: int = frame_number
+        self.timestamp: float = timestamp
+        """When the frame was captured (in `time.monotonic()` seconds), or its position in the video if it's
+        replayed."""
+        self._slot: int = slot
+        self._readers: list[int] = readers
+        """The reader counts of the frame buffers this lease was checked out from."""
+        self._lock: threading.Lock = lock
+        self._released: bool = False
+
+    def release(self) -> None:
+        """Return the frame buffer to the capture thread. Does nothing if the lease has already been released."""
+        with self._lock:
+            if not self._released:
+                self._readers[self._slot] -= 1
+                self._released = True
+
+    def __enter__(self) -> "FrameLease":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
 
 class VideoCapture:
     """Helper class for capturing video (or a photo)."""
 
     def __init__(self, target: int | str | None = None, backend: int | None = None,
-                 properties: dict[int, int] | None = None) -> None:
+                 properties: dict[int, int] | None = None, low_latency: bool = False,
+                 resolution: tuple[int, int] | None = None, rgb: bool = False, replay: bool = False,
+                 full_resolution: bool = False) -> None:
         """Pass `None` for any parameter to choose a default value.
 
         :param target Camera ID, video filename, image sequence filename or video stream URL to capture video from.
         :param backend The API backend to use for capturing video.
-        :param properties Extra properties to use for OpenCV video capture."""
+        :param properties Extra properties to use for OpenCV video capture.
+        :param low_latency Whether to always deliver the freshest camera frame, skipping frames queued by the driver.
+        Has no effect on video files.
+        :param resolution The resolution (width, height) to request from the camera.
+        :param rgb Whether to convert frames to RGB in the capture thread (instead of delivering them in BGR).
+        :param replay Whether to replay video files frame by frame: instead of playing back in real time on a capture
+        thread, every frame is decoded when it's asked for, so no frame is ever skipped and playback is as fast as the
+        consumer. Has no effect on cameras.
+        :param full_resolution Whether to deliver frames at the resolution the camera captures at (requesting
+        `FULL_RESOLUTION` unless a resolution is given) instead of resizing them to the requested height."""
 
         self.target: int | str = target or DEFAULT_TARGET
         self.backend: int = backend or DEFAULT_BACKEND
         self.properties: dict[int, int] = properties or DEFAULT_PROPERTIES
+        self.low_latency: bool = low_latency and not self._is_video_file()
+        if self.low_latency:
+            self.properties = {**self.properties, **LOW_LATENCY_PROPERTIES}
+        self.full_resolution: bool = full_resolution
+        self.resolution: tuple[int, int] = resolution or (FULL_RESOLUTION if full_resolution else DEFAULT_RESOLUTION)
+        if not self._is_video_file():
+            self.properties = {**self.properties,
+                               cv2.CAP_PROP_FRAME_WIDTH: self.resolution[0],
+                               cv2.CAP_PROP_FRAME_HEIGHT: self.resolution[1]}
+        self.rgb: bool = rgb
+        self.replay: bool = replay and self._is_video_file()
+        self.stats: PipelineStats | None = None
+        """If set, the time taken to decode (and resize) every frame and to convert it to RGB is recorded in it."""
+        self.honoured_properties: dict[int, bool] = {}
+        """Whether the backend honoured each of the properties, i.e. accepted it and reports the requested value.
+        Populated once the video capture has been opened."""
         self._video_capture_thread: threading.Thread | None = None
         self._current_frame: np.ndarray | None = None
-        """The current frame in BGR."""
+        """The current frame in BGR (or RGB if `rgb` is set). This is one of the frame buffers, so it must not be
+        modified."""
+        self._current_slot: int = 0
+        """The index of the frame buffer holding the current frame."""
+        self._frame_buffers: list[np.ndarray] = []
+        """Preallocated frame buffers which the capture thread writes frames into in turn."""
+        self._buffer_readers: list[int] = []
+        """The number of leases checked out for every frame buffer. The capture thread skips buffers with readers."""
+        self._raw_frame: np.ndarray | None = None
+        """Frames are decoded into this buffer first if they have to be resized."""
+        self._decode_in_place: bool = False
+        """Whether the camera delivers frames at the requested height, so they can be decoded straight into the frame
+        buffers without resizing."""
+        self._frame_number: int = 0
+        """The sequence number of the current frame. Increases by one for every captured frame."""
+        self._frame_timestamp: float = 0
+        """When the current frame was captured, or its position in the video if it's replayed."""
+        self._end_of_stream: bool = False
+        self._replay_capture: cv2.VideoCapture | None = None
+        """The video being replayed, which frames are decoded from on demand (instead of on a capture thread)."""
+        self._replay_lock: threading.Lock = threading.Lock()
+        """Held while decoding a replayed frame."""
+        self._replay_fps: float = VIDEO_FILE_FPS
         self._stopping: bool = False
+        self._start_error: Exception | None = None
+        """The error which stopped the capture thread from opening the video capture target, if any."""
+        self._thread_finished: bool = False
         self._lock: threading.Lock = threading.Lock()
+        self._new_frame: threading.Condition = threading.Condition(self._lock)
+        """Notified by the capture thread whenever a new frame is available (or the video capture stops)."""
         if RECORD_VIDEO:
             codec = cv2.VideoWriter.fourcc(*'DIVX')
             self._video_writer = cv2.VideoWriter('output.avi', codec, 30.0, (640, 480))
 
     def start(self) -> None:
-        """Start capturing video. Blocks for a few seconds until the webcam is opened."""
+        """Start capturing video. Blocks until the first (non-blank) frame is captured, or throws a RuntimeError as
+        soon as the video capture target fails to open."""
 
-        if self._video_capture_thread is not None:
+        if self._video_capture_thread is not None or self._replay_capture is not None:
             raise RuntimeError("Error starting video capture: Video capture is already running.")
 
         logger.info("Starting video capture...")
+        self._end_of_stream = False
+        if self.replay:
+            self._start_replay()
+            return
+
+        start = time.perf_counter()
+        self._stopping = False
+        self._start_error = None
+        self._thread_finished = False
         self._video_capture_thread = threading.Thread(target=self._thread)
         self._video_capture_thread.start()
 
-        # wait until camera is opened (1 min timeout)
-        i = 0
-        while self._current_frame is None and i < 600:
-            time.sleep(0.1)
-            i += 1
+        # the capture thread notifies when the first frame is ready or when it fails
+        with self._new_frame:
+            self._new_frame.wait_for(lambda: self._current_frame is not None or self._thread_finished, START_TIMEOUT)
+            started = self._current_frame is not None
 
-        if self._current_frame is None:
+        if not started:
             self._stopping = True
             self._video_capture_thread.join()
             self._video_capture_thread = None
-            self._current_frame = None
-            raise RuntimeError("Error starting video capture: Camera failed to open (timed out).")
-
-        time.sleep(1)  # wait for a bit more as it returns garbage at first
+            if self._start_error is not None:
+                raise RuntimeError(f"Error starting video capture: {self._start_error}") from self._start_error
+            if not self._thread_finished:
+                raise RuntimeError("Error starting video capture: Camera failed to open (timed out).")
+            raise RuntimeError("Error starting video capture: No frames were captured.")
+
+        logger.info(f"Video capture started in {time.perf_counter() - start:.3f}s.")
+
+    def _start_replay(self) -> None:
+        self._replay_capture = self._open_video_capture()
+        fps = self._replay_capture.get(cv2.CAP_PROP_FPS)
+        self._replay_fps = fps if fps > 0 else VIDEO_FILE_FPS
+        with self._replay_lock:
+            if not self._replay_next_frame():
+                self._replay_capture.release()
+                self._replay_capture = None
+                raise RuntimeError(f"Error starting video capture: Video {self.target} has no frames.")
+        logger.info("Video capture started (replaying frame by frame).")
+
+    def _open_video_capture(self) -> cv2.VideoCapture:
+        """Opens the video capture target and applies the properties. Throws a RuntimeError if it can't be opened."""
 
-        logger.info("Video capture started.")
-
-    def _thread(self) -> None:
         video_capture = cv2.VideoCapture()
         success = video_capture.open(self.target, self.backend)
         if not success:
@@ -93,16 +258,70 @@ class VideoCapture:
             supported = video_capture.set(prop_id, prop_value)
             if not supported:
                 logger.warning(f"Property id {prop_id} is not supported by video capture backend {self.backend}.")
+            self.honoured_properties[prop_id] = supported and int(video_capture.get(prop_id)) == int(prop_value)
+        if self.low_latency:
+            logger.info(f"Low-latency properties honoured by backend {self.backend}: "
+                        f"{ {prop_id: self.honoured_properties[prop_id] for prop_id in LOW_LATENCY_PROPERTIES} }")
+
+        width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self._decode_in_place = self.full_resolution or height == self.resolution[1]
+        if self._decode_in_place:
+            logger.info(f"Capturing at {width}x{height}; frames will not be resized.")
+        else:
+            logger.info(f"Capturing at {width}x{height}; frames will be resized to a height of {self.resolution[1]}.")
+        return video_capture
 
+    def _thread(self) -> None:
+        try:
+            video_capture = self._open_video_capture()
+        except Exception as e:
+            logger.exception("Error opening video capture.")
+            with self._new_frame:
+                self._start_error = e
+                self._thread_finished = True
+                self._new_frame.notify_all()
+            return
+
+        try:
+            self._capture_frames(video_capture)
+        except Exception:
+            logger.exception("Error capturing video.")
+        finally:
+            video_capture.release()
+            if RECORD_VIDEO:
+                self._video_writer.release()
+            with self._new_frame:
+                self._thread_finished = True
+                self._new_frame.notify_all()
+
+    def _capture_frames(self, video_capture: cv2.VideoCapture) -> None:
+        """Capture frames until the video capture stops (or the end of a video file is reached)."""
+
+        frames_read = 0
+        warming_up = not self._is_video_file()
         while video_capture.isOpened():
-            success, video_capture_img = video_capture.read()
+            success = self._grab_latest(video_capture) if self.low_latency else video_capture.grab()
             if success:
-                # normalise and downscale resolution
-                new_dim = (int(video_capture_img.shape[1] / video_capture_img.shape[0] * 480), 480)
-                video_capture_img = cv2.resize(video_capture_img, new_dim, interpolation=cv2.INTER_NEAREST)
-                self._current_frame = video_capture_img
-                if RECORD_VIDEO:
-                    self._video_writer.write(video_capture_img)
+                start = time.perf_counter()
+                slot = self._retrieve(video_capture)
+                if self.stats is not None:
+                    self.stats.record("decode", time.perf_counter() - start)
+                if slot is not None:
+                    frames_read += 1
+                    if warming_up and self._is_warm_up_frame(self._frame_buffers[slot], frames_read):
+                        pass  # the slot isn't published, so it'll be reused for the next frame
+                    else:
+                        if warming_up:
+                            logger.info(f"Camera warmed up after {frames_read - 1} frame(s).")
+                            warming_up = False
+                        self._publish(slot, time.monotonic())
+            elif self._is_video_file():
+                logger.info("Reached the end of the video.")
+                with self._new_frame:
+                    self._end_of_stream = True
+                    self._new_frame.notify_all()
+                break
             else:
                 logger.warning("Unsuccessful video read; ignoring frame.")
 
@@ -110,44 +329,277 @@ class VideoCapture:
                 break
 
             # cap framerate if it's a test video
-            if isinstance(self.target, str) and len(self.target) >= 4 and self.target[-4:] in (".mp4", ".avi"):
-                time.sleep(1/30)
+            if self._is_video_file():
+                time.sleep(1 / VIDEO_FILE_FPS)
 
-        video_capture.release()
+    @staticmethod
+    def _is_warm_up_frame(image: np.ndarray, frames_read: int) -> bool:
+        """Whether a frame captured while the camera is warming up should be discarded, i.e. it's one of the first
+        `WARM_UP_FRAMES` frames, or it's blank (up to `MAX_WARM_UP_FRAMES` frames)."""
+
+        if frames_read <= WARM_UP_FRAMES:
+            return True
+        # a sparse sample of pixels is enough to tell a black frame from a real one
+        return frames_read <= MAX_WARM_UP_FRAMES and image[::8, ::8].max() < BLANK_FRAME_THRESHOLD
+
+    def _publish(self, slot: int, timestamp: float) -> None:
+        """Make the frame in the given frame buffer the current frame."""
+
+        with self._new_frame:
+            self._current_frame = self._frame_buffers[slot]
+            self._current_slot = slot
+            self._frame_number += 1
+            self._frame_timestamp = timestamp
+            self._new_frame.notify_all()
         if RECORD_VIDEO:
-            self._video_writer.release()
+            self._video_writer.write(self._frame_buffers[slot])
+
+    def _replay_next_frame(self) -> bool:
+        """Decode the next frame of the replayed video and make it the current frame. Must be called while holding the
+        replay lock. Returns whether there was a frame, setting `end_of_stream` otherwise."""
+
+        while self._replay_capture.grab():
+            start = time.perf_counter()
+            slot = self._retrieve(self._replay_capture)
+            if self.stats is not None:
+                self.stats.record("decode", time.perf_counter() - start)
+            if slot is not None:
+                # frame n is at (n - 1) / fps seconds into the video
+                self._publish(slot, self._frame_number / self._replay_fps)
+                return True
+        with self._new_frame:
+            self._end_of_stream = True
+            self._new_frame.notify_all()
+        return False
+
+    def _is_video_file(self) -> bool:
+        return isinstance(self.target, str) and len(self.target) >= 4 and self.target[-4:] in (".mp4", ".avi")
 
-    def get_current_frame(self) -> np.ndarray:
-        """Get the current frame in BGR. Throws a RuntimeError if the video capture is not running. (Or if video capture
-        returns None for some reason.)"""
+    @staticmethod
+    def _grab_latest(video_capture: cv2.VideoCapture) -> bool:
+        """Grab frames until the driver's queue is empty, so that the next retrieve decodes the freshest frame.
+        Only the last grabbed frame is decoded. Returns whether the last grab was successful."""
+
+        # the first grab plus up to MAX_DRAINED_FRAMES queued ones
+        for _ in range(MAX_DRAINED_FRAMES + 1):
+            start = time.perf_counter()
+            if not video_capture.grab():
+                return False
+            if time.perf_counter() - start > DRAIN_THRESHOLD:
+                break  # this grab had to wait for the camera, so its frame is live and the queue is empty
+        return True
+
+    def _retrieve(self, video_capture: cv2.VideoCapture) -> int | None:
+        """Decode the grabbed frame into a free frame buffer, resizing it and converting it to RGB if needed.
+        Returns the index of the frame buffer, or `None` if the frame was ignored."""
+
+        if self._decode_in_place and len(self._frame_buffers) > 0:
+            slot = self._get_free_slot(self._frame_buffers[0].shape)
+            if slot is None:
+                logger.warning("All frame buffers are checked out; ignoring frame.")
+                return None
+            video_capture_img = self._frame_buffers[slot]
+            success, decoded_img = video_capture.retrieve(video_capture_img)
+            if not success:
+                logger.warning("Unsuccessful video read; ignoring frame.")
+                return None
+            if decoded_img is video_capture_img:
+                self._convert_colour(video_capture_img)
+                return slot
+
+            # the camera doesn't deliver frames at the resolution it reported, so fall back to resizing
+            logger.warning(f"Camera delivered {decoded_img.shape[1]}x{decoded_img.shape[0]} frames; "
+                           f"frames will be resized.")
+            self._decode_in_place = False
+            self._raw_frame = decoded_img
+        else:
+            success, self._raw_frame = video_capture.retrieve(self._raw_frame)  # reuses the buffer after the first read
+            if not success:
+                logger.warning("Unsuccessful video read; ignoring frame.")
+                return None
+
+        height, width = self._raw_frame.shape[:2]
+        frame_height = height if self.full_resolution else self.resolution[1]
+        frame_shape = (frame_height, int(width / height * frame_height)) + tuple(self._raw_frame.shape[2:])
+        slot = self._get_free_slot(frame_shape)
+        if slot is None:
+            logger.warning("All frame buffers are checked out; ignoring frame.")
+            return None
+
+        video_capture_img = self._frame_buffers[slot]
+        if self._raw_frame.shape == frame_shape:
+            np.copyto(video_capture_img, self._raw_frame)
+        else:
+            # normalise and downscale resolution straight into the frame buffer
+            cv2.resize(self._raw_frame, (frame_shape[1], frame_shape[0]),
+                       dst=video_capture_img, interpolation=cv2.INTER_NEAREST)
+        self._convert_colour(video_capture_img)
+        return slot
+
+    def _convert_colour(self, video_capture_img: np.ndarray) -> None:
+        """Convert a frame buffer from BGR to RGB in place if `rgb` is set."""
+        if self.rgb:
+            start = time.perf_counter()
+            cv2.cvtColor(video_capture_img, cv2.COLOR_BGR2RGB, dst=video_capture_img)
+            if self.stats is not None:
+                self.stats.record("colour_conversion", time.perf_counter() - start)
+
+    def _get_free_slot(self, frame_shape: tuple[int, ...]) -> int | None:
+        """Returns the index of a frame buffer that is neither the current frame nor checked out, (re)allocating the
+        frame buffers if the frame shape has changed. Returns `None` if every buffer is in use."""
+
+        with self._lock:
+            if len(self._frame_buffers) == 0 or self._frame_buffers[0].shape != frame_shape:
+                # leases of the old buffers keep them alive until they are released
+                self._frame_buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(FRAME_BUFFER_COUNT)]
+                self._buffer_readers = [0] * FRAME_BUFFER_COUNT
+                self._current_slot = -1
+                return 0
+
+            for i in range(1, len(self._frame_buffers) + 1):
+                slot = (self._current_slot + i) % len(self._frame_buffers)
+                if slot != self._current_slot and self._buffer_readers[slot] == 0:
+                    return slot
+        return None
+
+    def _checkout_current_frame(self) -> FrameLease:
+        """Check out the current frame. Must be called while holding the lock, and the video capture must be running."""
+
+        self._buffer_readers[self._current_slot] += 1
+        image = self._current_frame.view()
+        image.flags.writeable = False
+        return FrameLease(image, self._frame_number, self._frame_timestamp, self._current_slot, self._buffer_readers,
+                          self._lock)
+
+    def checkout_current_frame(self) -> FrameLease:
+        """Check out the current frame without copying it. The returned lease must be released once the frame is no
+        longer needed. Throws a RuntimeError if the video capture is not running."""
 
         with self._lock:
             if self._current_frame is None:
                 raise RuntimeError("Error getting current frame: Video capture is not running. (Or video capture "
                                    "returned None for some reason.)")
-            else:
-                current_frame = self._current_frame.copy()
+            return self._checkout_current_frame()
+
+    def checkout_next_frame(self, timeout: float | None = None, after: int | None = None) -> FrameLease | None:
+        """Block until a frame newer than frame number `after` (the current frame by default) is captured, then check
+        it out without copying it. The returned lease must be released once the frame is no longer needed.
+        Returns `None` if no new frame arrives within `timeout` seconds, or straight away at the end of a video
+        (see `end_of_stream`). When replaying, this is always the frame right after `after`, which is decoded without
+        waiting. Throws a RuntimeError if the video capture is not running.
+
+        :param timeout The maximum number of seconds to wait, or `None` to wait indefinitely.
+        :param after The frame number of the last frame the caller has processed."""
+
+        if self.replay:
+            return self.checkout_frame((self._frame_number if after is None else after) + 1)
+
+        with self._new_frame:
+            if after is None:
+                after = self._frame_number
+            self._new_frame.wait_for(lambda: (self._frame_number > after or self._current_frame is None
+                                              or self._end_of_stream), timeout)
+            if self._current_frame is None:
+                raise RuntimeError("Error waiting for next frame: Video capture is not running.")
+            if self._frame_number <= after:
+                return None
+            return self._checkout_current_frame()
+
+    def checkout_frame(self, frame_number: int) -> FrameLease | None:
+        """Check out the frame with the given number (starting from 1) of a replayed video without copying it, decoding
+        it if needed. The returned lease must be released once the frame is no longer needed.
+        Returns `None` if the video has fewer frames (see `end_of_stream`).
+        Throws a RuntimeError if the video capture is not replaying or not running.
+
+        Going back to an earlier frame seeks, which some codecs can only do approximately."""
+
+        if not self.replay:
+            raise RuntimeError("Error getting frame: Only replayed videos can be read frame by frame.")
+        if frame_number < 1:
+            raise ValueError(f"Error getting frame: Frame number {frame_number} is not positive.")
+        with self._replay_lock:
+            if self._replay_capture is None:
+                raise RuntimeError("Error getting frame: Video capture is not running.")
+            if self._end_of_stream and frame_number > self._frame_number:
+                return None
+            if frame_number < self._frame_number:
+                self._replay_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
+                with self._lock:
+                    self._frame_number = frame_number - 1
+                    self._end_of_stream = False
+                if not self._replay_next_frame():
+                    return None
+            # skip to the frame without decoding the ones in between
+            while self._frame_number < frame_number - 1:
+                if not self._replay_capture.grab():
+                    with self._new_frame:
+                        self._end_of_stream = True
+                        self._new_frame.notify_all()
+                    return None
+                with self._lock:
+                    self._frame_number += 1
+            if self._frame_number < frame_number and not self._replay_next_frame():
+                return None
+            with self._lock:
+                return self._checkout_current_frame()
+
+    @property
+    def end_of_stream(self) -> bool:
+        """Whether the end of the video has been reached, so no more frames will be captured."""
+        return self._end_of_stream
 
-        return current_frame
+    def get_current_frame(self) -> np.ndarray:
+        """Get a copy of the current frame in BGR (or RGB if `rgb` is set). Throws a RuntimeError if the video capture
+        is not running. (Or if video capture returns None for some reason.)"""
+
+        with self.checkout_current_frame() as frame:
+            return frame.image.copy()
+
+    @property
+    def frame_number(self) -> int:
+        """The sequence number of the current frame (0 if no frame has been captured yet)."""
+        return self._frame_number
+
+    def wait_for_next_frame(self, timeout: float | None = None,
+                            after: int | None = None) -> tuple[int, np.ndarray] | None:
+        """Block until a frame newer than frame number `after` (the current frame by default) is captured, then return
+        its frame number and a copy of it in BGR (or RGB if `rgb` is set). Returns `None` if no new frame arrives within
+        `timeout` seconds. Throws a RuntimeError if the video capture is not running.
+
+        :param timeout The maximum number of seconds to wait, or `None` to wait indefinitely.
+        :param after The frame number of the last frame the caller has processed."""
+
+        frame = self.checkout_next_frame(timeout, after)
+        if frame is None:
+            return None
+        with frame:
+            return frame.frame_number, frame.image.copy()
 
     def stop(self) -> None:
         """Stop the video capture. Blocks for a few seconds until the webcam is closed."""
 
-        if self._video_capture_thread is None:
+        if self._video_capture_thread is None and self._replay_capture is None:
             raise RuntimeError("Error stopping video capture: Video capture is not running.")
 
         logger.info("Stopping video capture...")
-        self._stopping = True
-        self._video_capture_thread.join()
-        self._video_capture_thread = None
-        self._current_frame = None
+        if self.replay:
+            with self._replay_lock:
+                self._replay_capture.release()
+                self._replay_capture = None
+        else:
+            self._stopping = True
+            self._video_capture_thread.join()
+            self._video_capture_thread = None
+        with self._new_frame:
+            self._current_frame = None
+            self._new_frame.notify_all()
         logger.info("Video capture stopped.")
 
     @staticmethod
     def take_photo(target: int | str | None = None, backend: int | None = None,
                    properties: dict[int, int] | None = None) -> np.ndarray:
         """Returns a photo from a detectable camera."""
-        vid_cap = VideoCapture(target, backend, properties)
+        vid_cap = VideoCapture(target, backend, properties, replay=True)  # no need to play video files in real time
         vid_cap.start()
         image = vid_cap.get_current_frame()
         vid_cap.stop()
@@ -0,0 +1,193 @@
+"""
+Replays recorded videos through the full hotspot detection pipeline as fast as possible, and reports its throughput,
+per-frame latency, CPU time and peak memory as JSON, so that runs can be compared against a baseline.
+
+Every video needs a JSON file next to it with the same name, holding the "calibration_matrix" (3x3) and the
+"hotspots" (ids to [x, y, radius] in projector space), like Test/Assets/hotspot_test.json.
+
+Run from the WallProjections folder, e.g.::
+
+    python3 -m Scripts.Internal.benchmark --output results.json
+    python3 -m Scripts.Internal.benchmark site_recording.mp4 --baseline results.json
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import Scripts.Helper.HotspotDetector
+from Scripts.Helper.EventDispatcher import EventDispatcher
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.Hotspot import HotspotSet
+from Scripts.Helper.HotspotDetector import HotspotDetector
+from Scripts.Helper.PipelineStats import PipelineStats
+from Scripts.Helper.logger import setup_logger
+from Scripts.Interop.json_dict_converters import json_to_3dict
+
+try:
+    import resource
+except ImportError:
+    resource = None  # not available on Windows
+
+logger = setup_logger("benchmark")
+
+DEFAULT_VIDEOS: list[str] = [os.path.abspath(__file__ + "/../../Test/Assets/hotspot_test.avi")]
+"""The videos to replay if none are given."""
+
+REGRESSION_TOLERANCE: float = 0.1
+"""The fraction by which a result may be worse than the baseline before it's reported as a regression."""
+
+
+class _RecordingEventHandler(EventHandler):
+    def __init__(self):
+        self.hotspots_pressed: set[int] = set()
+
+    def OnHotspotPressed(self, hotspot_id):
+        self.hotspots_pressed.add(hotspot_id)
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        pass
+
+
+def _peak_memory_mb() -> float | None:
+    """Returns the peak resident memory of this process so far in MiB, or None if it can't be measured"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 1024 ** 2 if sys.platform == "darwin" else max_rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def benchmark_video(video_path: str) -> dict:
+    """
+    Replays the given video through the detection pipeline and returns its results
+    """
+    config_path = os.path.splitext(video_path)[0] + ".json"
+    if not os.path.isfile(config_path):
+        raise RuntimeError(f"Error benchmarking {video_path}: Config {config_path} not found.")
+    with open(config_path) as config_file:
+        config = json.load(config_file)
+    calibration_matrix = np.array(config["calibration_matrix"], dtype=np.float64)
+    hotspots_coords = json_to_3dict(json.dumps(config["hotspots"]))
+
+    stats = PipelineStats(log_interval=math.inf)
+    event_handler = _RecordingEventHandler()
+    event_dispatcher = EventDispatcher(event_handler, stats=stats)
+    first_frame: tuple[float, float] | None = None
+    """The wall-clock and CPU time of the first frame."""
+    last_frame: tuple[float, float] | None = None
+    frames_captured = 0
+
+    def on_frame(frame_number: int, _image: np.ndarray) -> None:
+        nonlocal first_frame, last_frame, frames_captured
+        last_frame = time.perf_counter(), time.process_time()
+        if first_frame is None:
+            first_frame = last_frame
+        frames_captured = frame_number
+
+    # the detector stops by itself at the end of the video
+    detector = HotspotDetector(video_path, calibration_matrix,
+                               HotspotSet.from_coords(event_dispatcher, hotspots_coords),
+                               frame_listener=on_frame, stats=stats)
+    event_dispatcher.start()
+    try:
+        detector.run()
+    finally:
+        event_dispatcher.stop()
+
+    if first_frame is None:
+        raise RuntimeError(f"Error benchmarking {video_path}: No frames were captured.")
+    duration = max(last_frame[0] - first_frame[0], 1e-9)
+    cpu_time = last_frame[1] - first_frame[1]
+    stages = stats.snapshot()
+    frame_stats = stages.get("frame", {"count": 0})
+    return {
+        "frames_captured": frames_captured,
+        "frames_processed": frame_stats["count"],
+        "duration_s": duration,
+        "fps": frame_stats["count"] / duration,
+        "frame_latency_ms": {key: value for key, value in frame_stats.items() if key.endswith("_ms")},
+        "cpu_time_s": cpu_time,
+        "cpu_utilisation": cpu_time / duration,
+        "peak_memory_mb": _peak_memory_mb(),
+        "hotspots_pressed": sorted(event_handler.hotspots_pressed),
+        "stages": stages,
+    }
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float = REGRESSION_TOLERANCE) -> list[str]:
+    """
+    Compares the results of every video with the baseline and returns a description of every regression: lower
+    throughput, higher p95 latency or more CPU time per frame (beyond the tolerance), or different hotspots pressed
+    """
+    regressions = []
+    for video, result in results["videos"].items():
+        base = baseline["videos"].get(video)
+        if base is None:
+            continue
+        if result["fps"] < base["fps"] * (1 - tolerance):
+            regressions.append(f"{video}: throughput dropped from {base['fps']:.1f} to {result['fps']:.1f} fps")
+        p95, base_p95 = result["frame_latency_ms"].get("p95_ms"), base["frame_latency_ms"].get("p95_ms")
+        if p95 is not None and base_p95 is not None and p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{video}: p95 frame latency rose from {base_p95:.1f} to {p95:.1f}ms")
+        cpu_per_frame = result["cpu_time_s"] / max(result["frames_processed"], 1)
+        base_cpu_per_frame = base["cpu_time_s"] / max(base["frames_processed"], 1)
+        if cpu_per_frame > base_cpu_per_frame * (1 + tolerance):
+            regressions.append(f"{video}: CPU time per frame rose from {base_cpu_per_frame * 1000:.1f} "
+                               f"to {cpu_per_frame * 1000:.1f}ms")
+        if result["hotspots_pressed"] != base["hotspots_pressed"]:
+            regressions.append(f"{video}: hotspots pressed changed from {base['hotspots_pressed']} "
+                               f"to {result['hotspots_pressed']}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the hotspot detection pipeline on recorded videos.")
+    parser.add_argument("videos", nargs="*", default=DEFAULT_VIDEOS, help="the videos to replay")
+    parser.add_argument("--output", help="the file to write the results to as JSON")
+    parser.add_argument("--baseline", help="the results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="the fraction by which results may be worse than the baseline")
+    args = parser.parse_args()
+
+    # replay every frame as fast as it can be processed instead of in real time
+    Scripts.Helper.HotspotDetector.REPLAY_VIDEO_FILES = True
+
+    results = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "videos": {},
+    }
+    for video_path in args.videos:
+        print(f"Benchmarking {video_path}...", file=sys.stderr)
+        results["videos"][os.path.basename(video_path)] = benchmark_video(video_path)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if len(regressions) > 0:
+            return 1
+        print("No regressions against the baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
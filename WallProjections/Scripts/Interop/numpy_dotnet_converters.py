@@ -1,4 +1,6 @@
 ﻿# Code taken from https://github.com/pythonnet/pythonnet/issues/514#issuecomment-350375105
+import threading
+
 import numpy as np
 import ctypes
 import clr
@@ -36,29 +38,42 @@ _MAP_NET_NP = {
 }
 
 
+def _netDtype(netArray):
+    netType = netArray.GetType().GetElementType().Name
+    try:
+        return _MAP_NET_NP[netType]
+    except KeyError:
+        raise NotImplementedError("asNumpyArray does not yet support System type {}".format(netType))
+
+
+def pinnedView(netArray):
+    '''
+    Given a CLR `System.Array`, pins it and returns the `GCHandle` pinning it
+    and a `numpy.ndarray` viewing its memory (without copying).
+
+    The view is only valid until the handle is freed, after which the garbage
+    collector may move the array.
+    '''
+    dtype = _netDtype(netArray)
+    dims = tuple(netArray.GetLength(I) for I in range(netArray.Rank))
+    handle = GCHandle.Alloc(netArray, GCHandleType.Pinned)
+    nbytes = int(np.prod(dims)) * dtype.itemsize
+    if nbytes == 0:
+        return handle, np.empty(dims, dtype=dtype)
+    buffer = (ctypes.c_uint8 * nbytes).from_address(handle.AddrOfPinnedObject().ToInt64())
+    return handle, np.frombuffer(buffer, dtype=dtype).reshape(dims)
+
+
 def asNumpyArray(netArray):
     '''
     Given a CLR `System.Array` returns a `numpy.ndarray`.  See _MAP_NET_NP for
     the mapping of CLR types to Numpy dtypes.
     '''
-    dims = np.empty(netArray.Rank, dtype=int)
-    for I in range(netArray.Rank):
-        dims[I] = netArray.GetLength(I)
-    netType = netArray.GetType().GetElementType().Name
-
+    handle, view = pinnedView(netArray)
     try:
-        npArray = np.empty(dims, order='C', dtype=_MAP_NET_NP[netType])
-    except KeyError:
-        raise NotImplementedError("asNumpyArray does not yet support System type {}".format(netType))
-
-    try:  # Memmove
-        sourceHandle = GCHandle.Alloc(netArray, GCHandleType.Pinned)
-        sourcePtr = sourceHandle.AddrOfPinnedObject().ToInt64()
-        destPtr = npArray.__array_interface__['data'][0]
-        ctypes.memmove(destPtr, sourcePtr, npArray.nbytes)
+        return view.copy()
     finally:
-        if sourceHandle.IsAllocated: sourceHandle.Free()
-    return npArray
+        handle.Free()
 
 
 def asNetArray(npArray):
@@ -69,7 +84,7 @@ def asNetArray(npArray):
     Note: `complex64` and `complex128` arrays are converted to `float32`
     and `float64` arrays respectively with shape [m,n,...] -> [m,n,...,2]
     '''
-    dims = npArray.shape
+    dims = list(npArray.shape)
     dtype = npArray.dtype
     # For complex arrays, we must make a view of the array as its corresponding
     # float type.
@@ -82,9 +97,7 @@ def asNetArray(npArray):
         dims.append(2)
         npArray = npArray.view(np.float64).reshape(dims)
 
-    netDims = Array.CreateInstance(Int32, npArray.ndim)
-    for I in range(npArray.ndim):
-        netDims[I] = Int32(dims[I])
+    netDims = Array[Int32](dims)
 
     if not npArray.flags.c_contiguous:
         npArray = npArray.copy(order='C')
@@ -95,16 +108,133 @@ def asNetArray(npArray):
     except KeyError:
         raise NotImplementedError("asNetArray does not yet support dtype {}".format(dtype))
 
+    destHandle = GCHandle.Alloc(netArray, GCHandleType.Pinned)
     try:  # Memmove
-        destHandle = GCHandle.Alloc(netArray, GCHandleType.Pinned)
         sourcePtr = npArray.__array_interface__['data'][0]
         destPtr = destHandle.AddrOfPinnedObject().ToInt64()
         ctypes.memmove(destPtr, sourcePtr, npArray.nbytes)
     finally:
-        if destHandle.IsAllocated: destHandle.Free()
+        destHandle.Free()
     return netArray
 
 
+class PinnedBufferPool:
+    '''
+    A fixed set of CLR arrays (e.g. `byte[height, width, 3]` frames), pinned
+    for the lifetime of the pool and viewed by NumPy without copying, so that
+    frames can cross between Python and .NET every frame without allocating or
+    copying anything.
+
+    Buffers are referred to by their index. The producer checks out a free
+    buffer, writes into its view and publishes it; the consumer takes the
+    latest published buffer, reads its CLR array and checks it back in. A
+    published buffer which nobody took is recycled once a newer one is
+    published, so a slow consumer only ever sees the latest frame and the
+    producer never waits.
+    '''
+
+    def __init__(self, netArrays):
+        '''
+        :param netArrays The CLR arrays to share, usually allocated by .NET.
+        '''
+        self._lock = threading.Lock()
+        self._netArrays = list(netArrays)
+        self._handles = []
+        self._views = []
+        try:
+            for netArray in self._netArrays:
+                handle, view = pinnedView(netArray)
+                self._handles.append(handle)
+                self._views.append(view)
+        except Exception:
+            self.close()
+            raise
+        self._free = list(range(len(self._netArrays)))
+        self._latest = None
+        self._closed = False
+
+    @staticmethod
+    def allocate(shape, dtype=np.uint8, count=3):
+        '''
+        Allocates `count` CLR arrays of the given shape and dtype and returns
+        a pool of them.
+        '''
+        try:
+            netType = _MAP_NP_NET[np.dtype(dtype)]
+        except KeyError:
+            raise NotImplementedError("PinnedBufferPool does not yet support dtype {}".format(dtype))
+        return PinnedBufferPool([Array.CreateInstance(netType, Array[Int32](list(shape))) for _ in range(count)])
+
+    def __len__(self):
+        return len(self._netArrays)
+
+    def view(self, index):
+        '''
+        Returns the `numpy.ndarray` viewing the buffer. Writing to it writes
+        to the CLR array. Only valid until the pool is closed.
+        '''
+        return self._views[index]
+
+    def netArray(self, index):
+        return self._netArrays[index]
+
+    def checkout(self):
+        '''
+        Returns the index of a free buffer for the producer to write into, or
+        None if every buffer is in use (or the pool is closed), in which case
+        the frame should be dropped.
+        '''
+        with self._lock:
+            if self._closed or len(self._free) == 0:
+                return None
+            return self._free.pop()
+
+    def publish(self, index):
+        '''
+        Hands a checked out buffer to the consumer, replacing (and freeing)
+        any published buffer it hasn't taken yet.
+        '''
+        with self._lock:
+            if self._latest is not None:
+                self._free.append(self._latest)
+            self._latest = index
+
+    def takeLatest(self):
+        '''
+        Returns the index of the latest published buffer for the consumer to
+        read, or -1 if nothing was published since the last call. The buffer
+        must be checked back in once read.
+        '''
+        with self._lock:
+            index, self._latest = self._latest, None
+            return -1 if index is None else index
+
+    def checkin(self, index):
+        '''
+        Returns a buffer (checked out or taken) to the pool.
+        '''
+        with self._lock:
+            if self._closed:
+                return
+            if not 0 <= index < len(self._netArrays) or index in self._free or index == self._latest:
+                raise ValueError("Buffer {} isn't checked out".format(index))
+            self._free.append(index)
+
+    def close(self):
+        '''
+        Unpins the buffers. Their views mustn't be used afterwards.
+        '''
+        with self._lock:
+            self._closed = True
+            self._free = []
+            self._latest = None
+            for handle in self._handles:
+                if handle.IsAllocated:
+                    handle.Free()
+            self._handles = []
+            self._views = []
+
+
 if __name__ == "__main__":
     array = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9])
     print(asNumpyArray(asNetArray(array)))
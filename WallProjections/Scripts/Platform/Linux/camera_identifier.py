@@ -1,25 +1,145 @@
-import glob
+import concurrent.futures
+import fcntl
 import json
+import os
+import re
+import struct
+import threading
+
 import cv2
 from Scripts.Helper.logger import setup_logger
+from Scripts.video_capture_factory import capture_manager
 
 logger = setup_logger("camera_identifier")
 
+SYSFS_PATH: str = "/sys/class/video4linux"
+"""The sysfs directory listing every video4linux device node, which is read to find cameras without opening them."""
 
-def get_cameras() -> str:
-    camera_indices: dict[int, str] = {}
-    cv2.setLogLevel(0)
-    devices = glob.glob('/dev/video*')
-    for device_name, device in enumerate(devices):
-        try:
-            # Extract the index from the device file path
-            index = int(device.lstrip('/dev/video'))
-            cam = cv2.VideoCapture(index)
-            if cam.isOpened():
-                camera_indices[index] = f"Camera {device_name + 1}"
-                cam.release()
-        except Exception:
+DEV_PATH: str = "/dev"
+"""The directory holding the device nodes named in sysfs."""
+
+VERIFY_CAMERAS: bool = False
+"""Whether to also open every camera found in sysfs to check that OpenCV can capture from it.
+
+This takes about a second per camera (the cameras are opened in parallel), so only enable it if sysfs lists cameras
+which don't work. Cameras already in use by this process are not opened again."""
+
+MAX_VERIFY_WORKERS: int = 4
+"""The maximum number of cameras to open at once when verifying them."""
+
+_VIDIOC_QUERYCAP: int = 0x80685600
+"""The ioctl request which reads a device node's ``struct v4l2_capability`` (104 bytes)."""
+
+_V4L2_CAP_VIDEO_CAPTURE: int = 0x00000001
+_V4L2_CAP_DEVICE_CAPS: int = 0x80000000
+
+_cache_lock: threading.Lock = threading.Lock()
+_cache: tuple[tuple, dict[int, str]] | None = None
+"""The last cameras found, and the sysfs listing (and settings) they were found with."""
+
+
+def _read_attribute(node_path: str, attribute: str) -> str | None:
+    try:
+        with open(os.path.join(node_path, attribute)) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def _has_capture_capability(device_path: str) -> bool | None:
+    """
+    Returns whether the device node can capture video, by querying its capabilities (which doesn't start or disturb
+    streaming). Returns None if they can't be queried, e.g. because the node isn't accessible.
+    """
+    try:
+        fd = os.open(device_path, os.O_RDONLY | os.O_NONBLOCK)
+    except OSError:
+        return None
+    try:
+        buffer = bytearray(104)
+        fcntl.ioctl(fd, _VIDIOC_QUERYCAP, buffer)
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+    capabilities, device_caps = struct.unpack_from("<II", buffer, 84)
+    if capabilities & _V4L2_CAP_DEVICE_CAPS:
+        capabilities = device_caps  # the capabilities of this node rather than of the whole device
+    return bool(capabilities & _V4L2_CAP_VIDEO_CAPTURE)
+
+
+def _verify_camera(index: int) -> bool:
+    if capture_manager.is_open(index):
+        return True  # opening it again could disturb the stream
+    cam = cv2.VideoCapture(index, cv2.CAP_V4L2)
+    try:
+        return cam.isOpened()
+    finally:
+        cam.release()
+
+
+def _scan(sysfs_path: str, dev_path: str, node_names: list[str], verify: bool) -> dict[int, str]:
+    # devices like UVC webcams have several nodes (e.g. for metadata), so only keep one capture node per device
+    nodes_by_device: dict[str, tuple[int, int, str]] = {}
+    for node_name in node_names:
+        match = re.fullmatch(r"video(\d+)", node_name)
+        if match is None:
+            continue
+        camera_index = int(match.group(1))
+        node_path = os.path.join(sysfs_path, node_name)
+        node_index = _read_attribute(node_path, "index")
+        node_index = int(node_index) if node_index is not None and node_index.isdigit() else 0
+        is_capture = _has_capture_capability(os.path.join(dev_path, node_name))
+        if is_capture is None:
+            is_capture = node_index == 0  # the capture node comes first; metadata nodes follow it
+        if not is_capture:
             continue
 
+        device = os.path.realpath(os.path.join(node_path, "device"))
+        name = _read_attribute(node_path, "name") or f"Camera {camera_index}"
+        if device not in nodes_by_device or (node_index, camera_index) < nodes_by_device[device][:2]:
+            nodes_by_device[device] = (node_index, camera_index, name)
+
+    cameras = {camera_index: name for _, camera_index, name in nodes_by_device.values()}
+    if verify and len(cameras) > 0:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_VERIFY_WORKERS) as executor:
+            verified = dict(zip(cameras, executor.map(_verify_camera, cameras)))
+        cameras = {index: name for index, name in cameras.items() if verified[index]}
+
+    # tell identical cameras apart
+    names: dict[str, int] = {}
+    for index in sorted(cameras):
+        name = cameras[index]
+        names[name] = names.get(name, 0) + 1
+        if names[name] > 1:
+            cameras[index] = f"{name} ({names[name]})"
+    return dict(sorted(cameras.items()))
+
+
+def find_cameras(sysfs_path: str = SYSFS_PATH, dev_path: str = DEV_PATH,
+                 verify: bool = VERIFY_CAMERAS) -> dict[int, str]:
+    """
+    Returns the index (passed to OpenCV) and name of every video capture device listed in sysfs, without opening any
+    of them (unless verify is set). The result is cached until the list of device nodes changes.
+    """
+    global _cache
+    try:
+        node_names = sorted(os.listdir(sysfs_path))
+    except OSError:
+        logger.warning(f"Error listing video devices: {sysfs_path} is not readable.")
+        node_names = []
+
+    key = (sysfs_path, dev_path, verify, tuple(node_names))
+    with _cache_lock:
+        if _cache is not None and _cache[0] == key:
+            return dict(_cache[1])
+        cameras = _scan(sysfs_path, dev_path, node_names, verify)
+        _cache = (key, cameras)
+        return dict(cameras)
+
+
+def get_cameras() -> str:
+    cv2.setLogLevel(0)
+    camera_indices = find_cameras()
     logger.info(f"Identified {len(camera_indices)} cameras.")
     return json.dumps(camera_indices)
@@ -1,44 +1,118 @@
 import concurrent.futures
 import json
+import threading
+import time
+from collections import deque
+
 import cv2
 from Scripts.Helper.logger import setup_logger
+from Scripts.video_capture_factory import capture_manager
 
 MAX_INDEX = 1000
+"""The camera indices scanned are below this."""
+
+MAX_WORKERS = 4
+"""The maximum number of cameras opened at once while scanning."""
+
+MAX_CONSECUTIVE_MISSES = 3
+"""The scan stops once this many indices in a row have no camera."""
+
 TIMEOUT = 5
+"""The number of seconds after which the scan stops opening more cameras. Cameras being opened at that point are still
+waited for (and released)."""
+
+CACHE_TTL = 60
+"""The number of seconds for which find_cameras returns the cameras found by the last scan rather than rescanning."""
 
 logger = setup_logger("camera_identifier")
 
+_cache_lock = threading.Lock()
+"""Also held while scanning, so that concurrent calls wait for the same scan rather than open every camera twice."""
+_cached_cameras: dict[int, str] | None = None
+"""The cameras found by the last scan, if any."""
+_cached_at: float = 0
+"""When the last scan finished, according to time.monotonic."""
+
 
 def open_camera(i) -> int | None:
+    if capture_manager.is_open(i):
+        return i  # already in use by this process, and opening it again could disturb the stream
+    cap = cv2.VideoCapture()
     try:
-        cap = cv2.VideoCapture()
         cap.setExceptionMode(True)
         cap.open(i)
         if cap.isOpened():
-            cap.release()
             return i
     except cv2.error:
         return None
     except Exception:
         return None
+    finally:
+        cap.release()
+    return None
 
 
-def get_cameras() -> str:
-    camera_indices: dict[int, str] = {}
+def scan_cameras() -> dict[int, str]:
+    """
+    Opens cameras in order of index (a few at once), until MAX_CONSECUTIVE_MISSES indices in a row have no camera,
+    and returns the index and name of every camera found. Every camera opened is released before this returns.
+    """
     cv2.setLogLevel(0)
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        futures = [executor.submit(open_camera, i) for i in range(MAX_INDEX)]
-        done, not_done = concurrent.futures.wait(futures, timeout=TIMEOUT)
-        for future in done:
+    found: list[int] = []
+    deadline = time.monotonic() + TIMEOUT
+    # leaving the with block waits for every probe still running, so no camera is left open
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        in_flight: deque[concurrent.futures.Future] = deque()
+        next_index = 0
+        misses = 0
+        while True:
+            while (next_index < MAX_INDEX and len(in_flight) < MAX_WORKERS and misses < MAX_CONSECUTIVE_MISSES
+                   and time.monotonic() < deadline):
+                in_flight.append(executor.submit(open_camera, next_index))
+                next_index += 1
+            if len(in_flight) == 0:
+                break
+            # results are handled in order of index, so that the misses counted are consecutive
+            index = in_flight.popleft().result()
+            if misses >= MAX_CONSECUTIVE_MISSES:
+                continue  # the scan is over; just wait for the remaining probes
+            if index is None:
+                misses += 1
+            else:
+                misses = 0
+                found.append(index)
+        if next_index < MAX_INDEX and misses < MAX_CONSECUTIVE_MISSES:
+            logger.warning(f"Camera scan timed out after {TIMEOUT}s at index {next_index}.")
+
+    return {index: f"Camera {i + 1}" for i, index in enumerate(found)}
+
+
+def invalidate_cameras() -> None:
+    """Makes the next call to find_cameras rescan, e.g. once a camera has been plugged in or out."""
+    global _cached_cameras
+    with _cache_lock:
+        _cached_cameras = None
+
+
+def find_cameras() -> dict[int, str]:
+    """
+    Returns the index and name of every camera. A scan's result is returned without touching the cameras until it's
+    CACHE_TTL seconds old or invalidate_cameras is called, after which the next call rescans.
+    """
+    global _cached_cameras, _cached_at
+    with _cache_lock:
+        if _cached_cameras is None or time.monotonic() - _cached_at > CACHE_TTL:
             try:
-                index = future.result()
-                if index is not None:
-                    camera_indices[index] = f"Camera {len(camera_indices) + 1}"
-            except concurrent.futures.TimeoutError:
-                continue
+                cameras = scan_cameras()
+            except Exception:
+                logger.exception("Error scanning for cameras.")
+                return {}
+            _cached_cameras = cameras
+            _cached_at = time.monotonic()
+        return dict(_cached_cameras)
 
-        for future in not_done:
-            future.cancel()
 
+def get_cameras() -> str:
+    camera_indices = find_cameras()
     logger.info(f"Identified {len(camera_indices)} cameras.")
     return json.dumps(camera_indices)
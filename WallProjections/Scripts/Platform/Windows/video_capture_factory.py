@@ -1,17 +1,30 @@
 ﻿import cv2
 import numpy as np
+from Scripts.Helper.CaptureManager import CaptureManager
 from Scripts.Helper.VideoCapture import VideoCapture
 
 
-def getVideoCapture(camera_index: int) -> VideoCapture:
+def getVideoCapture(camera_index: int, low_latency: bool = False, rgb: bool = False,
+                    replay: bool = False, full_resolution: bool = False) -> VideoCapture:
     """
     Create a new VideoCapture that uses the specified camera index.
+    In low-latency mode, the driver's frame queue is skipped so that the freshest frame is always delivered.
+    If rgb is set, frames are converted to RGB in the capture thread.
+    If replay is set, video files are replayed frame by frame as fast as they are consumed instead of in real time.
+    If full_resolution is set, frames are captured at the highest resolution the camera supports and not resized.
     """
-    return VideoCapture(target=camera_index, backend=cv2.CAP_DSHOW)
+    return VideoCapture(target=camera_index, backend=cv2.CAP_DSHOW, low_latency=low_latency, rgb=rgb,
+                        replay=replay, full_resolution=full_resolution)
 
 
-def take_photo(camera_index: int) -> np.ndarray:
+capture_manager: CaptureManager = CaptureManager(getVideoCapture)
+"""The process-wide capture manager, which shares one open video capture per camera between all its users."""
+
+
+def take_photo(camera_index: int, full_resolution: bool = False) -> np.ndarray:
     """
     Take a photo using the specified camera index.
+    If the camera is already open (e.g. for hotspot detection), the photo is taken from its live stream.
+    Otherwise, if full_resolution is set, the photo is taken at the highest resolution the camera supports.
     """
-    return VideoCapture.take_photo(target=camera_index, backend=cv2.CAP_DSHOW)
+    return capture_manager.take_photo(camera_index, full_resolution)
@@ -0,0 +1,81 @@
+import unittest
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.CalibrationMesh import CalibrationMesh
+from Scripts.Helper.Calibrator import Calibrator
+
+CAMERA_RES = (640, 480)
+
+
+def curved_wall(cam_points: np.ndarray) -> np.ndarray:
+    """Maps camera points to projector points on a wall with a bulge, which no homography describes"""
+    x, y = cam_points[:, 0], cam_points[:, 1]
+    return np.column_stack((3 * x + 60 * np.sin(np.pi * x / CAMERA_RES[0]),
+                            2 * y + 40 * np.sin(np.pi * y / CAMERA_RES[1])))
+
+
+def marker_grid(mapping) -> tuple[dict[int, tuple[np.float32, np.float32]], dict[int, tuple[float, float]]]:
+    cam_points = np.array([(20 + i % 13 * 50, 15 + i // 13 * 50) for i in range(13 * 10)], dtype=np.float64)
+    proj_points = mapping(cam_points)
+    return ({i: (np.float32(x), np.float32(y)) for i, (x, y) in enumerate(cam_points)},
+            {i: (float(x), float(y)) for i, (x, y) in enumerate(proj_points)})
+
+
+class TestCalibrationMesh(unittest.TestCase):
+    def setUp(self):
+        self.camera_coords, self.projector_coords = marker_grid(curved_wall)
+        self.mesh = CalibrationMesh.fit(self.camera_coords, self.projector_coords, CAMERA_RES)
+        # points inside the markers
+        self.cam_points = np.random.rand(200, 2) * (590, 440) + (25, 20)
+
+    def test_more_accurate_than_homography(self):
+        expected = curved_wall(self.cam_points)
+        mesh_error = np.abs(self.mesh.norm_to_proj_batch(self.cam_points / CAMERA_RES) - expected).max()
+
+        matrix = Calibrator._get_transformation_matrix(self.camera_coords, self.projector_coords)
+        homography_error = np.abs(cv2.perspectiveTransform(self.cam_points.reshape(-1, 1, 2), matrix).reshape(-1, 2)
+                                  - expected).max()
+        self.assertLess(mesh_error, 3)
+        self.assertGreater(homography_error, mesh_error * 3)
+
+    def test_flat_wall_matches_homography(self):
+        matrix = np.array([[2, 0.1, 30], [-0.05, 1.8, 10], [0, 0, 1]])
+        camera_coords, projector_coords = marker_grid(lambda points: cv2.transform(points.reshape(-1, 1, 2),
+                                                                                   matrix).reshape(-1, 3)[:, :2])
+        mesh = CalibrationMesh.fit(camera_coords, projector_coords, CAMERA_RES)
+        # including the edges of the camera image, outside the markers
+        cam_points = np.random.rand(200, 2) * CAMERA_RES
+        expected = cv2.transform(cam_points.reshape(-1, 1, 2), matrix).reshape(-1, 3)[:, :2]
+        self.assertTrue(np.allclose(mesh.norm_to_proj_batch(cam_points / CAMERA_RES), expected, atol=0.01))
+
+    def test_array_roundtrip(self):
+        array = self.mesh.to_array()
+        self.assertEqual(array.ndim, 2)
+        self.assertTrue(CalibrationMesh.is_mesh_array(array))
+        self.assertFalse(CalibrationMesh.is_mesh_array(np.identity(3)))
+        norm_points = self.cam_points / CAMERA_RES
+        self.assertTrue(np.array_equal(CalibrationMesh.from_array(array).norm_to_proj_batch(norm_points),
+                                       self.mesh.norm_to_proj_batch(norm_points)))
+        self.assertRaises(ValueError, CalibrationMesh.from_array, np.identity(3))
+
+    def test_not_enough_markers(self):
+        self.assertRaises(RuntimeError, CalibrationMesh.fit, {0: (0, 0), 1: (1, 0), 2: (0, 1)},
+                          {0: (0, 0), 1: (1, 0), 2: (0, 1)}, CAMERA_RES)
+
+    def test_calibrator_with_mesh(self):
+        calibrator = Calibrator(self.mesh.to_array(), CAMERA_RES)
+        norm_points = self.cam_points / CAMERA_RES
+        batch_result = calibrator.norm_to_proj_batch(norm_points)
+        self.assertTrue(np.allclose(batch_result, self.mesh.norm_to_proj_batch(norm_points)))
+        for norm_point, batch_point in zip(norm_points[:10], batch_result):
+            self.assertTrue(np.allclose(calibrator.norm_to_proj(tuple(norm_point)), batch_point, atol=1))
+        # mapping back is approximate, but in the right area
+        for cam_point in self.cam_points[:10]:
+            proj_point = curved_wall(cam_point.reshape(1, 2))[0]
+            self.assertTrue(np.allclose(calibrator.proj_to_cam(tuple(proj_point)), cam_point, atol=30))
+
+
+if __name__ == '__main__':
+    unittest.main()
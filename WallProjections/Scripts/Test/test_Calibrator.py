@@ -1,4 +1,6 @@
 import logging
+import os
+import tempfile
 import unittest
 from typing import Union
 
@@ -93,6 +95,43 @@ class TestDetectArUcos(unittest.TestCase):
         detected_dict = Calibrator._detect_ArUcos(image)
         self.assertTrue(dictionaries_the_same(known_dict, detected_dict))
 
+    def test_detect_small_markers_in_large_image(self):
+        # too small for the default detector at this size, so only the full-resolution search finds them
+        image = np.full((2160, 3840), 255, np.uint8)
+        positions = {}
+        for code in range(24):
+            top_left_corner = (200 + code % 8 * 400, 300 + code // 8 * 600)
+            aruco_image = aruco.generateImageMarker(ARUCO_DICT, code, 63, borderBits=1)
+            image[top_left_corner[1]:top_left_corner[1] + aruco_image.shape[0],
+                  top_left_corner[0]:top_left_corner[0] + aruco_image.shape[1]] = aruco_image
+            positions[code] = top_left_corner
+
+        detected_position_dict = Calibrator._detect_ArUcos(image)
+        self.assertTrue(dictionaries_the_same(detected_position_dict, positions))
+
+
+class TestCalibrate(unittest.TestCase):
+    def test_full_resolution_photo_scaled_to_frames(self):
+        # a 1280x960 "camera", whose frames are captured at 640x480 for hotspot detection
+        image = np.full((960, 1280), 255, np.uint8)
+        frame_positions = {}
+        for code in range(8):
+            top_left_corner = (100 + code % 4 * 300, 200 + code // 4 * 400)
+            aruco_image = aruco.generateImageMarker(ARUCO_DICT, code, 100, borderBits=1)
+            image[top_left_corner[1]:top_left_corner[1] + aruco_image.shape[0],
+                  top_left_corner[0]:top_left_corner[0] + aruco_image.shape[1]] = aruco_image
+            frame_positions[code] = ((top_left_corner[0] + 0.5) / 2 - 0.5, (top_left_corner[1] + 0.5) / 2 - 0.5)
+        projector_positions = {code: (x * 3 + 50, y * 2 + 20) for code, (x, y) in frame_positions.items()}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "photo.png")
+            cv2.imwrite(path, image)
+            t_matrix = Calibrator.calibrate(path, projector_positions)
+
+        for code, frame_position in frame_positions.items():
+            self.assertTrue(np.allclose(transform(frame_position, t_matrix), projector_positions[code], atol=1))
+
+
 REPEAT_COUNT = 5
 
 
@@ -112,5 +151,86 @@ class TestGetTransformationMatrix(unittest.TestCase):
             self.assertTrue(matrix_equivalent(t_matrix, recalculated_matrix))
 
 
+class TestTransformations(unittest.TestCase):
+    def test_norm_to_proj_batch_matches_norm_to_proj(self):
+        for _ in range(REPEAT_COUNT):
+            calibrator = Calibrator(gen_random_t_matrix(), (640, 480))
+            norm_points = np.random.rand(20, 2).astype(np.float32)
+            batch_result = calibrator.norm_to_proj_batch(norm_points)
+            self.assertEqual(batch_result.shape, (20, 2))
+            for norm_point, batch_point in zip(norm_points, batch_result):
+                single_point = calibrator.norm_to_proj((norm_point[0], norm_point[1]))
+                # norm_to_proj truncates to ints, so allow for up to a pixel of difference
+                self.assertTrue(np.allclose(single_point, batch_point, rtol=TOLERANCE, atol=1))
+
+    def test_norm_to_proj_batch_empty(self):
+        calibrator = Calibrator(np.identity(3), (640, 480))
+        self.assertEqual(calibrator.norm_to_proj_batch(np.empty((0, 2))).shape, (0, 2))
+
+
+# a wide-angle camera with strong barrel distortion, looking straight at a wall
+CAMERA_MATRIX = np.array([[500, 0, 319.5], [0, 500, 239.5], [0, 0, 1]], dtype=np.float64)
+DIST_COEFFS = np.array([-0.3, 0.1, 0, 0, 0], dtype=np.float64)
+
+
+def project_markers(projector_coords: dict[int, tuple[float, float]]) -> dict[int, tuple[np.float32, np.float32]]:
+    """Returns where the camera would detect markers projected at the given coordinates"""
+    object_points = np.array([(x, y, 0) for x, y in projector_coords.values()], dtype=np.float64)
+    image_points, _ = cv2.projectPoints(object_points, np.array([0, 0, 0.02]), np.array([-960, -540, 1500.0]),
+                                        CAMERA_MATRIX, DIST_COEFFS)
+    return {aruco_id: (np.float32(x), np.float32(y)) for aruco_id, (x, y) in zip(projector_coords,
+                                                                                 image_points.reshape(-1, 2))}
+
+
+class TestUndistortion(unittest.TestCase):
+    def setUp(self):
+        self.projector_coords = {i: (float(i % 12 * 170), float(i // 12 * 150)) for i in range(96)}
+        self.camera_coords = project_markers(self.projector_coords)
+
+    def test_distort_undistort_roundtrip(self):
+        points = np.random.rand(50, 2) * (640, 480)
+        distorted = Calibrator._distort(points, CAMERA_MATRIX, DIST_COEFFS)
+        self.assertFalse(np.allclose(distorted, points, atol=1))
+        self.assertTrue(np.allclose(Calibrator._undistort(distorted, CAMERA_MATRIX, DIST_COEFFS), points, atol=0.01))
+
+    def test_estimate_intrinsics(self):
+        camera_matrix, dist_coeffs = Calibrator.estimate_intrinsics([(self.camera_coords, self.projector_coords)],
+                                                                    (640, 480))
+        # looking straight at the wall, the focal length can't be told apart from the distance, but the distortion
+        # (in pixels) can
+        undistorted = Calibrator._undistort(np.array(list(self.camera_coords.values()), np.float64),
+                                            camera_matrix, dist_coeffs)
+        expected = Calibrator._undistort(np.array(list(self.camera_coords.values()), np.float64),
+                                         CAMERA_MATRIX, DIST_COEFFS)
+        self.assertTrue(np.allclose(undistorted, expected, atol=0.5))
+
+    def test_estimate_intrinsics_not_enough_markers(self):
+        few_coords = {i: self.camera_coords[i] for i in range(5)}
+        self.assertRaises(RuntimeError, Calibrator.estimate_intrinsics, [(few_coords, self.projector_coords)],
+                          (640, 480))
+
+    def test_undistorted_points_match_projector(self):
+        undistorted = Calibrator._undistort(np.array(list(self.camera_coords.values()), np.float64),
+                                            CAMERA_MATRIX, DIST_COEFFS)
+        undistorted_coords = {aruco_id: (np.float32(x), np.float32(y))
+                              for aruco_id, (x, y) in zip(self.camera_coords, undistorted)}
+        distorted_calibrator = Calibrator(Calibrator._get_transformation_matrix(self.camera_coords,
+                                                                                self.projector_coords), (640, 480))
+        calibrator = Calibrator(Calibrator._get_transformation_matrix(undistorted_coords, self.projector_coords),
+                                (640, 480), CAMERA_MATRIX, DIST_COEFFS)
+
+        norm_coords = np.array(list(self.camera_coords.values()), np.float64) / (640, 480)
+        expected = np.array(list(self.projector_coords.values()))
+        corrected_error = np.abs(calibrator.norm_to_proj_batch(norm_coords) - expected).max()
+        uncorrected_error = np.abs(distorted_calibrator.norm_to_proj_batch(norm_coords) - expected).max()
+        self.assertLess(corrected_error, 5)
+        self.assertGreater(uncorrected_error, corrected_error * 4)
+
+        for aruco_id in (0, 50, 95):
+            self.assertTrue(np.allclose(calibrator.norm_to_proj(norm_coords[aruco_id]), expected[aruco_id], atol=5))
+            self.assertTrue(np.allclose(calibrator.proj_to_cam(self.projector_coords[aruco_id]),
+                                        self.camera_coords[aruco_id], atol=1))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.CaptureManager import CaptureManager
+from Scripts.Helper.VideoCapture import VideoCapture
+from Scripts.Test.helper import get_asset
+
+VIDEO = get_asset("test_video.mp4")
+
+
+class TestCaptureManager(unittest.TestCase):
+    def setUp(self):
+        self.video_captures: list[VideoCapture] = []
+        self.manager = CaptureManager(self.create_video_capture, close_delay=0)
+
+    def tearDown(self):
+        self.manager.close_all()
+
+    def create_video_capture(self, target, low_latency=False, rgb=False, replay=False,
+                             full_resolution=False) -> VideoCapture:
+        video_capture = VideoCapture(target=target, low_latency=low_latency, rgb=rgb, replay=replay,
+                                     full_resolution=full_resolution)
+        self.video_captures.append(video_capture)
+        return video_capture
+
+    def test_shares_video_capture(self):
+        with self.manager.subscribe(VIDEO) as subscription, self.manager.subscribe(VIDEO) as subscription2:
+            self.assertIs(subscription.video_capture, subscription2.video_capture)
+            self.assertEqual(len(self.video_captures), 1)
+            subscription.release()
+            subscription.release()  # releasing twice only counts once
+            self.assertTrue(self.manager.is_open(VIDEO))
+            self.assertIsNotNone(subscription2.video_capture.checkout_next_frame(1))
+        self.assertFalse(self.manager.is_open(VIDEO))
+        self.assertRaises(RuntimeError, self.video_captures[0].get_current_frame)
+
+    def test_close_delay(self):
+        self.manager = CaptureManager(self.create_video_capture, close_delay=0.5)
+        self.manager.subscribe(VIDEO).release()
+        self.manager.subscribe(VIDEO).release()
+        self.assertEqual(len(self.video_captures), 1)
+        self.assertTrue(self.manager.is_open(VIDEO))
+        time.sleep(1)
+        self.assertFalse(self.manager.is_open(VIDEO))
+
+    def test_close_timer_is_daemon(self):
+        self.manager = CaptureManager(self.create_video_capture, close_delay=10)
+        self.manager.subscribe(VIDEO).release()
+        # a pending close mustn't stop the interpreter from exiting
+        self.assertTrue(self.manager._captures[VIDEO].close_timer.daemon)
+
+    def test_slow_start_only_blocks_its_target(self):
+        started = threading.Event()
+        release_start = threading.Event()
+
+        class SlowVideoCapture(VideoCapture):
+            def start(self):
+                started.set()
+                release_start.wait()
+                super().start()
+
+        def create_video_capture(target, **kwargs):
+            if target != "slow":
+                return self.create_video_capture(target, **kwargs)
+            video_capture = SlowVideoCapture(target=VIDEO, **kwargs)
+            self.video_captures.append(video_capture)
+            return video_capture
+
+        self.manager = CaptureManager(create_video_capture, close_delay=0)
+        subscriptions = []
+        subscribers = [threading.Thread(target=lambda: subscriptions.append(self.manager.subscribe("slow")))
+                       for _ in range(2)]
+        for subscriber in subscribers:
+            subscriber.start()
+        started.wait()
+        self.assertTrue(self.manager.is_open("slow"))
+        # another target can be opened while the first is starting
+        self.manager.subscribe(VIDEO).release()
+
+        release_start.set()
+        for subscriber in subscribers:
+            subscriber.join()
+        self.assertEqual(len(subscriptions), 2)
+        self.assertIs(subscriptions[0].video_capture, subscriptions[1].video_capture)
+        self.assertEqual(len(self.video_captures), 2)
+        for subscription in subscriptions:
+            subscription.release()
+        self.assertFalse(self.manager.is_open("slow"))
+
+    def test_photo_from_live_stream(self):
+        with self.manager.subscribe(VIDEO) as subscription:
+            frame_number = subscription.video_capture.frame_number
+            photos = self.manager.take_photos(VIDEO, 3)
+            self.assertEqual(len(self.video_captures), 1)
+            self.assertGreater(subscription.video_capture.frame_number, frame_number + 2)
+            shape = subscription.video_capture.get_current_frame().shape
+        self.assertEqual(len(photos), 3)
+        for photo in photos:
+            self.assertEqual(photo.shape, shape)
+            self.assertTrue(photo.flags.writeable)
+
+    def test_photo_is_bgr(self):
+        expected = VideoCapture.take_photo(target=VIDEO)
+        self.assertTrue(np.array_equal(self.manager.take_photo(VIDEO), expected))
+        self.assertTrue(self.video_captures[0].rgb)
+
+    def test_full_resolution_photo(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "image.png")
+            cv2.imwrite(path, np.full((960, 1280, 3), 128, np.uint8))
+            self.assertEqual(self.manager.take_photo(path, full_resolution=True).shape, (960, 1280, 3))
+            self.assertFalse(self.manager.is_open(path))
+        with self.manager.subscribe(VIDEO):
+            # the live stream is served as it is
+            self.assertEqual(self.manager.take_photo(VIDEO, full_resolution=True).shape, (480, 640, 3))
+            self.assertEqual(len(self.video_captures), 2)
+
+    def test_replays_are_not_shared(self):
+        with self.manager.subscribe(VIDEO, replay=True) as subscription, \
+                self.manager.subscribe(VIDEO, replay=True) as subscription2:
+            self.assertIsNot(subscription.video_capture, subscription2.video_capture)
+            self.assertFalse(self.manager.is_open(VIDEO))
+        self.assertRaises(RuntimeError, self.video_captures[0].get_current_frame)
+        self.assertRaises(RuntimeError, self.video_captures[1].get_current_frame)
+
+    def test_invalid_photo_count(self):
+        self.assertRaises(ValueError, self.manager.take_photos, VIDEO, 0)
+
+    def test_failed_start(self):
+        self.assertRaises(RuntimeError, self.manager.subscribe, "missing.mp4")
+        self.assertFalse(self.manager.is_open("missing.mp4"))
+
+
+if __name__ == '__main__':
+    unittest.main()
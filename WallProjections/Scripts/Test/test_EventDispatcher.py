@@ -0,0 +1,96 @@
+import threading
+import time
+import unittest
+
+from Scripts.Helper.EventDispatcher import EventDispatcher
+from Scripts.Helper.EventHandler import EventHandler
+
+
+class BlockingEventHandler(EventHandler):
+    """Records events, but doesn't return from handling one until it's unblocked"""
+
+    def __init__(self):
+        self.events: list[tuple[str, int]] = []
+        self.unblocked = threading.Event()
+        self.handling = threading.Event()
+
+    def _handle(self, event: tuple[str, int]):
+        self.handling.set()
+        self.unblocked.wait()
+        self.events.append(event)
+
+    def OnHotspotPressed(self, hotspot_id):
+        self._handle(("pressed", hotspot_id))
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        self._handle(("unpressed", hotspot_id))
+
+
+class TestEventDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.event_handler = BlockingEventHandler()
+        self.dispatcher = EventDispatcher(self.event_handler)
+        self.dispatcher.start()
+
+    def tearDown(self):
+        self.event_handler.unblocked.set()
+        self.dispatcher.stop()
+
+    def block_on_first_event(self):
+        """Queues an event for hotspot 99 and waits until the handler is stuck handling it"""
+        self.dispatcher.OnHotspotPressed(99)
+        self.assertTrue(self.event_handler.handling.wait(1))
+
+    def test_doesnt_block_on_handler(self):
+        self.block_on_first_event()
+        start = time.monotonic()
+        for i in range(1000):
+            self.dispatcher.OnHotspotPressed(i)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(self.dispatcher.queue_depth, 1000)
+
+    def test_coalesces_bursts(self):
+        self.block_on_first_event()
+        for _ in range(5):
+            self.dispatcher.OnHotspotPressed(0)
+            self.dispatcher.OnHotspotUnpressed(0)
+        self.dispatcher.OnHotspotPressed(0)
+        self.dispatcher.OnHotspotPressed(1)
+        self.dispatcher.OnHotspotUnpressed(1)
+        self.assertEqual(self.dispatcher.queue_depth, 3)
+
+        self.event_handler.unblocked.set()
+        self.dispatcher.stop()
+        self.assertListEqual(self.event_handler.events,
+                             [("pressed", 99), ("pressed", 0), ("pressed", 1), ("unpressed", 1)])
+        stats = self.dispatcher.get_stats()
+        self.assertEqual(stats["delivered_events"], 4)
+        self.assertEqual(stats["coalesced_events"], 10)
+        self.assertEqual(stats["max_queue_depth"], 3)
+
+    def test_order_per_hotspot(self):
+        self.block_on_first_event()
+        self.dispatcher.OnHotspotPressed(0)
+        self.dispatcher.OnHotspotPressed(1)
+        self.dispatcher.OnHotspotUnpressed(0)
+        self.dispatcher.OnHotspotUnpressed(1)
+
+        self.event_handler.unblocked.set()
+        self.dispatcher.stop()
+        events = self.event_handler.events
+        for hotspot_id in (0, 1):
+            self.assertListEqual([event for event in events if event[1] == hotspot_id],
+                                 [("pressed", hotspot_id), ("unpressed", hotspot_id)])
+
+    def test_delivery_latency(self):
+        self.block_on_first_event()
+        time.sleep(0.1)
+        self.event_handler.unblocked.set()
+        self.dispatcher.stop()
+        stats = self.dispatcher.get_stats()
+        self.assertGreaterEqual(stats["max_delivery_latency"], 0.1)
+        self.assertEqual(stats["queue_depth"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import time
+import unittest
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from Scripts.Helper.HandTracker import (FINGERTIP_INDICES, HAND_LANDMARKER_MODEL_PATH, SolutionsHandTracker,
+                                        TasksHandTracker, create_hand_tracker, landmarks_to_array)
+from Scripts.Test.helper import get_asset
+
+RESULT_TIMEOUT = 10
+"""The maximum number of seconds to wait for an asynchronous result."""
+
+
+def read_frames(count: int) -> list[np.ndarray]:
+    """Returns the first frames (in RGB) of the hotspot test video, in which a hand is in view"""
+    video_capture = cv2.VideoCapture(get_asset("hotspot_test.avi"))
+    frames = [cv2.cvtColor(video_capture.read()[1], cv2.COLOR_BGR2RGB) for _ in range(count)]
+    video_capture.release()
+    return frames
+
+
+def gen_hand(offset: float) -> list[SimpleNamespace]:
+    """Returns the 21 landmarks of a hand, where landmark i is at (offset + i, offset - i)"""
+    return [SimpleNamespace(x=offset + i, y=offset - i) for i in range(21)]
+
+
+class TestLandmarksToArray(unittest.TestCase):
+    def test_tasks_landmarks(self):
+        hands = [gen_hand(0), gen_hand(100)]
+        expected = [(offset + i, offset - i) for offset in (0, 100) for i in FINGERTIP_INDICES]
+        self.assertTrue(np.array_equal(landmarks_to_array(hands), np.array(expected, dtype=np.float32)))
+
+    def test_solutions_landmarks(self):
+        hands = [SimpleNamespace(landmark=gen_hand(0))]
+        expected = [(i, -i) for i in FINGERTIP_INDICES]
+        self.assertTrue(np.array_equal(landmarks_to_array(hands), np.array(expected, dtype=np.float32)))
+
+    def test_no_hands(self):
+        self.assertEqual(landmarks_to_array([]).shape, (0, 2))
+
+
+class TestHandTrackers(unittest.TestCase):
+    def test_solutions_result_ready_after_submit(self):
+        tracker = create_hand_tracker("solutions", 2, 0.5, 0.5)
+        self.assertIsInstance(tracker, SolutionsHandTracker)
+        tracker.submit(np.zeros((120, 160, 3), np.uint8), 1)
+        results = tracker.get_results()
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], 1)
+        self.assertEqual(results[0][1].shape, (0, 2))
+        self.assertListEqual(tracker.get_results(), [])
+        tracker.close()
+
+    def test_tasks_missing_model(self):
+        self.assertRaises(RuntimeError, TasksHandTracker, 2, 0.5, 0.5, model_asset_path="missing.task")
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, create_hand_tracker, "unknown", 2, 0.5, 0.5)
+
+    def test_unknown_delegate(self):
+        self.assertRaises(ValueError, create_hand_tracker, "tasks", 2, 0.5, 0.5, delegate="tpu")
+
+    @unittest.skipUnless(os.path.isfile(HAND_LANDMARKER_MODEL_PATH),
+                         "The HandLandmarker model asset isn't available (see Scripts/Models/README.md).")
+    def test_tasks_matches_solutions(self):
+        frames = read_frames(5)
+        solutions_tracker = create_hand_tracker("solutions", 4, 0.5, 0.5)
+        tasks_tracker = create_hand_tracker("tasks", 4, 0.5, 0.5, delegate="cpu")
+        try:
+            for timestamp_ms, frame in enumerate(frames, start=1):
+                solutions_tracker.submit(frame, timestamp_ms)
+                self.assertEqual(tasks_tracker.submit(frame, timestamp_ms), timestamp_ms)
+                # wait for every result, so that no frame is dropped for being submitted while the model is busy
+                deadline = time.monotonic() + RESULT_TIMEOUT
+                results = []
+                while len(results) == 0 and time.monotonic() < deadline:
+                    results = tasks_tracker.get_results()
+                    time.sleep(0.01)
+                self.assertEqual(len(results), 1)
+                self.assertEqual(results[0][0], timestamp_ms)
+            expected = solutions_tracker.get_results()[-1][1]
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(results[0][1].shape, expected.shape)
+            # the hands may be in a different order
+            for fingertip in expected:
+                self.assertLess(np.linalg.norm(results[0][1] - fingertip, axis=1).min(), 0.05)
+        finally:
+            solutions_tracker.close()
+            tasks_tracker.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
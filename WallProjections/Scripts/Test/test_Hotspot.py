@@ -0,0 +1,152 @@
+import unittest
+
+import numpy as np
+
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.Hotspot import Hotspot, HotspotSet
+
+
+class RecordingEventHandler(EventHandler):
+    def __init__(self):
+        self.events: list[tuple[str, int]] = []
+
+    def OnHotspotPressed(self, hotspot_id):
+        self.events.append(("pressed", hotspot_id))
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        self.events.append(("unpressed", hotspot_id))
+
+
+FRAME_INTERVAL = 1 / 30
+
+HOTSPOTS = {0: ((100, 100), 30), 1: ((300, 100), 50), 2: ((100, 400), 20), 3: ((320, 120), 40)}
+
+
+def gen_hotspots(event_handler: EventHandler) -> list[Hotspot]:
+    return [Hotspot(hotspot_id, pos, event_handler, radius=radius) for hotspot_id, (pos, radius) in HOTSPOTS.items()]
+
+
+class TestHotspotSet(unittest.TestCase):
+    def test_hit_test(self):
+        hotspot_set = HotspotSet(gen_hotspots(EventHandler()))
+        fingertips = np.array([[110, 90], [310, 110], [1000, 1000]])
+        self.assertListEqual(hotspot_set.hit_test(fingertips).tolist(), [True, True, False, True])
+        self.assertListEqual(hotspot_set.hit_test(np.empty((0, 2))).tolist(), [False] * len(HOTSPOTS))
+
+    def test_same_events_as_hotspots(self):
+        rng = np.random.default_rng(0)
+        frames = [rng.uniform(0, 500, size=(rng.integers(0, 10), 2)) for _ in range(200)]
+
+        expected_handler = RecordingEventHandler()
+        hotspots = gen_hotspots(expected_handler)
+        for frame_number, fingertips in enumerate(frames):
+            for hotspot in hotspots:
+                hotspot.update([tuple(fingertip) for fingertip in fingertips], now=frame_number * FRAME_INTERVAL)
+
+        actual_handler = RecordingEventHandler()
+        hotspot_set = HotspotSet(gen_hotspots(actual_handler))
+        for frame_number, fingertips in enumerate(frames):
+            hotspot_set.update(fingertips, now=frame_number * FRAME_INTERVAL)
+
+        self.assertGreater(len(expected_handler.events), 0)
+        self.assertListEqual(actual_handler.events, expected_handler.events)
+
+    def test_carry_over_state(self):
+        event_handler = RecordingEventHandler()
+        old_set = HotspotSet(gen_hotspots(event_handler))
+        for frame_number in range(10):
+            old_set.update(np.array([[100, 100], [300, 55]]), now=frame_number * FRAME_INTERVAL)
+        self.assertListEqual(sorted(event_handler.events), [("pressed", 0), ("pressed", 1)])
+
+        # hotspot 0 moves, hotspot 1 is removed and hotspot 4 is added
+        new_set = HotspotSet([Hotspot(0, (110, 100), event_handler, radius=30),
+                              Hotspot(4, (100, 100), event_handler, radius=30)])
+        event_handler.events.clear()
+        new_set.carry_over_state(old_set)
+        self.assertListEqual(event_handler.events, [("unpressed", 1)])
+        self.assertListEqual([hotspot.is_pressed for hotspot in new_set], [True, False])
+
+        # the moved hotspot stays pressed without firing again, and the new one is pressed as usual
+        for frame_number in range(10, 20):
+            new_set.update(np.array([[100, 100]]), now=frame_number * FRAME_INTERVAL)
+        self.assertListEqual(event_handler.events, [("unpressed", 1), ("pressed", 4)])
+
+    def test_empty_set(self):
+        hotspot_set = HotspotSet([])
+        hotspot_set.update(np.array([[1, 2]]))
+        self.assertEqual(len(hotspot_set), 0)
+
+
+class TestDebounce(unittest.TestCase):
+    def setUp(self):
+        self.event_handler = RecordingEventHandler()
+        self.hotspot = Hotspot(0, (0, 0), self.event_handler, radius=1, press_delay=0.05, release_delay=0.1,
+                               grace_frames=2)
+
+    def replay(self, states: list[bool]) -> list[tuple[float, str]]:
+        """Feeds a state per frame at 30fps and returns the time of every event"""
+        timed_events = []
+        for frame_number, inside in enumerate(states):
+            events_before = len(self.event_handler.events)
+            self.hotspot.set_fingertip_inside(inside, now=frame_number * FRAME_INTERVAL)
+            timed_events += [(frame_number * FRAME_INTERVAL, event)
+                             for event, _ in self.event_handler.events[events_before:]]
+        return timed_events
+
+    def test_press_latency_bounded(self):
+        events = self.replay([False] * 10 + [True] * 10)
+        self.assertEqual(len(events), 1)
+        time_pressed, event = events[0]
+        self.assertEqual(event, "pressed")
+        latency = time_pressed - 10 * FRAME_INTERVAL
+        self.assertGreaterEqual(latency, 0.05)
+        self.assertLessEqual(latency, 0.05 + FRAME_INTERVAL)
+
+    def test_dropouts_dont_fire_events(self):
+        # a held press with a one or two frame dropout every few frames
+        states = [True] * 10 + ([True] * 4 + [False]) * 10 + ([True] * 3 + [False] * 2) * 10
+        events = self.replay(states)
+        self.assertListEqual([event for _, event in events], ["pressed"])
+
+    def test_event_storm_reduced(self):
+        # 3 presses of a fingertip which stutters (disappears for 1 or 2 frames at a time) while it's held inside
+        press = [True] * 5 + ([True] * 3 + [False]) * 5 + ([True] * 4 + [False] * 2) * 5 + [False] * 30
+        states = press * 3
+
+        undebounced_handler = RecordingEventHandler()
+        undebounced = Hotspot(0, (0, 0), undebounced_handler, press_delay=0, release_delay=0, grace_frames=0)
+        for frame_number, inside in enumerate(states):
+            undebounced.set_fingertip_inside(inside, now=frame_number * FRAME_INTERVAL)
+
+        events = self.replay(states)
+        self.assertGreater(len(undebounced_handler.events), 10)
+        self.assertListEqual([event for _, event in events], ["pressed", "unpressed"] * 3)
+
+    def test_brief_touch_ignored(self):
+        self.assertListEqual(self.replay([True] + [False] * 10), [])
+        self.assertFalse(self.hotspot.is_pending)
+
+    def test_release_delay(self):
+        events = self.replay([True] * 10 + [False] * 10)
+        self.assertListEqual([event for _, event in events], ["pressed", "unpressed"])
+        self.assertGreaterEqual(events[1][0] - 10 * FRAME_INTERVAL, 0.1)
+
+    def test_release_after_hand_leaves_frame(self):
+        hotspot_set = HotspotSet([self.hotspot])
+        # the fingertip moves off the hotspot, then the hand leaves the frame before the release delay has passed
+        frames = [np.array([[0, 0]])] * 5 + [np.array([[5, 5]])] + [np.empty((0, 2))] * 10
+        for frame_number, fingertips in enumerate(frames):
+            hotspot_set.update(fingertips, now=frame_number * FRAME_INTERVAL)
+        self.assertFalse(self.hotspot.is_pressed)
+        self.assertListEqual(self.event_handler.events, [("pressed", 0), ("unpressed", 0)])
+
+    def test_hotspot_set_completes_pending_changes(self):
+        hotspot_set = HotspotSet([self.hotspot])
+        for frame_number in range(5):
+            hotspot_set.update(np.array([[0, 0]]), now=frame_number * FRAME_INTERVAL)
+        self.assertTrue(self.hotspot.is_pressed)
+        self.assertListEqual(self.event_handler.events, [("pressed", 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
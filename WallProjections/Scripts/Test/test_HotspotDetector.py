@@ -0,0 +1,135 @@
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.HandTracker import HandTracker
+from Scripts.Helper.Hotspot import HotspotSet
+from Scripts.Helper.HotspotDetector import HotspotDetector
+from Scripts.Test.helper import get_asset
+
+CALIBRATION_MATRIX = np.array([[5.20479000e+00, 3.15230221e-01, -6.84127477e+02],
+                               [-1.26843385e-01, 5.48706413e+00, -9.97831632e+02],
+                               [-1.31811578e-04, 2.86799201e-04, 1.00000000e+00]])
+
+HOTSPOTS = {0: (260, 211, 87), 1: (1682, 228, 89), 2: (1689, 885, 93), 3: (240, 900, 89)}
+
+UPDATE_FRAME = 2
+
+
+class PressedEventHandler(EventHandler):
+    def __init__(self):
+        self.hotspots_pressed: set[int] = set()
+
+    def OnHotspotPressed(self, hotspot_id):
+        self.hotspots_pressed.add(hotspot_id)
+
+    def OnHotspotUnpressed(self, hotspot_id):
+        pass
+
+
+class DroppingHandTracker(HandTracker):
+    """
+    Behaves like the Tasks backend under load: timestamps are bumped to be strictly increasing, results arrive a frame
+    late, and the results of most frames are dropped
+    """
+
+    def __init__(self):
+        self._last_timestamp_ms = -1
+        self._submitted = 0
+        self._pending: list[tuple[int, np.ndarray]] = []
+        self._ready: list[tuple[int, np.ndarray]] = []
+
+    def submit(self, image_rgb: np.ndarray, timestamp_ms: int) -> int:
+        timestamp_ms = max(timestamp_ms, self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        self._ready, self._pending = self._pending, []
+        self._submitted += 1
+        if self._submitted % 3 == 0:
+            self._pending.append((timestamp_ms, np.empty((0, 2), dtype=np.float32)))
+        return timestamp_ms
+
+    def get_results(self) -> list[tuple[int, np.ndarray]]:
+        results, self._ready = self._ready, []
+        return results
+
+    def close(self) -> None:
+        pass
+
+
+class TestSubmittedFrames(unittest.TestCase):
+    def test_dropped_results_are_forgotten(self):
+        pop_submitted_frame = HotspotDetector._pop_submitted_frame
+        sizes: list[int] = []
+
+        def record_size(submitted_frames, timestamp_ms):
+            result = pop_submitted_frame(submitted_frames, timestamp_ms)
+            self.assertIsNotNone(result)
+            sizes.append(len(submitted_frames))
+            return result
+
+        detector = HotspotDetector(get_asset("hotspot_test.avi"), CALIBRATION_MATRIX,
+                                   HotspotSet.from_coords(EventHandler(), HOTSPOTS))
+        with mock.patch.object(HotspotDetector, "_create_hand_tracker",
+                               staticmethod(lambda _model_complexity: DroppingHandTracker())), \
+                mock.patch.object(HotspotDetector, "_pop_submitted_frame", staticmethod(record_size)), \
+                mock.patch("Scripts.Helper.HotspotDetector.USE_MOTION_GATING", False):
+            detector.run()
+        self.assertGreater(len(sizes), 10)
+        # only the frame submitted since the result's frame is still waiting for its result
+        self.assertLessEqual(max(sizes), 1)
+
+    def test_pop_submitted_frame(self):
+        submitted_frames = {timestamp_ms: (timestamp_ms / 1000, None) for timestamp_ms in (10, 11, 12, 20)}
+        self.assertEqual(HotspotDetector._pop_submitted_frame(submitted_frames, 12), (0.012, None))
+        self.assertListEqual(list(submitted_frames), [20])
+        self.assertIsNone(HotspotDetector._pop_submitted_frame(submitted_frames, 15))
+        self.assertListEqual(list(submitted_frames), [20])
+
+
+class TestHotspotDetectorUpdates(unittest.TestCase):
+    def run_detection(self, calibration_matrix: np.ndarray, hotspots: dict[int, tuple[float, float, float]],
+                      update) -> set[int]:
+        """Runs detection on the test video, calling update with the detector and event handler at UPDATE_FRAME"""
+        event_handler = PressedEventHandler()
+
+        def on_frame(frame_number: int, _image: np.ndarray) -> None:
+            if frame_number == UPDATE_FRAME:
+                update(detector, event_handler)
+
+        detector = HotspotDetector(get_asset("hotspot_test.avi"), calibration_matrix,
+                                   HotspotSet.from_coords(event_handler, hotspots), frame_listener=on_frame)
+        thread = threading.Thread(target=detector.run)
+        thread.start()
+        thread.join(timeout=60)  # detection stops by itself at the end of the video
+        detector.stop()
+        thread.join()
+        return event_handler.hotspots_pressed
+
+    def test_update_hotspots(self):
+        # the hotspots start off outside the projector image, so nothing could be pressed before the update
+        off_screen = {hotspot_id: (x - 100000, y, r) for hotspot_id, (x, y, r) in HOTSPOTS.items()}
+        pressed = self.run_detection(CALIBRATION_MATRIX, off_screen, lambda detector, event_handler:
+                                     detector.update_hotspots(HotspotSet.from_coords(event_handler, HOTSPOTS)))
+        self.assertSetEqual(pressed, set(HOTSPOTS))
+
+    def test_update_calibration_keeps_intrinsics(self):
+        intrinsics = np.array([[500, 0, 320], [0, 500, 240], [0, 0, 1]], dtype=np.float64), np.zeros(5)
+        detector = HotspotDetector(0, np.identity(3), HotspotSet([]), intrinsics=intrinsics)
+        detector.update_calibration(CALIBRATION_MATRIX)
+        self.assertIs(detector._intrinsics, intrinsics)
+        self.assertIs(detector._calibration_matrix, CALIBRATION_MATRIX)
+        detector.update_calibration(CALIBRATION_MATRIX, None)
+        self.assertIsNone(detector._intrinsics)
+
+    def test_update_calibration(self):
+        shifted = np.array([[1, 0, 100000], [0, 1, 0], [0, 0, 1]]) @ CALIBRATION_MATRIX
+        pressed = self.run_detection(shifted, HOTSPOTS, lambda detector, _event_handler:
+                                     detector.update_calibration(CALIBRATION_MATRIX))
+        self.assertSetEqual(pressed, set(HOTSPOTS))
+
+
+if __name__ == '__main__':
+    unittest.main()
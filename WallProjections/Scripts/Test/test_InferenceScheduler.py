@@ -0,0 +1,49 @@
+import unittest
+
+from Scripts.Helper.InferenceScheduler import COOLDOWN, InferenceScheduler
+
+QUALITY_LEVELS = ((1.0, 1), (0.5, 0))
+
+
+class TestInferenceScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = InferenceScheduler(latency_budget=0.05, headroom=0.5, quality_levels=QUALITY_LEVELS,
+                                            max_skipped_frames=2)
+
+    def record(self, latency: float, count: int = COOLDOWN):
+        for _ in range(count):
+            self.scheduler.record(latency)
+
+    def test_within_budget_keeps_quality(self):
+        self.record(0.04, 10 * COOLDOWN)
+        self.assertEqual((self.scheduler.scale, self.scheduler.model_complexity), (1.0, 1))
+        self.assertEqual(self.scheduler.skipped_frames, 0)
+
+    def test_over_budget_steps_down_then_skips(self):
+        self.record(0.1)
+        self.assertEqual((self.scheduler.scale, self.scheduler.model_complexity), (0.5, 0))
+        self.assertEqual(self.scheduler.skipped_frames, 0)
+
+        self.record(0.1, 10 * COOLDOWN)
+        self.assertEqual(self.scheduler.skipped_frames, 2)
+        skips = [self.scheduler.should_skip() for _ in range(9)]
+        self.assertListEqual(skips, [False, True, True] * 3)
+
+    def test_headroom_steps_up(self):
+        self.record(0.1, 3 * COOLDOWN)
+        self.assertEqual(self.scheduler.skipped_frames, 2)
+        self.record(0.01, 2 * COOLDOWN)
+        self.assertEqual(self.scheduler.skipped_frames, 0)
+        self.assertEqual(self.scheduler.scale, 0.5)
+        self.record(0.01)
+        self.assertEqual((self.scheduler.scale, self.scheduler.model_complexity), (1.0, 1))
+
+    def test_waits_for_cooldown(self):
+        self.record(0.1, COOLDOWN - 1)
+        self.assertEqual(self.scheduler.scale, 1.0)
+        self.record(0.1, 1)
+        self.assertEqual(self.scheduler.scale, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
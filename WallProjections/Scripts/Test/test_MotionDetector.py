@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from Scripts.Helper.MotionDetector import MotionDetector
+
+FRAME_SHAPE = (240, 320, 3)
+
+
+def gen_frame(square_x: int | None = None) -> np.ndarray:
+    """Returns a gray frame, with a white square at the given x position if there is one"""
+    frame = np.full(FRAME_SHAPE, 100, np.uint8)
+    if square_x is not None:
+        frame[100:160, square_x:square_x + 60] = 255
+    return frame
+
+
+class TestMotionDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = MotionDetector(idle_delay=1.0, heartbeat_interval=0.5)
+
+    def test_static_scene_goes_idle(self):
+        static_frame = gen_frame()
+        inferences = [self.detector.should_run_inference(static_frame, now=t / 10) for t in range(0, 50)]
+
+        # every frame for the first second, then one every heartbeat
+        self.assertTrue(all(inferences[:10]))
+        self.assertTrue(self.detector.idle)
+        self.assertAlmostEqual(sum(inferences[10:]), 4 / 0.5, delta=1)
+
+    def test_motion_wakes_up(self):
+        static_frame = gen_frame()
+        for t in range(0, 30):
+            self.detector.should_run_inference(static_frame, now=t / 10)
+        self.assertTrue(self.detector.idle)
+
+        self.assertTrue(self.detector.should_run_inference(gen_frame(square_x=100), now=3.05))
+        self.assertFalse(self.detector.idle)
+        self.assertTrue(self.detector.should_run_inference(gen_frame(square_x=120), now=3.1))
+
+    def test_noise_below_threshold(self):
+        rng = np.random.default_rng(0)
+        for t in range(0, 30):
+            noise = rng.integers(-5, 5, size=FRAME_SHAPE)
+            self.detector.should_run_inference((gen_frame() + noise).astype(np.uint8), now=t / 10)
+        self.assertTrue(self.detector.idle)
+
+    def test_frame_size_change(self):
+        self.detector.should_run_inference(gen_frame(), now=0)
+        self.assertTrue(self.detector.should_run_inference(np.zeros((100, 100, 3), np.uint8), now=0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from Scripts.Helper.PipelineStats import PipelineStats
+
+
+class TestPipelineStats(unittest.TestCase):
+    def test_percentiles(self):
+        stats = PipelineStats()
+        durations = np.random.default_rng(0).uniform(0.001, 0.1, 10000)
+        for duration in durations:
+            stats.record("inference", duration)
+
+        snapshot = stats.snapshot()["inference"]
+        self.assertEqual(snapshot["count"], len(durations))
+        self.assertAlmostEqual(snapshot["mean_ms"], durations.mean() * 1000, places=6)
+        for p in (50, 95, 99):
+            expected = np.percentile(durations, p) * 1000
+            self.assertGreaterEqual(snapshot[f"p{p}_ms"], expected)
+            self.assertLessEqual(snapshot[f"p{p}_ms"], expected * 1.13)
+
+    def test_out_of_range_durations(self):
+        stats = PipelineStats()
+        stats.record("short", 0)
+        stats.record("long", 100)
+        snapshot = stats.snapshot()
+        self.assertAlmostEqual(snapshot["short"]["p99_ms"], 0.01)
+        self.assertAlmostEqual(snapshot["long"]["p50_ms"], 10000)
+
+    def test_snapshot_every_interval(self):
+        stats = PipelineStats(log_interval=0)
+        with self.assertLogs("logger", level="INFO") as logs:
+            stats.record("capture_wait", 0.03)
+            stats.record("inference", 0.02)
+        self.assertEqual(len(logs.output), 2)
+        # the histograms start afresh after every log
+        self.assertNotIn("capture_wait", logs.output[1])
+        self.assertIn("inference", logs.output[1])
+        self.assertDictEqual(stats.snapshot(), {})
+
+    def test_get_stats_is_fresh(self):
+        stats = PipelineStats()
+        self.assertDictEqual(stats.get_stats(), {})
+        stats.record("decode", 0.005)
+        first = stats.get_stats()
+        self.assertEqual(first["decode"]["count"], 1)
+        stats.record("decode", 0.005)
+        self.assertEqual(stats.get_stats()["decode"]["count"], 2)
+        self.assertEqual(first["decode"]["count"], 1)  # an earlier result isn't changed afterwards
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from Scripts.Helper.Calibrator import Calibrator
+from Scripts.Helper.EventHandler import EventHandler
+from Scripts.Helper.Hotspot import Hotspot, HotspotSet
+from Scripts.Helper.RegionOfInterest import RegionOfInterest
+
+CAMERA_RES = (640, 480)
+
+
+def gen_hotspot_set(hotspots: dict[int, tuple[tuple[float, float], float]]) -> HotspotSet:
+    return HotspotSet(Hotspot(hotspot_id, pos, EventHandler(), radius=radius)
+                      for hotspot_id, (pos, radius) in hotspots.items())
+
+
+class TestRegionOfInterest(unittest.TestCase):
+    def test_from_hotspots_covers_hotspots(self):
+        # projector space is camera space scaled by 2
+        calibrator = Calibrator(np.diag([2.0, 2.0, 1.0]), CAMERA_RES)
+        hotspots = gen_hotspot_set({0: ((400, 300), 20), 1: ((600, 500), 40)})
+        roi = RegionOfInterest.from_hotspots(calibrator, hotspots, CAMERA_RES, margin=0)
+
+        # hotspots cover camera pixels (190, 140) to (320, 270)
+        self.assertLessEqual(roi.left, 190)
+        self.assertLessEqual(roi.top, 140)
+        self.assertGreaterEqual(roi.right, 320)
+        self.assertGreaterEqual(roi.bottom, 270)
+        self.assertLess(roi.area_fraction, 0.25)
+
+    def test_from_hotspots_margin_clipped_to_frame(self):
+        calibrator = Calibrator(np.identity(3), CAMERA_RES)
+        hotspots = gen_hotspot_set({0: ((10, 10), 5)})
+        roi = RegionOfInterest.from_hotspots(calibrator, hotspots, CAMERA_RES, margin=0.1)
+        self.assertEqual((roi.left, roi.top), (0, 0))
+        self.assertGreaterEqual(roi.right, 0.1 * CAMERA_RES[0])
+
+    def test_from_hotspots_falls_back_to_full_frame(self):
+        calibrator = Calibrator(np.identity(3), CAMERA_RES)
+        for hotspots in (gen_hotspot_set({}), gen_hotspot_set({0: ((5000, 5000), 10)})):
+            roi = RegionOfInterest.from_hotspots(calibrator, hotspots, CAMERA_RES, margin=0.1)
+            self.assertEqual(roi.area_fraction, 1)
+
+    def test_crop_and_map_back(self):
+        roi = RegionOfInterest(100, 50, 300, 250, CAMERA_RES)
+        frame = np.zeros((CAMERA_RES[1], CAMERA_RES[0], 3), np.uint8)
+        crop = roi.crop(frame)
+        self.assertEqual(crop.shape, (200, 200, 3))
+        self.assertTrue(crop.flags.c_contiguous)
+
+        frame_coords = roi.to_frame_coords(np.array([[0, 0], [1, 1], [0.5, 0.25]]))
+        expected = np.array([[100 / 640, 50 / 480], [300 / 640, 250 / 480], [200 / 640, 100 / 480]])
+        self.assertTrue(np.allclose(frame_coords, expected))
+
+
+if __name__ == '__main__':
+    unittest.main()
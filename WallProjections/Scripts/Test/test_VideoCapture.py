@@ -1,7 +1,12 @@
+import os
+import tempfile
 import time
 import unittest
 
-from Scripts.Helper.VideoCapture import VideoCapture
+import cv2
+import numpy as np
+
+from Scripts.Helper.VideoCapture import DRAIN_THRESHOLD, FRAME_BUFFER_COUNT, MAX_WARM_UP_FRAMES, VideoCapture
 from Scripts.Test.helper import get_asset
 
 
@@ -63,6 +68,181 @@ class TestVideoCapture(unittest.TestCase):
         self.assertVidCapStopped(self.vidcap)
         self.assertVidCapStopped(self.vidcap2)
 
+    def test_wait_for_next_frame(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"))
+        self.vidcap.start()
+        frame_number = self.vidcap.frame_number
+        for _ in range(5):
+            next_frame = self.vidcap.wait_for_next_frame(timeout=1, after=frame_number)
+            self.assertTrue(next_frame is not None)
+            self.assertGreater(next_frame[0], frame_number)
+            frame_number = next_frame[0]
+        self.vidcap.stop()
+        self.assertRaises(RuntimeError, self.vidcap.wait_for_next_frame, 1)
+
+    def test_wait_for_next_frame_timeout(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"))
+        self.vidcap.start()
+        self.assertIsNone(self.vidcap.wait_for_next_frame(timeout=0, after=self.vidcap.frame_number + 100))
+        self.vidcap.stop()
+
+    def test_checkout_frame(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"))
+        self.vidcap.start()
+        frame = self.vidcap.checkout_next_frame(timeout=1)
+        self.assertTrue(frame is not None)
+        self.assertFalse(frame.image.flags.writeable)
+        snapshot = frame.image.copy()
+
+        # the checked out buffer must not be overwritten while newer frames keep arriving
+        frame_number = frame.frame_number
+        for _ in range(2 * FRAME_BUFFER_COUNT):
+            with self.vidcap.checkout_next_frame(timeout=1, after=frame_number) as next_frame:
+                frame_number = next_frame.frame_number
+        self.assertTrue(np.array_equal(frame.image, snapshot))
+        frame.release()
+        frame.release()  # releasing twice should do nothing
+        self.vidcap.stop()
+
+    def test_low_latency_ignored_for_video_files(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"), low_latency=True)
+        self.assertFalse(self.vidcap.low_latency)
+        self.vidcap.start()
+        self.assertIn(cv2.CAP_PROP_FPS, self.vidcap.honoured_properties)
+        self.assertNotIn(cv2.CAP_PROP_BUFFERSIZE, self.vidcap.honoured_properties)
+        self.vidcap.stop()
+
+    def test_grab_latest_drains_queue(self):
+        class QueuedCapture:
+            """Has 3 frames queued, after which every grab waits for the camera."""
+            def __init__(self):
+                self.grabs = 0
+
+            def grab(self):
+                self.grabs += 1
+                if self.grabs > 3:
+                    time.sleep(2 * DRAIN_THRESHOLD)
+                return True
+
+        capture = QueuedCapture()
+        self.assertTrue(VideoCapture._grab_latest(capture))
+        self.assertEqual(capture.grabs, 4)
+
+    def test_grab_latest_empty_queue(self):
+        class LiveCapture:
+            """Has nothing queued, so every grab waits for the camera."""
+            def __init__(self):
+                self.grabs = 0
+
+            def grab(self):
+                self.grabs += 1
+                time.sleep(2 * DRAIN_THRESHOLD)
+                return True
+
+        capture = LiveCapture()
+        for _ in range(5):
+            self.assertTrue(VideoCapture._grab_latest(capture))
+        # every frame is fresh, so none is thrown away
+        self.assertEqual(capture.grabs, 5)
+
+    def test_resize_to_requested_height(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"), resolution=(320, 240))
+        self.vidcap.start()
+        self.assertEqual(self.vidcap.get_current_frame().shape, (240, 320, 3))
+        self.vidcap.stop()
+
+    def test_rgb(self):
+        with tempfile.TemporaryDirectory() as directory:
+            image = np.zeros((480, 640, 3), np.uint8)
+            image[:, :, 0] = 255  # blue in BGR
+            path = os.path.join(directory, "image.png")
+            cv2.imwrite(path, image)
+
+            self.assertTrue(np.array_equal(VideoCapture.take_photo(target=path), image))
+            self.vidcap = VideoCapture(target=path, rgb=True)
+            self.vidcap.start()
+            self.assertTrue(np.array_equal(self.vidcap.get_current_frame(), image[:, :, ::-1]))
+            self.vidcap.stop()
+
+    def test_replay_every_frame(self):
+        video = cv2.VideoCapture(get_asset("test_video.mp4"))
+        expected_frames = []
+        while True:
+            success, frame = video.read()
+            if not success:
+                break
+            expected_frames.append(frame)
+        video.release()
+
+        height, width = expected_frames[0].shape[:2]
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"), replay=True, resolution=(width, height))
+        self.vidcap.start()
+        frame_number = 0
+        while True:
+            frame = self.vidcap.checkout_next_frame(timeout=0, after=frame_number)
+            if frame is None:
+                break
+            with frame:
+                self.assertEqual(frame.frame_number, frame_number + 1)
+                self.assertTrue(np.array_equal(frame.image, expected_frames[frame_number]))
+                self.assertAlmostEqual(frame.timestamp, frame_number / 30)
+                frame_number = frame.frame_number
+        self.assertEqual(frame_number, len(expected_frames))
+        self.assertTrue(self.vidcap.end_of_stream)
+        self.vidcap.stop()
+
+    def test_replay_random_access(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"), replay=True)
+        self.vidcap.start()
+        with self.vidcap.checkout_frame(100) as frame:
+            frame_100 = frame.image.copy()
+        with self.vidcap.checkout_frame(10) as frame:
+            self.assertEqual(frame.frame_number, 10)
+        with self.vidcap.checkout_frame(100) as frame:
+            self.assertTrue(np.array_equal(frame.image, frame_100))
+        self.assertIsNone(self.vidcap.checkout_frame(100000))
+        self.assertTrue(self.vidcap.end_of_stream)
+        self.assertRaises(ValueError, self.vidcap.checkout_frame, 0)
+        self.vidcap.stop()
+        self.assertRaises(RuntimeError, self.vidcap.checkout_frame, 1)
+
+    def test_end_of_stream_in_real_time(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"))
+        self.assertFalse(self.vidcap.replay)
+        self.vidcap.start()
+        self.assertRaises(RuntimeError, self.vidcap.checkout_frame, 1)
+        while True:
+            frame = self.vidcap.checkout_next_frame(timeout=1)
+            if frame is None:
+                break
+            frame.release()
+        self.assertTrue(self.vidcap.end_of_stream)  # rather than timing out
+        self.assertIsNone(self.vidcap.checkout_next_frame(timeout=10))
+        self.vidcap.stop()
+
+    def test_open_error_raised_immediately(self):
+        self.vidcap = VideoCapture(target=get_asset("missing_video.mp4"))
+        start = time.perf_counter()
+        self.assertRaises(RuntimeError, self.vidcap.start)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertVidCapStopped(self.vidcap)
+
+    def test_restart(self):
+        self.vidcap = VideoCapture(target=get_asset("test_video.mp4"))
+        self.vidcap.start()
+        self.vidcap.stop()
+        self.vidcap.start()
+        self.assertIsNotNone(self.vidcap.checkout_next_frame(timeout=1))
+        self.vidcap.stop()
+
+    def test_warm_up_frames(self):
+        blank = np.zeros((480, 640, 3), np.uint8)
+        image = blank.copy()
+        image[::8, ::8] = 100
+        self.assertTrue(VideoCapture._is_warm_up_frame(blank, 1))
+        self.assertFalse(VideoCapture._is_warm_up_frame(image, 1))
+        self.assertFalse(VideoCapture._is_warm_up_frame(blank, MAX_WARM_UP_FRAMES + 1))
+
     def test_take_photo(self):
         frame = VideoCapture.take_photo(target=get_asset("test_video.mp4"))
         self.assertTrue(frame is not None)
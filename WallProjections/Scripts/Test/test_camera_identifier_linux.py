@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+if sys.platform.startswith("linux"):
+    from Scripts.Platform.Linux import camera_identifier
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "sysfs is only available on Linux")
+class TestLinuxCameraIdentifier(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.sysfs_path = os.path.join(self.temp_dir.name, "video4linux")
+        self.dev_path = os.path.join(self.temp_dir.name, "dev")  # empty, so capabilities can't be queried
+        os.makedirs(self.sysfs_path)
+        os.makedirs(self.dev_path)
+        # a webcam with a metadata node, an identical webcam and a capture card
+        self.add_node("video0", "HD Webcam", 0, "usb1")
+        self.add_node("video1", "HD Webcam", 1, "usb1")
+        self.add_node("video2", "HD Webcam", 0, "usb2")
+        self.add_node("video3", "HD Webcam", 1, "usb2")
+        self.add_node("video4", "Capture Card", 0, "pci1")
+        os.makedirs(os.path.join(self.sysfs_path, "v4l-subdev0"))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def add_node(self, node_name: str, name: str, index: int, device: str):
+        node_path = os.path.join(self.sysfs_path, node_name)
+        os.makedirs(node_path)
+        with open(os.path.join(node_path, "name"), "w") as file:
+            file.write(name + "\n")
+        with open(os.path.join(node_path, "index"), "w") as file:
+            file.write(f"{index}\n")
+        device_path = os.path.join(self.temp_dir.name, "devices", device)
+        os.makedirs(device_path, exist_ok=True)
+        os.symlink(device_path, os.path.join(node_path, "device"))
+
+    def find_cameras(self, verify: bool = False) -> dict[int, str]:
+        return camera_identifier.find_cameras(self.sysfs_path, self.dev_path, verify)
+
+    def test_lists_capture_devices(self):
+        self.assertDictEqual(self.find_cameras(), {0: "HD Webcam", 2: "HD Webcam (2)", 4: "Capture Card"})
+
+    def test_cache(self):
+        self.assertIn(4, self.find_cameras())
+        with open(os.path.join(self.sysfs_path, "video4", "name"), "w") as file:
+            file.write("Renamed")
+        self.assertEqual(self.find_cameras()[4], "Capture Card")  # the device list hasn't changed
+
+        self.add_node("video5", "USB Camera", 0, "usb3")
+        self.assertDictEqual(self.find_cameras(),
+                             {0: "HD Webcam", 2: "HD Webcam (2)", 4: "Renamed", 5: "USB Camera"})
+
+    def test_verify(self):
+        with mock.patch.object(camera_identifier, "_verify_camera", lambda index: index != 2):
+            self.assertDictEqual(self.find_cameras(verify=True), {0: "HD Webcam", 4: "Capture Card"})
+
+    def test_missing_sysfs(self):
+        self.assertDictEqual(camera_identifier.find_cameras(os.path.join(self.temp_dir.name, "missing")), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from Scripts.Platform.Other import camera_identifier
+
+
+class FakeCameras:
+    """Pretends that cameras exist at the given indices, and records which indices are probed and how many at once"""
+
+    def __init__(self, indices: set[int], delay: float = 0.01):
+        self.indices = indices
+        self.delay = delay
+        self.probed: list[int] = []
+        self.open = 0
+        self.max_open = 0
+        self.lock = threading.Lock()
+
+    def open_camera(self, i: int) -> int | None:
+        with self.lock:
+            self.probed.append(i)
+            self.open += 1
+            self.max_open = max(self.max_open, self.open)
+        time.sleep(self.delay)
+        with self.lock:
+            self.open -= 1
+        return i if i in self.indices else None
+
+
+class TestOtherCameraIdentifier(unittest.TestCase):
+    def setUp(self):
+        camera_identifier.invalidate_cameras()
+
+    def tearDown(self):
+        camera_identifier.invalidate_cameras()
+
+    def test_scan_stops_after_misses(self):
+        cameras = FakeCameras({0, 1, 3})
+        with mock.patch.object(camera_identifier, "open_camera", cameras.open_camera):
+            self.assertDictEqual(camera_identifier.scan_cameras(), {0: "Camera 1", 1: "Camera 2", 3: "Camera 3"})
+        # indices 4-6 are misses, so the scan stops there (apart from probes which had already started)
+        self.assertLessEqual(max(cameras.probed), 6 + camera_identifier.MAX_WORKERS)
+        self.assertLessEqual(cameras.max_open, camera_identifier.MAX_WORKERS)
+        self.assertEqual(cameras.open, 0)
+
+    def test_scan_timeout(self):
+        cameras = FakeCameras(set(range(camera_identifier.MAX_INDEX)), delay=0.05)
+        with mock.patch.object(camera_identifier, "open_camera", cameras.open_camera), \
+                mock.patch.object(camera_identifier, "TIMEOUT", 0.2):
+            start = time.monotonic()
+            found = camera_identifier.scan_cameras()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertGreater(len(found), 0)
+        self.assertEqual(cameras.open, 0)
+
+    def test_cache(self):
+        cameras = FakeCameras({0})
+        with mock.patch.object(camera_identifier, "open_camera", cameras.open_camera):
+            self.assertDictEqual(camera_identifier.find_cameras(), {0: "Camera 1"})
+            cameras.indices = {0, 1}
+            probed = len(cameras.probed)
+            self.assertDictEqual(camera_identifier.find_cameras(), {0: "Camera 1"})
+            self.assertEqual(len(cameras.probed), probed)  # served from the cache without touching the cameras
+            camera_identifier.invalidate_cameras()
+            self.assertDictEqual(camera_identifier.find_cameras(), {0: "Camera 1", 1: "Camera 2"})
+
+    def test_cache_expires(self):
+        cameras = FakeCameras({0})
+        with mock.patch.object(camera_identifier, "open_camera", cameras.open_camera), \
+                mock.patch.object(camera_identifier, "CACHE_TTL", 0.1):
+            self.assertDictEqual(camera_identifier.find_cameras(), {0: "Camera 1"})
+            cameras.indices = {0, 1}
+            time.sleep(0.2)
+            self.assertDictEqual(camera_identifier.find_cameras(), {0: "Camera 1", 1: "Camera 2"})
+
+    def test_camera_in_use_is_found(self):
+        capture_manager = mock.Mock()
+        capture_manager.is_open.return_value = True
+        with mock.patch.object(camera_identifier, "capture_manager", capture_manager), \
+                mock.patch.object(camera_identifier.cv2, "VideoCapture") as video_capture:
+            self.assertEqual(camera_identifier.open_camera(0), 0)
+        video_capture.assert_not_called()  # opening it again could disturb the stream
+
+
+if __name__ == '__main__':
+    unittest.main()
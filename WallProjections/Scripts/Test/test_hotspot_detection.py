@@ -1,17 +1,24 @@
+import json
+import multiprocessing.spawn
+import os
+import sys
 import threading
 import time
 import unittest
+from unittest.mock import patch
 
 import numpy as np
 
+from Scripts.Helper.DetectionProcess import _python_executable, _spawn_executable
 from Scripts.Helper.EventHandler import EventHandler
 from Scripts.Interop import numpy_dotnet_converters as npnet
 from Scripts.Test.helper import get_asset
-from Scripts.hotspot_detection import hotspot_detection, stop_hotspot_detection
+from Scripts.hotspot_detection import get_detection_stats, hotspot_detection, return_preview_frame, start_preview, \
+    stop_hotspot_detection, stop_preview, take_preview_frame
 
 
 class TestHotspotDetection(unittest.TestCase):
-    def test_hotspot_detection_video(self):
+    def run_hotspot_detection_video(self) -> set[int]:
         class TestEventHandler(EventHandler):
             def __init__(self):
                 self.hotspots_pressed = set()
@@ -30,11 +37,58 @@ class TestHotspotDetection(unittest.TestCase):
         thread = threading.Thread(target=hotspot_detection,
                 args=(get_asset("hotspot_test.avi"), event_handler, calibration_matrix, hotspot_coords_str))
         thread.start()
-        time.sleep(20)
+        thread.join(timeout=60)  # detection stops by itself at the end of the video
+        stats = json.loads(get_detection_stats())
         stop_hotspot_detection()
         assert not thread.is_alive()  # not what we're testing but just checking the thread is finished
+        self.assertIn("inference", stats)
+        self.assertGreater(stats["inference"]["count"], 0)
+        return event_handler.hotspots_pressed
+
+    def test_hotspot_detection_video(self):
         correct_set = {0, 1, 2, 3}
-        self.assertSetEqual(event_handler.hotspots_pressed, correct_set)
+        self.assertSetEqual(self.run_hotspot_detection_video(), correct_set)
+
+    @patch("Scripts.hotspot_detection.RUN_IN_SEPARATE_PROCESS", True)
+    def test_hotspot_detection_video_separate_process(self):
+        correct_set = {0, 1, 2, 3}
+        self.assertSetEqual(self.run_hotspot_detection_video(), correct_set)
+
+    def test_spawn_executable_restored(self):
+        previous = multiprocessing.spawn.get_executable()
+        # as if running inside the .NET host
+        with patch("sys.executable", os.path.join(os.path.dirname(sys.executable), "dotnet")):
+            with _spawn_executable():
+                self.assertEqual(os.fsdecode(multiprocessing.spawn.get_executable()), _python_executable())
+        self.assertEqual(multiprocessing.spawn.get_executable(), previous)
+
+    def test_preview(self):
+        self.check_preview()
+
+    @patch("Scripts.hotspot_detection.RUN_IN_SEPARATE_PROCESS", True)
+    def test_preview_separate_process(self):
+        self.check_preview()
+
+    def check_preview(self):
+        net_buffers = [npnet.asNetArray(np.zeros((48, 64, 4), dtype=np.uint8)) for _ in range(3)]
+        start_preview(net_buffers)
+        frames = []
+
+        def read_preview():
+            while thread.is_alive():
+                index = take_preview_frame()
+                if index != -1:
+                    frames.append(npnet.asNumpyArray(net_buffers[index]))
+                    return_preview_frame(index)
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=self.run_hotspot_detection_video)
+        thread.start()
+        read_preview()
+        stop_preview()
+        self.assertGreater(len(frames), 0)
+        self.assertTrue((frames[-1][..., 3] == 255).all())  # BGRA
+        self.assertGreater(frames[-1][..., :3].std(), 0)
 
 
 if __name__ == '__main__':
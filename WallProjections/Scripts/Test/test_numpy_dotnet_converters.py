@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from Scripts.Interop import numpy_dotnet_converters as npnet
+
+
+class TestConverters(unittest.TestCase):
+    def test_roundtrip(self):
+        for array in (np.arange(12.).reshape(3, 4), np.arange(24, dtype=np.uint8).reshape(2, 3, 4),
+                      np.array([True, False]), np.arange(6, dtype=np.int32).reshape(2, 3).T):
+            net_array = npnet.asNetArray(array)
+            self.assertEqual(net_array.Rank, array.ndim)
+            self.assertTrue(np.array_equal(npnet.asNumpyArray(net_array), array))
+
+    def test_converted_array_is_a_copy(self):
+        net_array = npnet.asNetArray(np.zeros((2, 2)))
+        array = npnet.asNumpyArray(net_array)
+        array[0, 1] = 5
+        self.assertEqual(net_array[0, 1], 0)
+
+    def test_pinned_view_shares_memory(self):
+        net_array = npnet.asNetArray(np.zeros((2, 3), dtype=np.float32))
+        handle, view = npnet.pinnedView(net_array)
+        try:
+            view[1, 2] = 7
+            net_array[0, 1] = 3
+            self.assertEqual(net_array[1, 2], 7)
+            self.assertEqual(view[0, 1], 3)
+        finally:
+            handle.Free()
+
+
+class TestPinnedBufferPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = npnet.PinnedBufferPool.allocate((4, 5, 3), count=3)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_views_share_memory(self):
+        index = self.pool.checkout()
+        self.pool.view(index)[2, 3] = (1, 2, 3)
+        net_array = self.pool.netArray(index)
+        self.assertEqual([net_array[2, 3, i] for i in range(3)], [1, 2, 3])
+
+    def test_latest_frame(self):
+        self.assertEqual(self.pool.takeLatest(), -1)
+        first = self.pool.checkout()
+        self.pool.publish(first)
+        second = self.pool.checkout()
+        self.pool.publish(second)
+        # the first frame was never taken, so it's recycled
+        self.assertEqual(self.pool.takeLatest(), second)
+        self.assertEqual(self.pool.takeLatest(), -1)
+        self.pool.checkin(second)
+        self.assertEqual(sorted(self.pool.checkout() for _ in range(3)), [0, 1, 2])
+
+    def test_exhausted(self):
+        indices = [self.pool.checkout() for _ in range(3)]
+        self.assertIsNone(self.pool.checkout())
+        self.pool.checkin(indices[0])
+        self.assertEqual(self.pool.checkout(), indices[0])
+        self.assertRaises(ValueError, self.pool.checkin, 5)
+
+    def test_double_checkin(self):
+        index = self.pool.checkout()
+        self.pool.checkin(index)
+        self.assertRaises(ValueError, self.pool.checkin, index)
+
+    def test_closed(self):
+        self.pool.close()
+        self.assertIsNone(self.pool.checkout())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,56 +1,52 @@
-﻿import threading
+﻿import json
+import threading
 
 import cv2
-import mediapipe as mp
+import numpy as np
+
+from Scripts.Helper.DetectionProcess import DetectionProcess
+from Scripts.Helper.EventDispatcher import EventDispatcher
 from Scripts.Helper.EventHandler import EventHandler
-from Scripts.Helper.Hotspot import Hotspot
+from Scripts.Helper.HandTracker import FINGERTIP_INDICES  # noqa: F401 (re-exported; it used to be defined here)
+from Scripts.Helper.HotspotDetector import HotspotDetector
+from Scripts.Helper.Hotspot import HotspotSet
+from Scripts.Helper.PipelineStats import PipelineStats
 from Scripts.Helper.logger import setup_logger
 from Scripts.Interop import numpy_dotnet_converters as npnet
 from Scripts.Interop.json_dict_converters import json_to_3dict
-from Scripts.calibration import Calibrator
-from Scripts.video_capture_factory import getVideoCapture
 
 logger = setup_logger("hotspot_detection")
 
-MAX_NUM_HANDS: int = 4
-"""The maximum number of hands to detect."""
-
-MIN_DETECTION_CONFIDENCE: float = 0.5
-"""The minimum confidence for hand detection to be considered successful.
-
-Must be between 0 and 1.
-
-See https://developers.google.com/mediapipe/solutions/vision/hand_landmarker."""
+RUN_IN_SEPARATE_PROCESS: bool = False
+"""Whether to run capture and inference in a child process instead of a thread of the host process.
 
-MIN_TRACKING_CONFIDENCE: float = 0.5
-"""The minimum confidence for hand detection to be considered successful.
+This stops UI activity in the host (which holds the GIL while calling into Python) from stalling detection, and
+vice versa. Only hotspot events cross back to the host. The detection constants can be tuned in
+Helper/HotspotDetector."""
 
-Must be between 0 and 1.
-
-See https://developers.google.com/mediapipe/solutions/vision/hand_landmarker."""
-
-FINGERTIP_INDICES: tuple[int, ...] = (4, 8, 12, 16, 20)
-"""The indices for the thumb fingertip, index fingertip, ring fingertip, etc. 
-
-This shouldn't need to be changed unless there's a breaking change upstream in mediapipe."""
+COLLECT_PIPELINE_STATS: bool = True
+"""Whether to record how long every stage of the detection pipeline takes, which is logged periodically and can be
+read with get_detection_stats. The log interval can be tuned in Helper/PipelineStats."""
 
 detection_running = False
 detection_mutex = threading.Lock()
+detector: HotspotDetector | DetectionProcess | None = None
+event_dispatcher: EventDispatcher | None = None
+pipeline_stats: PipelineStats | None = None
+process_stats: dict[str, dict[str, float]] = {}
+"""The last pipeline stats of the detection process, kept once it has stopped."""
+preview_mutex = threading.Lock()
+preview_pool: npnet.PinnedBufferPool | None = None
+"""The buffers shared with .NET which preview frames are written into, while the preview is on."""
+preview_frame_number: int = 0
+"""The number of the last frame of the detection process written into the preview buffers."""
 
 
 def generate_hotspots(
         event_handler: EventHandler,
         hotspot_coords_str: str
-) -> list[Hotspot]:
-    hotspots_coords = json_to_3dict(hotspot_coords_str)
-
-    hotspots: list[Hotspot] = []
-    for hotspot_id, hotspot_coord_rad in hotspots_coords.items():
-        coords = hotspot_coord_rad[0], hotspot_coord_rad[1]
-        radius = hotspot_coord_rad[2]
-        hotspot = Hotspot(hotspot_id, coords, event_handler, radius=radius)
-        hotspots.append(hotspot)
-    return hotspots
+) -> HotspotSet:
+    return HotspotSet.from_coords(event_handler, json_to_3dict(hotspot_coords_str))
 
 
 def hotspot_detection(
@@ -61,66 +57,181 @@ def hotspot_detection(
 ) -> None:
     """
     Given hotspot projector coords, a transformation matrix and an event_handler
-    calls events when hotspots are pressed or unpressed
+    calls events when hotspots are pressed or unpressed.
+    Runs until stop_hotspot_detection is called (or until the end of the video, for video files).
     """
-    global detection_running
+    global detection_running, detector, event_dispatcher, pipeline_stats, process_stats, preview_frame_number
 
     acquired = detection_mutex.acquire(timeout=1)
     if not acquired:
         logger.error("Failed to acquire mutex for hotspot detection (it's probably already running).")
         return
 
-    detection_running = True
-
-    logger.info("Starting hotspot detection.")
-
-    # initialise ML hand-tracking model
-    logger.info("Initialising hand-tracking model.")
-    hands_model = mp.solutions.hands.Hands(max_num_hands=MAX_NUM_HANDS,
-                                           min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-                                           min_tracking_confidence=MIN_TRACKING_CONFIDENCE)
-
-    # initialise video capture
-    video_capture = getVideoCapture(video_capture_target)
-    video_capture.start()
-
-    # initialise calibrator
-    h, w, d = video_capture.get_current_frame().shape
-    logger.info(f"Camera width: {w}, height: {h}")
-    calibration_matrix = npnet.asNumpyArray(calibration_matrix_net_array)
-    calibrator = Calibrator(calibration_matrix, (w, h))
-    hotspots = generate_hotspots(event_handler, hotspot_coords_str)
-
-    logger.info("Hotspot detection started.")
-
-    while detection_running:
-        video_capture_img_bgr = video_capture.get_current_frame()
-        video_capture_img_rgb = cv2.cvtColor(video_capture_img_bgr, cv2.COLOR_BGR2RGB)
-
-        # run model
-        model_output = hands_model.process(video_capture_img_rgb)
-
-        # noinspection PyUnresolvedReferences
-        if hasattr(model_output, "multi_hand_landmarks") and model_output.multi_hand_landmarks is not None:
-            # update hotspots
-            fingertip_coords_norm = [landmarks.landmark[i] for i in FINGERTIP_INDICES for landmarks in
-                                     model_output.multi_hand_landmarks]
-            fingertip_coords_proj = [calibrator.norm_to_proj((fingertip.x, fingertip.y)) for fingertip in
-                                     fingertip_coords_norm]
-            for hotspot in hotspots:
-                hotspot.update(fingertip_coords_proj)
-
-    # clean up
-    video_capture.stop()
-    cv2.destroyAllWindows()  # there shouldn't be any windows but just in case
-    hands_model.close()
-    detection_mutex.release()
+    pipeline_stats = PipelineStats() if COLLECT_PIPELINE_STATS else None
+    process_stats = {}
+    preview_frame_number = 0
+
+    # deliver events from a separate thread, so that slow handlers don't stall detection
+    dispatcher = EventDispatcher(event_handler, stats=pipeline_stats)
+    dispatcher.start()
+    event_dispatcher = dispatcher
+
+    try:
+        detection_running = True
+
+        logger.info("Starting hotspot detection.")
+        calibration_matrix = npnet.asNumpyArray(calibration_matrix_net_array)
+        if RUN_IN_SEPARATE_PROCESS:
+            detector = DetectionProcess(video_capture_target, dispatcher, calibration_matrix,
+                                        json_to_3dict(hotspot_coords_str), collect_stats=COLLECT_PIPELINE_STATS)
+        else:
+            detector = HotspotDetector(video_capture_target, calibration_matrix,
+                                       generate_hotspots(dispatcher, hotspot_coords_str),
+                                       frame_listener=_write_preview_frame, stats=pipeline_stats)
+
+        if detection_running:  # stop_hotspot_detection might have been called while setting up
+            detector.run()
+    finally:
+        if isinstance(detector, DetectionProcess):
+            process_stats = detector.get_stats()
+        detector = None
+        event_dispatcher = None
+        dispatcher.stop()
+        detection_mutex.release()
+
+
+def update_hotspots(hotspot_coords_str: str) -> None:
+    """
+    Replaces the hotspots of the running hotspot detection (in the same format as hotspot_detection), without
+    restarting it. The new hotspots are used from the next frame. Hotspots which keep their id keep their state,
+    so a hotspot held down while it's moved stays pressed.
+    """
+    current_detector, dispatcher = detector, event_dispatcher
+    if current_detector is None or dispatcher is None:
+        logger.warning("Hotspot detection isn't running, so there are no hotspots to update.")
+        return
+    logger.info("Updating hotspots.")
+    if isinstance(current_detector, DetectionProcess):
+        current_detector.update_hotspots(json_to_3dict(hotspot_coords_str))
+    else:
+        current_detector.update_hotspots(generate_hotspots(dispatcher, hotspot_coords_str))
+
+
+def update_calibration(calibration_matrix_net_array) -> None:
+    """
+    Replaces the calibration matrix of the running hotspot detection, without restarting it. The new calibration is
+    used from the next frame, and the camera's intrinsics (if any) are kept.
+    """
+    current_detector = detector
+    if current_detector is None:
+        logger.warning("Hotspot detection isn't running, so there's no calibration to update.")
+        return
+    logger.info("Updating calibration.")
+    current_detector.update_calibration(npnet.asNumpyArray(calibration_matrix_net_array))
 
 
 def stop_hotspot_detection():
     global detection_running
     logger.info("Stopping hotspot detection.")
     detection_running = False
+    if detector is not None:
+        detector.stop()
     detection_mutex.acquire()  # wait until hotspot detection has stopped
     detection_mutex.release()
     logger.info("Hotspot detection stopped.")
+
+
+def get_detection_stats() -> str:
+    """
+    Returns the latest stats of every stage of the detection pipeline as a JSON object of stage names to their
+    count, rate (per second), and mean and percentile durations in milliseconds (see PipelineStats.snapshot).
+    The object is empty if stats aren't being collected.
+    """
+    stats = dict(detector.get_stats() if isinstance(detector, DetectionProcess) else process_stats)
+    if pipeline_stats is not None:
+        stats.update(pipeline_stats.get_stats())
+    return json.dumps(stats)
+
+
+def start_preview(net_buffers) -> None:
+    """
+    Starts writing every captured frame (scaled to fit) into one of the given .NET arrays, for showing a live preview.
+    The arrays are allocated once by the caller, as byte[height, width, 3] (RGB) or byte[height, width, 4] (BGRA), and
+    stay pinned until stop_preview is called, so frames cross over without being copied.
+
+    Read frames with take_preview_frame and hand them back with return_preview_frame. At least two arrays are needed
+    (one being read and one being written), and a third means a frame is always ready.
+    While detection runs in a separate process, frames are fetched from it (through shared memory) when
+    take_preview_frame is called instead, so the preview updates as often as it's read.
+    """
+    global preview_pool
+    pool = npnet.PinnedBufferPool(net_buffers)
+    for i in range(len(pool)):
+        view = pool.view(i)
+        if view.dtype != np.uint8 or view.ndim != 3 or view.shape[2] not in (3, 4):
+            pool.close()
+            raise ValueError(f"Preview buffers must be byte[height, width, 3 or 4], not {view.dtype}{view.shape}.")
+    with preview_mutex:
+        if preview_pool is not None:
+            preview_pool.close()
+        preview_pool = pool
+
+
+def stop_preview() -> None:
+    """Stops writing preview frames and unpins the buffers given to start_preview."""
+    global preview_pool
+    with preview_mutex:  # waits for a frame being written
+        if preview_pool is not None:
+            preview_pool.close()
+        preview_pool = None
+
+
+def take_preview_frame() -> int:
+    """
+    Returns the index (into the arrays given to start_preview) of the latest preview frame, or -1 if there's no new
+    frame. The array isn't written to until it's handed back with return_preview_frame.
+    """
+    pool = preview_pool
+    if pool is None:
+        return -1
+    current_detector = detector
+    if isinstance(current_detector, DetectionProcess):
+        _fetch_process_preview_frame(current_detector)
+    return pool.takeLatest()
+
+
+def return_preview_frame(index: int) -> None:
+    """Hands a preview frame taken with take_preview_frame back, to be written into again."""
+    pool = preview_pool
+    if pool is not None:
+        pool.checkin(index)
+
+
+def _fetch_process_preview_frame(process: DetectionProcess) -> None:
+    global preview_frame_number
+    # the detection process only shares a frame when asked for one, which this does for the next call
+    latest = process.get_latest_frame()
+    if latest is None or latest[0] == preview_frame_number:
+        return
+    preview_frame_number = latest[0]
+    _write_preview_frame(*latest)
+
+
+def _write_preview_frame(_frame_number: int, image: np.ndarray) -> None:
+    if preview_pool is None:
+        return
+    with preview_mutex:
+        pool = preview_pool
+        if pool is None:
+            return
+        index = pool.checkout()
+        if index is None:
+            return  # every buffer is being read, so skip this frame
+        buffer = pool.view(index)
+        height, width = buffer.shape[:2]
+        if buffer.shape[2] == 4:
+            cv2.cvtColor(cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2BGRA,
+                         dst=buffer)
+        else:
+            cv2.resize(image, (width, height), dst=buffer, interpolation=cv2.INTER_AREA)
+        pool.publish(index)